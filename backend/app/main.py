@@ -1,26 +1,78 @@
+import time
+
+_import_start = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from routers import (
-    groups,
-    goal,
-    chatbot,
-    scheduler_api,
-    ai_tools_clean,
-    simulation_old,
-    users,
-    request,
-    balance,
-    allocate,
-)
+from routers.resources import resources, timed_import, RESOURCE_CONFIG
 from routers.scheduler import start_scheduler
+from routers.mongo import ensure_indexes, warm_up_pools
+from routers.progress_feed import progress_feed
+from routers.notification_feed import notification_feed
+from routers.responses import BSONJSONResponse
+from routers.metrics import MetricsMiddleware, render_metrics, STARTUP_SECONDS
+from routers.query_tracer import QueryTraceMiddleware
+from routers.read_routing import ReadAfterMiddleware
+from routers.loop_watchdog import start_loop_watchdog, loop_watchdog
 from typing import List
 from pydantic import BaseModel
-from dotenv import load_dotenv
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Included in this order; import times are recorded per router
+ROUTERS = (
+    "users",
+    "groups",
+    "goal",
+    "chatbot",
+    "scheduler_api",
+    "ai_tools_clean",
+    "simulation_old",
+    "request",
+    "balance",
+    "allocate",
+    "notifications",
+    "feed",
+    "profiling",
+)
+router_modules = [timed_import(f"routers.{name}") for name in ROUTERS]
+STARTUP_SECONDS.set(time.perf_counter() - _import_start, phase="import")
+
+async def warm_up():
+    """Initialise Firebase, the AI client and the Mongo pools concurrently."""
+    start = time.perf_counter()
+    await asyncio.gather(resources.warm_up("firebase", "ai_client"), warm_up_pools(), ensure_indexes())
+    STARTUP_SECONDS.set(time.perf_counter() - start, phase="warm_up")
+    start_scheduler()  # Start the background scheduler once its dependencies are up
+    slowest = sorted(resources.timings.items(), key=lambda item: item[1], reverse=True)[:5]
+    logger.info("⏱️ Startup: " + ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in slowest))
+
+async def warm_up_in_background():
+    try:
+        await warm_up()
+    except Exception as e:
+        logger.error(f"Background warm-up failed: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_loop_watchdog()
+    if RESOURCE_CONFIG["lazy_startup"]:
+        warm_up_task = asyncio.create_task(warm_up_in_background())
+    else:
+        await warm_up()
+    yield
+    if RESOURCE_CONFIG["lazy_startup"]:
+        warm_up_task.cancel()
+    await progress_feed.stop()
+    await notification_feed.stop()
+    loop_watchdog.stop()
+    await resources.aclose()
 
-app = FastAPI(title="Goofy augh AMBAG API")
+app = FastAPI(title="Goofy augh AMBAG API", default_response_class=BSONJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -34,30 +86,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Read-After", "X-Next-After", "X-Total-Count", "Server-Timing"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(QueryTraceMiddleware)
+app.add_middleware(ReadAfterMiddleware)
 
 
 
-app.include_router(users.router)
-app.include_router(groups.router)
-app.include_router(goal.router)
-app.include_router(chatbot.router)
-app.include_router(scheduler_api.router)
-app.include_router(ai_tools_clean.router)
-app.include_router(simulation_old.router)
-app.include_router(request.router)
-app.include_router(balance.router)
-app.include_router(allocate.router)
+for module in router_modules:
+    app.include_router(module.router)
 
 group_balances = {}
 transactions = []
 
-@app.on_event("startup")
-async def startup_event():
-    start_scheduler()  # Start the background scheduler
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 def read_root():
     return Response("working na to")
-
-
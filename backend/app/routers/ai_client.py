@@ -1,16 +1,28 @@
 import os
-import dotenv
-from pathlib import Path
 
-env_path = Path(__file__).parent.parent.parent / '.env'
-dotenv.load_dotenv(dotenv_path=env_path)
+from .resources import resources
 
 try:
     from openai import AsyncOpenAI
 except ImportError:
     AsyncOpenAI = None
 
-def get_ai_client():
+# Count of provider 429s seen by this process. Background callers (the
+# scheduler) compare snapshots of it to back off without parsing error text.
+_rate_limit_events = 0
+
+def note_ai_error(exc: Exception) -> bool:
+    """Record an AI call failure; returns True when it was a rate limit."""
+    global _rate_limit_events
+    if getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError":
+        _rate_limit_events += 1
+        return True
+    return False
+
+def get_rate_limit_events() -> int:
+    return _rate_limit_events
+
+def create_ai_client():
     api_key = os.getenv("OPENROUTER_API_KEY")
     if not api_key:
         print("Warning: OPENROUTER_API_KEY is not set in the environment variables. AI features will be disabled.")
@@ -28,4 +40,10 @@ def get_ai_client():
         )
     except Exception as e:
         print(f"Error initializing OpenAI client: {e}")
-        return None
\ No newline at end of file
+        return None
+
+resources.register("ai_client", create_ai_client, close=lambda c: c.close())
+
+def get_ai_client():
+    """The shared AsyncOpenAI client (one connection pool per process), or None when AI is disabled."""
+    return resources.get("ai_client")
\ No newline at end of file
@@ -1,16 +1,26 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta, date
+import asyncio
 import logging
 import json
 import re
 from uuid import uuid4
-from .ai_client import get_ai_client
+from collections import Counter
+from .ai_client import get_ai_client, note_ai_error
+from .goal_calendar import to_target_datetime, compute_progress_ratio
+from .goal_snapshots import goal_snapshots, invalidate_goal_snapshot
+from .notification_store import parse_since, find_since, insert_notifications
+from .responses import BSONJSONResponse
+from .group_membership import list_member_recipients
+from .group_stats import record_contribution
+from .pool_totals import CONTRIBUTOR_COUNT_EXPR, pool_contributor_count, pool_member_totals, record_pool_contribution, uid_from_key
+from .metrics import observe_llm_call
 
 # from .goal import goals, pool_status
 # from .groups import group_db
-from .mongo import goals_collection, pool_status_collection, groups_collection, smart_reminders_collection, notifications_collection, executed_actions_collection
+from .mongo import uses_analytics_reads, goals_collection, pool_status_collection, groups_collection, group_members_collection, smart_reminders_collection, notifications_collection, executed_actions_collection
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,40 +55,33 @@ async def send_welcome_notification(group_id: str, user_name: str, user_role: st
         # Notify all managers and contributors about new member
         # Find all members except the new joiner
         if group:
-            for member in group.get("members", []):
-                recipient_id = member.get("user_id")
-                if recipient_id != user_name:
-                    notifications.append({
-                        "type": "member_joined",
-                        "recipient": recipient_id,
-                        "group_id": group_id,
-                        "title": "New Member!",
-                        "message": f"{user_name} just dropped in!",
-                        "timestamp": timestamp,
-                        "auto_generated": True
-                    })
+            for recipient_id in await list_member_recipients(group_id, exclude=user_name):
+                notifications.append({
+                    "type": "member_joined",
+                    "recipient": recipient_id,
+                    "group_id": group_id,
+                    "title": "New Member!",
+                    "message": f"{user_name} just dropped in!",
+                    "timestamp": timestamp,
+                    "auto_generated": True
+                })
     if notifications:
-        await notifications_collection.insert_many(notifications)
+        await insert_notifications(notifications)
     return True
 
 async def notify_manager_member_request(group_id: str, member_name: str, request_detail: str):
     """Send a notification to all managers when a member sends a request."""
     logger.debug(f"[NOTIF-DEBUG] Called notify_manager_member_request with group_id={group_id}, member_name={member_name}, request_detail={request_detail}")
-    group = await groups_collection.find_one({"group_id": group_id})
+    group = await groups_collection.find_one({"group_id": group_id}, {"_id": 1})
     logger.debug(f"[NOTIF-DEBUG] Group lookup result: {group}")
     if not group:
         logger.warning(f"[NOTIF] No group found for group_id={group_id}")
         return False
-    managers = [m for m in group.get("members", []) if m.get("role", "").lower() == "manager"]
+    managers = await list_member_recipients(group_id, role="manager")
     logger.debug(f"[NOTIF-DEBUG] Managers found: {managers}")
     notifications = []
     timestamp = datetime.now().isoformat()
-    for manager in managers:
-        recipient_id = manager.get("user_id") or manager.get("firebase_uid")
-        logger.debug(f"[NOTIF-DEBUG] Processing manager: {manager}, recipient_id: {recipient_id}")
-        if not recipient_id:
-            logger.warning(f"[NOTIF-DEBUG] Manager missing recipient_id: {manager}")
-            continue
+    for recipient_id in managers:
         notification = {
             "type": "member_request",
             "recipient": recipient_id,
@@ -92,7 +95,7 @@ async def notify_manager_member_request(group_id: str, member_name: str, request
         notifications.append(notification)
     if notifications:
         logger.debug(f"[NOTIF-DEBUG] Notifications to insert: {notifications}")
-        await notifications_collection.insert_many(notifications)
+        await insert_notifications(notifications)
         logger.info(f"[NOTIF] Sent member request notifications to managers in group_id={group_id}")
     else:
         logger.warning(f"[NOTIF] No manager notifications to send for group_id={group_id}")
@@ -105,21 +108,14 @@ async def notify_group_members_new_goal(goal_doc):
     if not group_id:
         logger.warning(f"[NOTIF] No group_id found in goal_doc: {goal_doc}")
         return False
-    group = await groups_collection.find_one({"group_id": group_id})
+    group = await groups_collection.find_one({"group_id": group_id}, {"_id": 1})
     if not group:
         logger.warning(f"[NOTIF] No group found for group_id={group_id}")
         return False
-    members = group.get("members", [])
-    logger.info(f"[NOTIF] Found group with {len(members)} members for group_id={group_id}")
+    recipients = await list_member_recipients(group_id)
+    logger.info(f"[NOTIF] Found group with {len(recipients)} members for group_id={group_id}")
     notifications = []
-    for member in members:
-        user_id = member.get("user_id")
-        firebase_uid = member.get("firebase_uid")
-        recipient_id = user_id if user_id else firebase_uid
-        logger.info(f"[NOTIF] Preparing notification for recipient_id={recipient_id}")
-        if not recipient_id:
-            logger.warning(f"[NOTIF] Member missing user_id and firebase_uid: {member}")
-            continue
+    for recipient_id in recipients:
         notification = {
             "id": f"goal_created_{group_id}_{recipient_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
             "type": "goal_created",
@@ -136,7 +132,7 @@ async def notify_group_members_new_goal(goal_doc):
         notifications.append(notification)
     if notifications:
         logger.info(f"[NOTIF] Inserting {len(notifications)} notifications for group_id={group_id}")
-        await notifications_collection.insert_many(notifications)
+        await insert_notifications(notifications)
         logger.info(f"[NOTIF] Successfully inserted notifications for group_id={group_id}")
     else:
         logger.warning(f"[NOTIF] No notifications to insert for group_id={group_id}")
@@ -148,12 +144,10 @@ async def find_group_for_goal(goal_id: str):
         logger.warning(f"Goal with id {goal_id} not found.")
         return None
     creator_user_id = f"user_{goal.get('creator_name', 'unknown').replace(' ', '_').lower()}"
-    async for group in groups_collection.find():
-        members = group.get("members", [])
-        member_names = [member.get("user_id", "").lower() for member in members if isinstance(member, dict)]
-        if creator_user_id in member_names or group.get("manager_id", "").lower() == creator_user_id:
-            return group
-    return None
+    membership = await group_members_collection.find_one({"firebase_uid": creator_user_id}, {"group_id": 1})
+    if membership:
+        return await groups_collection.find_one({"group_id": membership["group_id"]})
+    return await groups_collection.find_one({"manager_id": creator_user_id})
 
 async def convert_goal_to_group_format(goal_id: str):
     goal = await goals_collection.find_one({"goal_id": goal_id})
@@ -161,15 +155,26 @@ async def convert_goal_to_group_format(goal_id: str):
         logger.warning(f"Goal with id {goal_id} not found.")
         return None
     pool_data = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
+    return build_group_data(goal, pool_data)
+
+def build_group_data(goal: dict, pool_data: dict) -> dict:
+    goal_id = goal.get("goal_id")
     contributors_data = pool_data.get("contributors", [])
     # Defensive: always default to empty list
     all_members = [goal.get('creator_name', 'Unknown')]
     # ... logic to add more members if needed ...
-    pending_members = [m for m in all_members if m not in [c.get("name", "") for c in contributors_data]]
+    member_totals = {uid_from_key(k): v for k, v in pool_member_totals(pool_data).items()}
+    # Real contributions are keyed by the creator's uid, test fixtures by name
+    creator_paid = member_totals.get(goal.get("creator_uid")) or member_totals.get(goal.get("creator_name"))
+    pending_members = [] if creator_paid else all_members
 
     # Fix: handle target_date as string or datetime
     target_date = goal.get('target_date')
-    if isinstance(target_date, (datetime, date)):
+    if isinstance(target_date, datetime):
+        # Stored as midnight BSON dates; keep the date-only form so the deadline
+        # counts to end of day like legacy string dates did
+        deadline = target_date.date().isoformat()
+    elif isinstance(target_date, date):
         deadline = target_date.isoformat()
     else:
         deadline = str(target_date) if target_date else datetime.now().isoformat()
@@ -194,6 +199,8 @@ async def convert_goal_to_group_format(goal_id: str):
             }
             for c in contributors_data
         ],
+        "member_totals": member_totals,
+        "contributor_count": pool_contributor_count(pool_data),
         "pending_members": pending_members,
         "created_at": goal.get('created_at', datetime.now().isoformat()),
         "description": goal.get('description', ''),
@@ -221,7 +228,7 @@ def calculate_group_analytics(group_data: dict):
             logger.warning(f"Failed to parse deadline: {e}")
             days_remaining = 0
     total_members = len(group_data.get("members", []))
-    contributors = len([c for c in group_data.get("contributions", []) if c.get("amount", 0) > 0])
+    contributors = group_data.get("contributor_count", 0)
     return {
         "total_members": total_members,
         "contributors": contributors,
@@ -234,6 +241,46 @@ def calculate_group_analytics(group_data: dict):
         "daily_target": remaining_amount / max(days_remaining, 1) if days_remaining > 0 else remaining_amount
     }
 
+async def get_goal_snapshot(goal_id: str):
+    """Return (group_data, analytics) for a goal, or (None, None) if it does not exist.
+
+    Served from the shared snapshot cache while the pool_status revision is
+    unchanged; both dicts are shared between callers and must not be mutated.
+    """
+    generation = goal_snapshots.generation(goal_id)
+    snapshot = goal_snapshots.get(goal_id)
+    if snapshot is not None:
+        if not goal_snapshots.is_fresh(snapshot):
+            pool_revision = await pool_status_collection.find_one({"goal_id": goal_id}, {"revision": 1})
+            if (pool_revision or {}).get("revision", 0) != snapshot["revision"]:
+                snapshot = None
+            else:
+                goal_snapshots.mark_checked(snapshot)
+    if snapshot is not None:
+        goal_snapshots.hits += 1
+        if snapshot["built_on"] != date.today():
+            # days_remaining moved on; the group view itself is still current.
+            # Callers may still hold the old dicts, so replace rather than update.
+            snapshot = {**snapshot, "analytics": calculate_group_analytics(snapshot["group_data"]), "built_on": date.today()}
+            goal_snapshots.put(goal_id, snapshot, generation)
+        return snapshot["group_data"], snapshot["analytics"]
+
+    goal_snapshots.misses += 1
+    goal = await goals_collection.find_one({"goal_id": goal_id})
+    if not goal:
+        logger.warning(f"Goal with id {goal_id} not found.")
+        return None, None
+    pool_data = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
+    group_data = build_group_data(goal, pool_data)
+    analytics = calculate_group_analytics(group_data)
+    goal_snapshots.put(goal_id, {
+        "revision": pool_data.get("revision", 0),
+        "group_data": group_data,
+        "analytics": analytics,
+        "built_on": date.today(),
+    }, generation)
+    return group_data, analytics
+
 # Fallback autonomous actions when AI doesn't provide them
 def create_fallback_actions(group_data: dict, analytics: dict):
     actions = []
@@ -273,7 +320,9 @@ async def create_test_goal_with_group(title: str, goal_amount: float, creator_na
         "creator_name": creator_name,
         "creator_role": "manager",
         "description": f"Test goal for {title}",
-        "target_date": (datetime.now() + timedelta(days=20)).date(),
+        "target_date": to_target_datetime(datetime.now() + timedelta(days=20)),
+        "current_amount": 0.0,
+        "progress_ratio": 0.0,
         "created_at": datetime.now().isoformat(),
         "status": "active"
     }
@@ -283,11 +332,13 @@ async def create_test_goal_with_group(title: str, goal_amount: float, creator_na
     # Notify group members about new goal
     await notify_group_members_new_goal(new_goal)
     
-    # Create group members data
+    # Create group members data (test users have no Firebase account; the user_id doubles as firebase_uid)
     group_members = []
     for i, member_name in enumerate(member_names):
+        user_id = f"user_{member_name.replace(' ', '_').lower()}_{i}"
         member = {
-            "user_id": f"user_{member_name.replace(' ', '_').lower()}_{i}",
+            "user_id": user_id,
+            "firebase_uid": user_id,
             "role": "manager" if member_name == creator_name else "contributor",
             "joined_at": datetime.now().isoformat(),
             "contribution_total": 0.0,
@@ -301,15 +352,20 @@ async def create_test_goal_with_group(title: str, goal_amount: float, creator_na
         "name": f"Group for {title}",
         "description": f"Financial group for {title}",
         "manager_id": f"user_{creator_name.replace(' ', '_').lower()}_0",
-        "members": group_members,
         "created_at": datetime.now().isoformat(),
         "is_active": True,
         "total_goals": 1,
-        "total_contributions": 0.0
+        "goal_status_counts": {"active": 1},
+        "total_contributions": 0.0,
+        "member_count": len(group_members),
+        "active_member_count": len(group_members),
+        "role_counts": dict(Counter(m["role"] for m in group_members))
     }
     
-    # Insert group into MongoDB
+    # Insert group and its memberships into MongoDB
     await groups_collection.insert_one(group)
+    await group_members_collection.insert_many([{**m, "group_id": goal_id} for m in group_members])
+    group["members"] = group_members
     
     # Initialize pool status
     pool_status = {
@@ -317,7 +373,9 @@ async def create_test_goal_with_group(title: str, goal_amount: float, creator_na
         "current_amount": 0.0,
         "is_paid": False,
         "status": "active",
-        "contributors": []
+        "contributors": [],
+        "totals_by_uid": {},
+        "contributor_count": 0
     }
     
     # Insert pool status into MongoDB
@@ -363,15 +421,19 @@ async def add_realistic_test_contributions(goal_id: str, contribution_percentage
         new_contributors.append(new_contribution)
         total_amount += amount
     
-    # Update pool status in MongoDB
-    await pool_status_collection.update_one(
+    # Update pool status in MongoDB; test members have no uid, so totals are keyed by name
+    for contributor in new_contributors:
+        await record_pool_contribution(goal_id, contributor["name"], [contributor])
+    await goals_collection.update_one(
         {"goal_id": goal_id},
-        {
-            "$push": {"contributors": {"$each": new_contributors}},
-            "$set": {"current_amount": total_amount}
-        }
+        {"$set": {
+            "current_amount": total_amount,
+            "progress_ratio": compute_progress_ratio(total_amount, goal["goal_amount"])
+        }}
     )
-    
+    invalidate_goal_snapshot(goal_id)
+    await record_contribution(goal.get("group_id"), total_amount - float(goal.get("current_amount") or 0))
+
     return True
 
 
@@ -397,12 +459,14 @@ async def get_ai_analysis(prompt: str) -> dict:
         if client is None:
             return {"error": "AI client not available", "analysis": "Unable to connect to AI service"}
         
-        response = await client.chat.completions.create(
-            model="deepseek/deepseek-chat",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=3000,
-            temperature=0.7
-        )
+        with observe_llm_call("ai_tools") as call:
+            response = await client.chat.completions.create(
+                model="deepseek/deepseek-chat",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=3000,
+                temperature=0.7
+            )
+            call["usage"] = response.usage
         
         ai_response = response.choices[0].message.content
         
@@ -428,6 +492,7 @@ async def get_ai_analysis(prompt: str) -> dict:
         return ai_response if isinstance(ai_response, dict) else {"analysis": str(ai_response)}
         
     except Exception as e:
+        note_ai_error(e)
         logger.error(f"AI analysis error: {str(e)}")
         return {"error": f"AI analysis failed: {str(e)}", "analysis": "Unable to generate analysis"}
 
@@ -439,15 +504,13 @@ async def execute_autonomous_action(action_type: Optional[str], group_id: str, a
     try:
         # If action_type is None or 'auto', infer the best action(s) based on analytics and risks
         if not action_type or action_type == "auto":
-            group_data = await convert_goal_to_group_format(group_id)
+            group_data, analytics = await get_goal_snapshot(group_id)
             
             # Check if group_data is None
             if not group_data:
                 logger.error(f"Could not find or convert goal {group_id} to group format")
                 return {"executed": False, "reason": f"Goal {group_id} not found"}
             
-            analytics = calculate_group_analytics(group_data)
-            
             # Enhanced agentic logic with multiple decision factors
             progress = analytics.get("progress_percentage", 0)
             days_remaining = analytics.get("days_remaining", 0)
@@ -558,7 +621,7 @@ async def send_contributor_reminder(group_id: str, action_data: Dict, target_mem
         }
         
         # notifications_db.append(notification)
-        await notifications_collection.insert_one(notification)
+        await insert_notifications([notification])
         notifications_sent.append(member)
         
         # Log the notification creation for debugging
@@ -636,7 +699,7 @@ async def escalate_to_manager(group_id: str, action_data: Dict):
 
 
     # Store manager notification in notifications_collection and smart_reminders_collection
-    await notifications_collection.insert_one(manager_notification)
+    await insert_notifications([manager_notification])
     await smart_reminders_collection.insert_one(manager_notification)
 
     # Also create notifications for late contributors (if any)
@@ -655,7 +718,7 @@ async def escalate_to_manager(group_id: str, action_data: Dict):
             "requires_action": True,
             "auto_generated": True
         }
-        await notifications_collection.insert_one(contributor_notification)
+        await insert_notifications([contributor_notification])
         await smart_reminders_collection.insert_one(contributor_notification)
 
     await executed_actions_collection.insert_one({
@@ -710,7 +773,7 @@ async def send_fund_transfer_alert(group_id: str, action_data: Dict):
         "fund_amount": action_data.get('total_collected', 0)
     }
     
-    await notifications_collection.insert_one(transfer_notification)
+    await insert_notifications([transfer_notification])
     
     # Also notify contributors about completion
     completion_message = f"""
@@ -737,7 +800,7 @@ async def send_fund_transfer_alert(group_id: str, action_data: Dict):
             "timestamp": datetime.now().isoformat(),
             "auto_generated": True
         }
-        await notifications_collection.insert_one(contributor_notification)
+        await insert_notifications([contributor_notification])
     
     await executed_actions_collection.insert_one({
         "action_type": "fund_transfer_alert",
@@ -795,7 +858,7 @@ async def suggest_redistribution(group_id: str, action_data: Dict):
         "redistribution_amount": per_member_additional
     }
     
-    await notifications_collection.insert_one(redistribution_notification)
+    await insert_notifications([redistribution_notification])
     
     await executed_actions_collection.insert_one({
         "action_type": "suggest_redistribution",
@@ -858,7 +921,7 @@ async def setup_payment_plan(group_id: str, action_data: Dict, target_members: L
             }
         }
         
-        await notifications_collection.insert_one(plan_notification)
+        await insert_notifications([plan_notification])
         plans_created.append(member)
     
     await executed_actions_collection.insert_one({
@@ -886,15 +949,11 @@ async def smart_reminder(request: SmartReminderRequest, background_tasks: Backgr
     
     try:
         # Get actual goal data from real database
-        group_data = await convert_goal_to_group_format(request.group_id)
+        group_data, analytics = await get_goal_snapshot(request.group_id)
         
         if not group_data:
             raise HTTPException(status_code=404, detail=f"Goal {request.group_id} not found")
         
-        if group_data is None:
-            raise HTTPException(status_code=404, detail=f"Goal {request.group_id} not found")
-        analytics = calculate_group_analytics(group_data) if group_data is not None else {}
-        
         context = {
             "group": group_data,
             "analytics": analytics,
@@ -1006,7 +1065,7 @@ async def smart_reminder(request: SmartReminderRequest, background_tasks: Backgr
                     "auto_generated": True,
                     "target_members": member_uids
                 }
-                await notifications_collection.insert_one(notification_doc)
+                await insert_notifications([notification_doc])
                 background_tasks.add_task(
                     execute_autonomous_action,
                     "auto",
@@ -1046,24 +1105,18 @@ async def smart_reminder(request: SmartReminderRequest, background_tasks: Backgr
         raise HTTPException(status_code=500, detail=f"Reminder generation failed: {str(e)}")
 
 @router.get("/smart-reminders/{id}")
-async def get_smart_reminders(id: str):
-    """Get all smart reminders for a specific group or goal (id can be group_id or goal_id)"""
-    reminders = await smart_reminders_collection.find({"$or": [{"group_id": id}, {"goal_id": id}]}).to_list(length=None)
-    # Serialize ObjectId and datetime fields for JSON compatibility
-    def serialize_reminder(doc):
-        doc = dict(doc)
-        if "_id" in doc:
-            doc["_id"] = str(doc["_id"])
-        for k, v in doc.items():
-            if hasattr(v, "isoformat"):
-                doc[k] = v.isoformat()
-        return doc
-    serialized_reminders = [serialize_reminder(r) for r in reminders]
-    return {
+async def get_smart_reminders(id: str, since: Optional[str] = None):
+    """Get smart reminders for a specific group or goal (id can be group_id or goal_id).
+
+    With since=<reminder id> only reminders created after it are returned.
+    """
+    reminders = await find_since(smart_reminders_collection, {"$or": [{"group_id": id}, {"goal_id": id}]}, parse_since(since))
+    return BSONJSONResponse({
         "query_id": id,
-        "reminders": serialized_reminders,
-        "count": len(serialized_reminders)
-    }
+        "reminders": reminders,
+        "count": len(reminders),
+        "next_since": str(reminders[-1]["_id"]) if reminders else since
+    })
 
 
 
@@ -1074,12 +1127,10 @@ async def trigger_agentic_action(group_id: str, background_tasks: BackgroundTask
     """
     try:
         # Get group data and analytics
-        group_data = await convert_goal_to_group_format(group_id)
+        group_data, analytics = await get_goal_snapshot(group_id)
         if not group_data:
             raise HTTPException(status_code=404, detail=f"Goal {group_id} not found")
         
-        analytics = calculate_group_analytics(group_data)
-        
         # Execute pure agentic action (system decides everything)
         background_tasks.add_task(
             execute_autonomous_action,
@@ -1114,85 +1165,138 @@ async def trigger_agentic_action(group_id: str, background_tasks: BackgroundTask
 # NOTIFICATION AND ACTION HISTORY ENDPOINTS
 
 @router.get("/notifications/{group_id}")
-async def get_notifications(group_id: str):
-    """Get all notifications for a specific group"""
-    
-    group_notifications = await notifications_collection.find({"group_id": group_id}).to_list(length=None)
-    # Serialize ObjectId and datetime fields for JSON compatibility
-    def serialize_notification(doc):
-        doc = dict(doc)
-        if "_id" in doc:
-            doc["_id"] = str(doc["_id"])
-        for k, v in doc.items():
-            if hasattr(v, "isoformat"):
-                doc[k] = v.isoformat()
-        return doc
-    serialized_notifications = [serialize_notification(n) for n in group_notifications]
-    return {
+async def get_notifications(group_id: str, since: Optional[str] = None):
+    """Get notifications for a specific group.
+
+    With since=<notification id> only newer notifications are returned; use
+    next_since from the previous response to poll for deltas.
+    """
+    group_notifications = await find_since(notifications_collection, {"group_id": group_id}, parse_since(since))
+    return BSONJSONResponse({
         "group_id": group_id,
-        "notifications": serialized_notifications,
-        "count": len(serialized_notifications)
-    }
+        "notifications": group_notifications,
+        "count": len(group_notifications),
+        "next_since": str(group_notifications[-1]["_id"]) if group_notifications else since
+    })
 
 @router.get("/executed-actions/{group_id}")
-async def get_executed_actions(group_id: str):
-    """Get history of all autonomous actions executed for a group"""
+async def get_executed_actions(group_id: str, since: Optional[str] = None):
+    """Get history of autonomous actions executed for a group (newer than since, if given)"""
     
-    group_actions = await executed_actions_collection.find({"group_id": group_id}).to_list(length=None)
+    group_actions = await find_since(executed_actions_collection, {"group_id": group_id}, parse_since(since))
     
-    return {
+    return BSONJSONResponse({
         "group_id": group_id,
         "executed_actions": group_actions,
-        "count": len(group_actions)
-    }
+        "count": len(group_actions),
+        "next_since": str(group_actions[-1]["_id"]) if group_actions else since
+    })
+
+def dashboard_goal_pipeline(now: datetime) -> list:
+    """Per-goal dashboard rows computed server-side; mirrors calculate_group_analytics."""
+    return [
+        {"$lookup": {
+            "from": pool_status_collection.name,
+            "localField": "goal_id",
+            "foreignField": "goal_id",
+            "pipeline": [{"$project": {"current_amount": 1, "contributor_count": CONTRIBUTOR_COUNT_EXPR}}],
+            "as": "pool"
+        }},
+        {"$lookup": {
+            "from": groups_collection.name,
+            "localField": "group_id",
+            "foreignField": "group_id",
+            "pipeline": [{"$project": {"member_count": 1}}],
+            "as": "group"
+        }},
+        {"$set": {"pool": {"$ifNull": [{"$first": "$pool"}, {}]}, "group": {"$ifNull": [{"$first": "$group"}, {}]}}},
+        {"$set": {
+            "current_amount": {"$ifNull": ["$pool.current_amount", 0.0]},
+            "goal_amount": {"$ifNull": ["$goal_amount", 0.0]},
+            # Date-only deadlines count to the end of that day, like calculate_group_analytics
+            "deadline": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": [{"$type": "$target_date"}, "date"]},
+                     "then": {"$add": ["$target_date", 86399000]}},
+                    {"case": {"$and": [
+                        {"$eq": [{"$type": "$target_date"}, "string"]},
+                        {"$regexMatch": {"input": "$target_date", "regex": "T"}}
+                    ]}, "then": {"$dateFromString": {"dateString": "$target_date", "onError": None}}},
+                    {"case": {"$eq": [{"$type": "$target_date"}, "string"]},
+                     "then": {"$add": [{"$dateFromString": {"dateString": "$target_date", "onError": None}}, 86399000]}},
+                ],
+                "default": None
+            }}
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": "$goal_id",
+            "title": {"$ifNull": ["$title", "Untitled Goal"]},
+            "status": {"$ifNull": ["$status", "unknown"]},
+            "progress_percentage": {"$cond": [
+                {"$gt": ["$goal_amount", 0]},
+                {"$round": [{"$multiply": [{"$divide": ["$current_amount", "$goal_amount"]}, 100]}, 2]},
+                0
+            ]},
+            "days_remaining": {"$ifNull": [
+                {"$floor": {"$divide": [{"$subtract": ["$deadline", now]}, 86400000]}},
+                0
+            ]},
+            # Goals outside a group have only their creator, like build_group_data
+            "members": {"$ifNull": ["$group.member_count", 1]},
+            "contributors": {"$ifNull": ["$pool.contributor_count", 0]},
+            "goal_amount": 1,
+            "current_amount": 1
+        }}
+    ]
 
 @router.get("/dashboard-summary")
-async def get_dashboard_summary():
-    """Get dashboard summary with all goals and system analytics"""
-    
+@uses_analytics_reads
+async def get_dashboard_summary(
+    group_id: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200)
+):
+    """Get dashboard summary with goals and system analytics in one aggregation"""
+    # Goals without a goal_id cannot be listed, so they are not counted either
+    match = {"goal_id": {"$exists": True}}
+    if group_id:
+        match["group_id"] = group_id
+    pipeline = [
+        {"$match": match},
+        {"$facet": {
+            "status_counts": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "goals": [{"$sort": {"_id": 1}}, {"$skip": skip}, {"$limit": limit}, *dashboard_goal_pipeline(datetime.now())]
+        }}
+    ]
+    # Other collections only need totals: from collection metadata for the whole
+    # system, counted on their group_id indexes for one group
+    other_collections = (notifications_collection, executed_actions_collection, smart_reminders_collection)
+    facets, total_notifications, total_executed_actions, total_reminders = await asyncio.gather(
+        goals_collection.aggregate(pipeline).to_list(length=1),
+        *(
+            collection.count_documents({"group_id": group_id}) if group_id else collection.estimated_document_count()
+            for collection in other_collections
+        )
+    )
+    facet = facets[0] if facets else {"status_counts": [], "goals": []}
+    status_counts = {row["_id"]: row["count"] for row in facet["status_counts"]}
+    total_goals = sum(status_counts.values())
+
     summary = {
-        "total_goals": await goals_collection.count_documents({}),
-        "active_goals": await goals_collection.count_documents({"status": "active"}),
-        "completed_goals": await goals_collection.count_documents({"status": "completed"}),
-        "awaiting_payment_goals": await goals_collection.count_documents({"status": "awaiting_payment"}),
-        "total_notifications": await notifications_collection.count_documents({}),
-        "total_executed_actions": await executed_actions_collection.count_documents({}),  
-        "total_reminders": await smart_reminders_collection.count_documents({}),      
-        "goals": []
+        "total_goals": total_goals,
+        "active_goals": status_counts.get("active", 0),
+        "completed_goals": status_counts.get("completed", 0),
+        "awaiting_payment_goals": status_counts.get("awaiting_payment", 0),
+        "total_notifications": total_notifications,
+        "total_executed_actions": total_executed_actions,
+        "total_reminders": total_reminders,
+        "goals": facet["goals"]
     }
     
-    # Add analytics for each goal
-    async for goal_doc in goals_collection.find():  # Iterate over all goals in the collection
-        try:
-            goal_id = str(goal_doc["goal_id"])  # Ensure goal_id is a string (ObjectId conversion)
-            
-            # Step 1: Convert goal to group format
-            group_data = await convert_goal_to_group_format(goal_id)
-            if not group_data:
-                continue  # Skip if conversion fails
-
-            # Step 2: Calculate analytics (with defaults for missing data)
-            goal_analytics = calculate_group_analytics(group_data) or {}
-            
-            # Step 3: Append structured summary (using .get() for safe access)
-            summary["goals"].append({
-                "id": goal_id,
-                "title": goal_doc.get("title", "Untitled Goal"),
-                "status": goal_doc.get("status", "unknown"),
-                "progress_percentage": goal_analytics.get("progress_percentage", 0),
-                "days_remaining": goal_analytics.get("days_remaining", 0),
-                "members": len(group_data.get("members", [])),
-                "contributors": goal_analytics.get("contributors", 0),
-                "goal_amount": goal_doc.get("goal_amount", 0.0),
-                "current_amount": group_data.get("current_amount", 0.0)
-            })
-
-        except Exception as e:
-            logger.error(f"Failed to process goal {goal_id}: {str(e)}")
-            continue  # Skip problematic goals
-    
     return {
         "dashboard_summary": summary,
+        "pagination": {"skip": skip, "limit": limit, "total": total_goals, "group_id": group_id},
         "generated_at": datetime.now().isoformat()
     }
 
@@ -1213,10 +1317,9 @@ async def create_test_scenario_with_group():
         await add_realistic_test_contributions(goal_id, 0.6)
         
         # Get analytics for verification
-        group_data = await convert_goal_to_group_format(goal_id)
+        group_data, analytics = await get_goal_snapshot(goal_id)
         if not group_data:
             raise HTTPException(status_code=404, detail=f"Goal {goal_id} not found")
-        analytics = calculate_group_analytics(group_data)
         
         # Get pool status to check contributors
         pool_status = await pool_status_collection.find_one({"goal_id": goal_id})
@@ -1259,12 +1362,10 @@ async def test_agentic_workflow(goal_id: str):
             raise HTTPException(status_code=404, detail=f"Goal {goal_id} not found")
         
         # Get group data
-        group_data = await convert_goal_to_group_format(goal_id)
+        group_data, analytics = await get_goal_snapshot(goal_id)
         if not group_data:
             raise HTTPException(status_code=404, detail=f"Could not convert goal {goal_id} to group format")
         
-        analytics = calculate_group_analytics(group_data)
-        
         # Simulate AI analysis (removed comprehensive analysis endpoint)
         ai_actions = create_fallback_actions(group_data, analytics)
         
@@ -6,6 +6,7 @@ from typing import List, Optional, Dict, Any
 from . import mongo
 from .verify_token import verify_token
 from .mongo import plans_collection, goals_collection
+from .member_quotas import quota_owner, get_member_quota as find_member_quota, allocate_member_quotas
 
 logging.basicConfig(level=logging.INFO)
 
@@ -16,6 +17,7 @@ class MemberQuota(BaseModel):
     id: str
     name: Optional[str] = None
     quota: float
+    version: Optional[int] = None  # send the version you read to reject concurrent edits
 
 class AllocateQuotasRequest(BaseModel):
     plan_id: Optional[str] = None
@@ -30,20 +32,20 @@ async def test_alive():
 
 @router.get("/quota/{goal_id}/{user_id}")
 async def get_member_quota(goal_id: str, user_id: str, plan_id: Optional[str] = None):
-    doc = None
-    if plan_id:
-        doc = await plans_collection.find_one({"plan_id": str(plan_id)})
-        if not doc:
-            raise HTTPException(status_code=404, detail="Plan not found")
-    else:
-        doc = await goals_collection.find_one({"goal_id": str(goal_id)})
-        if not doc:
-            raise HTTPException(status_code=404, detail="Goal not found")
+    owner_type, owner_id = quota_owner(plan_id, goal_id)
+    quota = await find_member_quota(owner_type, owner_id, user_id)
+    if quota:
+        return {"quota": quota.get("quota", 0), "version": quota.get("version")}
+    # Only a miss needs the owner lookup, to tell "no quota" from "no such goal"
+    await ensure_quota_owner(owner_type, owner_id)
+    return {"quota": 0, "version": None}
 
-    for m in doc.get("members", []):
-        if str(m.get("id")) == str(user_id):
-            return {"quota": m.get("quota", 0)}
-    return {"quota": 0}
+async def ensure_quota_owner(owner_type: str, owner_id: str):
+    if owner_type == "plan":
+        if not await plans_collection.find_one({"plan_id": owner_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Plan not found")
+    elif not await goals_collection.find_one({"goal_id": owner_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Goal not found")
 
 async def update_member_quotas(plan_id: Optional[str] = None, goal_id: Optional[str] = None, members: Optional[List[Dict[str, Any]]] = None):
     if not plan_id and not goal_id:
@@ -51,37 +53,19 @@ async def update_member_quotas(plan_id: Optional[str] = None, goal_id: Optional[
     if members is None or len(members) == 0:
         raise HTTPException(status_code=400, detail="members list cannot be empty")
 
-    if plan_id:
-        doc = await plans_collection.find_one({"plan_id": plan_id})
-        collection, id_field, id_value, not_found_msg = plans_collection, "plan_id", plan_id, "Plan not found"
-    else:
-        doc = await goals_collection.find_one({"goal_id": goal_id})
-        collection, id_field, id_value, not_found_msg = goals_collection, "goal_id", goal_id, "Goal not found"
-
-    if not doc:
-        raise HTTPException(status_code=404, detail=not_found_msg)
-
-    if "members" not in doc or not isinstance(doc["members"], list):
-        doc["members"] = []
-
-    updated_members = []
-    for m in members:
-        found = False
-        for dm in doc["members"]:
-            if dm.get("id") == m["id"]:
-                dm["quota"] = m["quota"]
-                found = True
-                updated_members.append(dm)
-                break
-        if not found:
-            new_member = {"id": m["id"], "name": m.get("name", ""), "quota": m["quota"]}
-            doc["members"].append(new_member)
-            updated_members.append(new_member)
-
-    await collection.update_one({id_field: id_value}, {"$set": {"members": doc["members"]}})
-    return updated_members
+    owner_type, owner_id = quota_owner(plan_id, goal_id)
+    await ensure_quota_owner(owner_type, owner_id)
+    return await allocate_member_quotas(owner_type, owner_id, members)
 
 @router.post("/quotas")
 async def allocate_quotas(req: AllocateQuotasRequest, request: Request, user=Depends(verify_token)):
-    updated_members = await update_member_quotas(plan_id=req.plan_id, goal_id=req.goal_id, members=[m.dict() for m in req.members])
-    return {"success": True, "updated_members": updated_members}
+    """Set quotas for any number of members in one call.
+
+    Members sent with a version are only changed if nobody else changed them
+    since; those come back in conflicts with the stored values and the
+    request answers 409 unless some members were still updated.
+    """
+    result = await update_member_quotas(plan_id=req.plan_id, goal_id=req.goal_id, members=[m.model_dump() for m in req.members])
+    if result["conflicts"] and not result["updated_members"]:
+        return JSONResponse(status_code=409, content={"success": False, **result})
+    return {"success": not result["conflicts"], **result}
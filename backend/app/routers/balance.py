@@ -12,6 +12,7 @@ class VirtualBalanceCreate(BaseModel):
 from fastapi import APIRouter, Depends, HTTPException
 from .mongo import users_collection, virtual_balances_collection
 from .verify_token import verify_token
+from .responses import BSONJSONResponse
 
 router = APIRouter(prefix="/balance", tags=["balance"])
 
@@ -41,17 +42,13 @@ async def get_balance_by_uid(owner_uid: str, user=Depends(verify_token)):
 		"owner_uid": owner_uid,
 		"status": {"$ne": "used"}
 	}).to_list(length=None)
-	# Convert ObjectId to string for each balance
-	for b in balances:
-		if "_id" in b:
-			b["_id"] = str(b["_id"])
 	total_balance = sum(b.get("amount", 0) for b in balances)
-	return {
+	return BSONJSONResponse({
 		"user_uid": owner_uid,
 		"balance_types": list(set(b.get("type") for b in balances if "type" in b)),
 		"total_balance": total_balance,
 		"virtual_balances": balances
-	}
+	})
 
 
 
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from pymongo.write_concern import WriteConcern
+
+from .mongo import migration_checkpoints_collection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Backfills that run while the app serves traffic. A collection is cut into
+# _id ranges (boundaries come from the _id index), up to `concurrency` ranges
+# are processed at once, and their writes go out as unordered bulk_writes
+# through a shared rate limit with majority write concern, so a large
+# backfill keeps replication in step and leaves room on the primary for
+# contributions. Progress is checkpointed in migration_checkpoints after
+# every contiguous run of finished ranges; --resume continues from there.
+# Scripts run migrations inside mongo.background_pool().
+
+MIGRATION_CONFIG = {
+    "batch_size": int(os.getenv("MIGRATION_BATCH_SIZE", 500)),
+    "concurrency": int(os.getenv("MIGRATION_CONCURRENCY", 4)),
+    "writes_per_second": float(os.getenv("MIGRATION_WRITES_PER_SECOND", 1000)),  # 0 = unlimited
+    "write_concern": os.getenv("MIGRATION_WRITE_CONCERN", "majority"),
+    "report_limit": 20,
+}
+
+class MigrationBatch:
+    """What one range produced: writes to apply in order, counters and report lines."""
+
+    def __init__(self):
+        self.writes: List[Tuple[object, list]] = []
+        self.stats = Counter()
+        self.notes: List[str] = []
+
+    def write(self, collection, operations: list):
+        if operations:
+            self.writes.append((collection, operations))
+
+class WriteRateLimiter:
+    """Spaces bulk writes so that, across all ranges, at most `per_second` operations go out."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = 0.0
+
+    async def acquire(self, operations: int):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        start = max(now, self._next)
+        self._next = start + operations * self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+def in_range(id_range: dict, query: Optional[dict] = None) -> dict:
+    return {**(query or {}), "_id": id_range}
+
+async def id_ranges(collection, start_after, batch_size: int):
+    """Yield consecutive _id range filters ({"$gt": lower, "$lte": upper}) of up to batch_size documents."""
+    lower = start_after
+    while True:
+        query = {"_id": {"$gt": lower}} if lower is not None else {}
+        last = await collection.find(query, {"_id": 1}).sort("_id", 1).skip(batch_size - 1).limit(1).to_list(length=1)
+        if not last:
+            # Tail: whatever is left is smaller than a batch
+            last = await collection.find(query, {"_id": 1}).sort("_id", -1).limit(1).to_list(length=1)
+            if last:
+                yield {**query.get("_id", {}), "$lte": last[0]["_id"]}
+            return
+        yield {**query.get("_id", {}), "$lte": last[0]["_id"]}
+        lower = last[0]["_id"]
+
+async def load_checkpoint(name: str) -> Optional[dict]:
+    return await migration_checkpoints_collection.find_one({"_id": name})
+
+async def save_checkpoint(name: str, fields: dict):
+    await migration_checkpoints_collection.update_one(
+        {"_id": name},
+        {"$set": {**fields, "updated_at": datetime.now().isoformat()}},
+        upsert=True,
+    )
+
+async def run_migration(
+    name: str,
+    collection,
+    process: Callable[[dict], Awaitable[MigrationBatch]],
+    *,
+    dry_run: bool = False,
+    resume: bool = False,
+    reset: bool = False,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    writes_per_second: Optional[float] = None,
+    report_limit: Optional[int] = None,
+) -> MigrationBatch:
+    """Run `process` over every _id range of `collection` and apply the writes it returns.
+
+    `process` gets the range's _id filter, reads what it needs and returns a
+    MigrationBatch; it must be idempotent, since a range that was running
+    when the script stopped is processed again on --resume. With dry_run the
+    writes are counted but not applied and no checkpoint is kept. Returns
+    the totals (stats, first report_limit notes).
+    """
+    batch_size = batch_size or MIGRATION_CONFIG["batch_size"]
+    concurrency = concurrency or MIGRATION_CONFIG["concurrency"]
+    report_limit = MIGRATION_CONFIG["report_limit"] if report_limit is None else report_limit
+    limiter = WriteRateLimiter(MIGRATION_CONFIG["writes_per_second"] if writes_per_second is None else writes_per_second)
+    write_concern = WriteConcern(w=MIGRATION_CONFIG["write_concern"])
+
+    if reset and not dry_run:
+        await migration_checkpoints_collection.delete_one({"_id": name})
+    checkpoint = (await load_checkpoint(name) if resume else None) or {}
+    start_after = checkpoint.get("last_id")
+    if start_after is not None:
+        logger.info(f"⏩ {name}: resuming after _id {start_after}")
+    total = MigrationBatch()
+    total.stats.update(checkpoint.get("stats") or {})
+
+    semaphore = asyncio.Semaphore(concurrency)
+    checkpoint_lock = asyncio.Lock()
+    # Range upper bounds in dispatch order; the checkpoint only moves past a
+    # range once every range before it has finished too
+    pending, done = [], set()
+
+    async def apply(batch: MigrationBatch):
+        for target, operations in batch.writes:
+            batch.stats["writes"] += len(operations)
+            if dry_run:
+                continue
+            await limiter.acquire(len(operations))
+            result = await target.with_options(write_concern=write_concern).bulk_write(operations, ordered=False)
+            # Compare-and-set updates whose document changed since it was read
+            batch.stats["unmatched"] += len(operations) - result.matched_count - result.upserted_count
+
+    async def run_range(index: int, id_range: dict):
+        try:
+            batch = await process(id_range)
+            await apply(batch)
+            batch.stats["ranges"] += 1
+            total.stats.update(batch.stats)
+            total.notes.extend(batch.notes[:max(0, report_limit - len(total.notes))])
+            done.add(index)
+            finished = None
+            while pending and pending[0][0] in done:
+                _, finished = pending.pop(0)
+            if finished is not None and not dry_run:
+                async with checkpoint_lock:
+                    # Pops happen in order and saves are serialised, so this never moves backwards
+                    await save_checkpoint(name, {"last_id": finished, "stats": dict(total.stats), "completed_at": None})
+        finally:
+            semaphore.release()
+
+    started = time.perf_counter()
+    tasks = []
+    try:
+        async for id_range in id_ranges(collection, start_after, batch_size):
+            await semaphore.acquire()
+            if any(task.done() and task.exception() for task in tasks):
+                break  # stop dispatching; gather re-raises the failure
+            pending.append((len(tasks), id_range["$lte"]))
+            tasks.append(asyncio.create_task(run_range(len(tasks), id_range)))
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if not dry_run:
+        await save_checkpoint(name, {"stats": dict(total.stats), "completed_at": datetime.now().isoformat()})
+    logger.info(
+        f"✅ {name}{' (dry run)' if dry_run else ''}: {total.stats['ranges']} ranges, "
+        f"{total.stats['writes']} writes in {time.perf_counter() - started:.1f}s"
+    )
+    return total
+
+def add_migration_arguments(parser):
+    """The command-line options every migration script shares."""
+    parser.add_argument("--dry-run", action="store_true")
+    checkpoint_mode = parser.add_mutually_exclusive_group()
+    checkpoint_mode.add_argument("--resume", action="store_true", help="continue after the last checkpoint")
+    checkpoint_mode.add_argument("--reset", action="store_true", help="forget the checkpoint and start over")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_CONFIG["batch_size"])
+    parser.add_argument("--concurrency", type=int, default=MIGRATION_CONFIG["concurrency"])
+    parser.add_argument("--writes-per-second", type=float, default=MIGRATION_CONFIG["writes_per_second"], help="0 = unlimited")
+    parser.add_argument("--report-limit", type=int, default=MIGRATION_CONFIG["report_limit"])
+
+def migration_options(args) -> dict:
+    """run_migration keyword arguments from the parsed add_migration_arguments options."""
+    return {
+        "dry_run": args.dry_run,
+        "resume": args.resume,
+        "reset": args.reset,
+        "batch_size": args.batch_size,
+        "concurrency": args.concurrency,
+        "writes_per_second": args.writes_per_second,
+        "report_limit": args.report_limit,
+    }
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from .ai_client import get_ai_client
 from pymongo import ReturnDocument
 from .mongo import conversations_collection
+from .metrics import observe_llm_call
 from datetime import datetime
 from pydantic import BaseModel
 from typing import Optional, List, Dict
@@ -76,12 +77,14 @@ async def ask_ai(chat_request: ChatRequest, ai_client=Depends(get_ai_client)):
         raise HTTPException(status_code=500, detail="Conversation not found or messages missing.")
     
     # Generate AI response
-    response = await ai_client.chat.completions.create(
-        model="deepseek/deepseek-chat",
-        messages=[{k: m[k] for k in ("role", "content")} for m in updated_conversation["messages"]],
-        max_tokens=1000,
-        temperature=0.3,
-    )
+    with observe_llm_call("chatbot") as call:
+        response = await ai_client.chat.completions.create(
+            model="deepseek/deepseek-chat",
+            messages=[{k: m[k] for k in ("role", "content")} for m in updated_conversation["messages"]],
+            max_tokens=1000,
+            temperature=0.3,
+        )
+        call["usage"] = response.usage
     
     # Add AI response to conversation
     ai_message = {
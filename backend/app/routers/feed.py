@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List
+import asyncio
+import logging
+
+from .mongo import goals_collection
+from .group_membership import count_member_groups
+from .progress_feed import progress_feed, goal_progress_event, encode_event
+from .verify_token import verify_token
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/feed", tags=["feed"])
+
+HEARTBEAT_SECONDS = 15
+
+async def feed_events(request: Request, group_ids: List[str]):
+    subscription = progress_feed.subscribe(group_ids)
+    try:
+        # Current state first, so the client never has to re-fetch goals to start
+        async for goal in goals_collection.find(
+            {"group_id": {"$in": group_ids}},
+            {"goal_id": 1, "group_id": 1, "title": 1, "status": 1, "current_amount": 1, "goal_amount": 1}
+        ):
+            yield encode_event(goal_progress_event(goal, "snapshot"))
+        while not await request.is_disconnected():
+            try:
+                yield await asyncio.wait_for(subscription.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+    finally:
+        progress_feed.unsubscribe(subscription)
+        if subscription.dropped:
+            logger.info(f"Progress feed subscriber for {group_ids} dropped {subscription.dropped} events")
+
+@router.get("/goals")
+async def stream_goal_progress(request: Request, group_id: List[str] = Query(...), user=Depends(verify_token)):
+    """Server-sent progress, milestone and status events for the goals of the given groups."""
+    uid = user.get("uid")
+    member_groups = await count_member_groups(uid, set(group_id))
+    if member_groups < len(set(group_id)):
+        raise HTTPException(status_code=403, detail="Not a member of every requested group")
+    return StreamingResponse(
+        feed_events(request, group_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -2,9 +2,17 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, field_validator
 from typing import Dict, List, Optional, Union
 from datetime import datetime, date, timedelta
-from .mongo import users_collection, goals_collection, pool_status_collection, pending_goals_collection, auto_payment_queue_collection, virtual_balances_collection, notifications_collection, request_collection
+from .mongo import uses_analytics_reads, users_collection, goals_collection, pool_status_collection, pending_goals_collection, auto_payment_queue_collection, virtual_balances_collection, request_collection
 from .verify_token import verify_token
 from .ai_tools_clean import notify_group_members_new_goal
+from .goal_calendar import to_target_datetime, add_to_current_amount
+from .goal_snapshots import invalidate_goal_snapshot, REVISION_BUMP
+from .notification_store import insert_notifications
+from .responses import BSONJSONResponse, model_list_response
+from .member_quotas import settle_member_quota
+from .pool_totals import record_pool_contribution, member_total, uid_key
+from .group_stats import record_goal_created, record_goal_deleted, record_goal_status_change, record_contribution
+from pymongo.errors import DuplicateKeyError
 import uuid
 import logging
 import asyncio
@@ -113,7 +121,7 @@ async def notify_contributors_of_completion(goal_id: str, confirmation: dict):
                 "contributors_count": len(contributors)
             }
         }
-        await notifications_collection.insert_one(ai_notification)
+        await insert_notifications([ai_notification])
         logger.info(f"✅ Auto payment success notification sent to AI tools system for goal {goal_id}")
     except ImportError:
         logger.warning("AI tools notification system not available")
@@ -148,7 +156,7 @@ async def notify_manager_of_request(request_id: str, request_data: Dict):
             }
         }
         
-        await notifications_collection.insert_one(manager_notification)
+        await insert_notifications([manager_notification])
         logger.info(f"📧 Manager notification sent for request {request_id}")
         
     except ImportError:
@@ -180,7 +188,7 @@ async def notify_member_of_request_response(request_id: str, response_data: Dict
             }
         }
         
-        await notifications_collection.insert_one(member_notification)
+        await insert_notifications([member_notification])
         logger.info(f"💬 Member notification sent for request response {request_id}")
         
     except ImportError:
@@ -222,7 +230,7 @@ async def notify_goal_approval_decision(goal_id: str, approval_data: Dict):
             }
         }
         
-        await notifications_collection.insert_one(approval_notification)
+        await insert_notifications([approval_notification])
         logger.info(f"🎯 Goal approval notification sent for goal {goal_id}: {approval_data['action']}")
         
     except ImportError:
@@ -264,7 +272,7 @@ async def notify_managers_of_pending_goal(goal_id: str, goal_data: Dict):
                 }
             }
             
-            await notifications_collection.insert_one(manager_notification)
+            await insert_notifications([manager_notification])
         
         logger.info(f"⏳ Pending goal notifications sent to {len(managers)} managers for goal {goal_id}")
         
@@ -316,6 +324,8 @@ class goal(BaseModel):
     @field_validator('target_date', mode='before')
     @classmethod
     def validate_target_date(cls, v):
+        if isinstance(v, datetime):
+            return v.date()
         if isinstance(v, str):
             try:
                 # Try to parse ISO format date string
@@ -340,6 +350,8 @@ class pendingGoal(BaseModel):
     @field_validator('target_date', mode='before')
     @classmethod
     def validate_target_date(cls, v):
+        if isinstance(v, datetime):
+            return v.date()
         if isinstance(v, str):
             try:
                 # Try to parse ISO format date string
@@ -366,6 +378,41 @@ class pendingGoalResponse(BaseModel):
     status: str
     pending_goal: pendingGoal 
 
+# Goal payout state machine: target status -> statuses it may be entered from.
+#   active -> awaiting_payment | awaiting_auto_payment -> completed
+# Every transition is a conditional update on the goal's current status, so
+# when concurrent contributions cross the target only one caller wins it.
+GOAL_TRANSITIONS = {
+    "awaiting_payment": ("active", "awaiting_auto_payment"),
+    "awaiting_auto_payment": ("active",),
+    "completed": ("active", "awaiting_payment", "awaiting_auto_payment"),
+    "active": ("awaiting_payment", "awaiting_auto_payment", "cancelled"),
+    "cancelled": ("active", "awaiting_payment", "awaiting_auto_payment"),
+}
+
+async def transition_goal_status(goal_id: str, status: str, from_statuses: Optional[tuple] = None, extra: Optional[dict] = None) -> bool:
+    """Move a goal to status if it is currently in from_statuses; returns False if another caller got there first.
+
+    The goal document is authoritative; pool_status mirrors it and gets its
+    snapshot revision bumped.
+    """
+    allowed = list(from_statuses if from_statuses is not None else GOAL_TRANSITIONS[status])
+    if "active" in allowed:
+        allowed.append(None)  # goals created before status was always written
+    fields = {"status": status, **(extra or {})}
+    # The pre-image tells us which status counter of the group to move
+    previous = await goals_collection.find_one_and_update(
+        {"goal_id": goal_id, "status": {"$in": allowed}},
+        {"$set": fields},
+        projection={"status": 1, "group_id": 1}
+    )
+    if previous is None:
+        return False
+    await pool_status_collection.update_one({"goal_id": goal_id}, {"$set": fields, "$inc": REVISION_BUMP})
+    invalidate_goal_snapshot(goal_id)
+    await record_goal_status_change(previous.get("group_id"), previous.get("status"), status)
+    return True
+
 async def process_bank_free_auto_payment(goal_id: str) -> dict:
     goal_item = await goals_collection.find_one({"goal_id": goal_id})
     if not goal_item:
@@ -386,22 +433,33 @@ async def process_bank_free_auto_payment(goal_id: str) -> dict:
     if settings.get("payment_method") == PaymentMethod.VIRTUAL_BALANCE:
         threshold = settings.get("auto_complete_threshold")
         if threshold and amount <= threshold:
-            return await process_virtual_balance_payment(goal_id)
+            return await process_virtual_balance_payment(goal_id, from_statuses=("active",))
 
     # Require confirmation case
     if settings.get("require_confirmation", True):
-        auto_payment_queue = {
-            "goal_id": goal_id,
-            "goal": goal_item,
-            "amount": amount,
-            "timestamp": datetime.now().isoformat(),
-            "status": "awaiting_confirmation"
-        }
-        await auto_payment_queue_collection.insert_one(auto_payment_queue)
-        await goals_collection.update_one(
-            {"goal_id": goal_id},
-            {"$set": {"status": "awaiting_auto_payment"}}
-        )
+        if not await transition_goal_status(goal_id, "awaiting_auto_payment"):
+            current = await goals_collection.find_one({"goal_id": goal_id}, {"status": 1}) or {}
+            return {
+                "message": "Auto payment already in progress",
+                "requires_confirmation": current.get("status") == "awaiting_auto_payment",
+                "status": current.get("status")
+            }
+        # One queue entry per goal (unique goal_id index); the goal itself is looked up by id
+        try:
+            await auto_payment_queue_collection.update_one(
+                {"goal_id": goal_id},
+                {"$setOnInsert": {
+                    "goal_id": goal_id,
+                    "goal_title": goal_item.get("title", "Untitled Goal"),
+                    "group_id": goal_item.get("group_id"),
+                    "amount": amount,
+                    "timestamp": datetime.now().isoformat(),
+                    "status": "awaiting_confirmation"
+                }},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            pass
         return {
             "message": "Awaiting manager confirmation",
             "requires_confirmation": True,
@@ -411,8 +469,14 @@ async def process_bank_free_auto_payment(goal_id: str) -> dict:
     return {"error": "Auto payment configuration invalid"}
 
 
-async def process_virtual_balance_payment(goal_id: str) -> Dict:
-    """Process payment using virtual balance system"""
+async def process_virtual_balance_payment(goal_id: str, from_statuses: tuple = GOAL_TRANSITIONS["completed"]) -> Dict:
+    """Process payment using virtual balance system.
+
+    The payout is recorded as pending (upsert keyed by payout_id) before the
+    completed transition is claimed and released afterwards, so a paid goal
+    always has its payout record. Calling again for a goal that is already
+    completed and paid releases a payout left pending, never adds a second one.
+    """
 
     # Fetch goal and pool data
     goal_item = await goals_collection.find_one({"goal_id": goal_id})
@@ -421,36 +485,61 @@ async def process_virtual_balance_payment(goal_id: str) -> Dict:
 
     pool_data = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
     amount = float(pool_data.get("current_amount", 0))
+    contributors = pool_data.get("contributors", [])
 
     # Defensive: check for required fields
     title = goal_item.get("title", "Untitled Goal")
-
-    # Transfer to virtual payout balance
     payout_id = f"payout_{goal_id}"
-    virtual_balances = {
+    payout_doc = {
         "payout_id": payout_id,
         "amount": amount,
         "goal_title": title,
-        "status": "ready_for_external_payment",
         "created_at": datetime.now().isoformat()
     }
-    await virtual_balances_collection.insert_one(virtual_balances)
 
-    # Mark goal as completed immediately (virtual transfer)
-    await goals_collection.update_one(
-        {"goal_id": goal_id},
-        {"$set": {"status": "completed", "is_paid": True}}
+    # Record the payout before the goal is marked paid
+    placeholder = await virtual_balances_collection.update_one(
+        {"payout_id": payout_id},
+        {"$setOnInsert": {**payout_doc, "status": "pending"}},
+        upsert=True
     )
-    await pool_status_collection.update_one(
-        {"goal_id": goal_id},
-        {"$set": {"status": "completed", "is_paid": True}}
+
+    # Mark goal as completed immediately (virtual transfer)
+    claimed = await transition_goal_status(goal_id, "completed", from_statuses, {"is_paid": True})
+    if not claimed:
+        current = await goals_collection.find_one({"goal_id": goal_id}, {"status": 1, "is_paid": 1}) or {}
+        if not (current.get("status") == "completed" and current.get("is_paid")):
+            if placeholder.upserted_id is not None:
+                await virtual_balances_collection.delete_one({"_id": placeholder.upserted_id, "status": "pending"})
+            raise HTTPException(status_code=409, detail=f"Goal cannot be paid out from status '{current.get('status')}'")
+
+    # Transfer to virtual payout balance
+    released = await virtual_balances_collection.update_one(
+        {"payout_id": payout_id, "status": "pending"},
+        {"$set": {"status": "ready_for_external_payment"}}
     )
+    if not released.matched_count:
+        # Already released, or the placeholder was removed by a caller that lost the race
+        await virtual_balances_collection.update_one(
+            {"payout_id": payout_id},
+            {"$setOnInsert": {**payout_doc, "status": "ready_for_external_payment"}},
+            upsert=True
+        )
     await auto_payment_queue_collection.delete_one({"goal_id": goal_id})
+    payout = await virtual_balances_collection.find_one({"payout_id": payout_id}, {"amount": 1}) or {}
+    amount = float(payout.get("amount", amount))
+
+    if not claimed:
+        return {
+            "message": f"Virtual payment already completed for '{title}'",
+            "payout_balance_id": payout_id,
+            "amount": amount,
+            "status": "completed",
+            "note": "Funds transferred to virtual payout balance"
+        }
 
     # Send success notification to AI tools system
     try:
-        contributors_doc = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
-        contributors = contributors_doc.get("contributors", [])
         ai_notification = {
             "id": f"auto_payment_success_{goal_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
             "type": "auto_payment_success",
@@ -477,10 +566,8 @@ async def process_virtual_balance_payment(goal_id: str) -> Dict:
                 "payment_method": "virtual_balance"
             }
         }
-        await notifications_collection.insert_one(ai_notification)
+        await insert_notifications([ai_notification])
         logger.info(f"✅ Auto payment success notification sent to AI tools system for goal {goal_id}")
-    except ImportError:
-        logger.warning("AI tools notification system not available")
     except Exception as e:
         logger.error(f"Failed to send auto payment notification to AI tools: {str(e)}")
 
@@ -537,15 +624,21 @@ async def create_goal(goal_data: goalCreate, user=Depends(verify_token)):
             goal_dict['creator_uid'] = user.get('uid') if user else None
             if not goal_dict.get('target_date') and goal_dict.get('dueDate'):
                 goal_dict['target_date'] = goal_dict['dueDate']
-            if isinstance(goal_dict.get('target_date'), date):
-                goal_dict['target_date'] = goal_dict['target_date'].isoformat()
+            goal_dict['target_date'] = to_target_datetime(goal_dict.get('target_date')) or goal_dict.get('target_date')
+            goal_dict['current_amount'] = 0.0
+            goal_dict['progress_ratio'] = 0.0
+            goal_dict['status'] = "active"
+            goal_dict['is_paid'] = False
             await goals_collection.insert_one(goal_dict)
+            await record_goal_created(goal_dict.get('group_id'))
             pool_status = {
                 "goal_id": goal_id,
                 "current_amount": 0.0,
                 "is_paid": False,
                 "status": "active",
-                "contributors": []
+                "contributors": [],
+                "totals_by_uid": {},
+                "contributor_count": 0
             }
             await pool_status_collection.insert_one(pool_status)
             # Notify group members about new goal
@@ -603,6 +696,7 @@ async def create_goal(goal_data: goalCreate, user=Depends(verify_token)):
         # )
 
 @router.get("/pending", response_model=List[pendingGoal])
+@uses_analytics_reads
 async def get_pending_goals(user=Depends(verify_token)):
     logger.info(f"🎯 MANAGER REQUEST: Getting pending goals for manager")
     # Only managers should see pending goals
@@ -635,43 +729,15 @@ async def get_pending_goals(user=Depends(verify_token)):
     for i, p in enumerate(all_pendings):
         logger.info(f"  {i+1}. Title: '{p.get('title', 'No title')}' | Status: '{p.get('status', 'No status')}' | ID: {p.get('goal_id', 'No ID')}")
 
-    # Filter and validate pending goals, skip invalid ones and non-pending goals
-    valid_pending_goals = []
+    # Provide default values for missing required fields, then validate all rows
+    # in one pass; invalid ones are skipped
     for pending in pendings:
-        try:
-            # Skip goals that are not pending
-            if pending.get('status') != 'pending':
-                logger.info(f"Skipping goal {pending.get('goal_id', 'unknown')} with status: {pending.get('status')}")
-                continue
-                
-            # Remove MongoDB's _id field if present
-            if '_id' in pending:
-                del pending['_id']
-            
-            # Provide default values for missing required fields
-            if 'goal_type' not in pending:
-                pending['goal_type'] = 'Savings'  # Default goal type
-            
-            if 'description' not in pending:
-                pending['description'] = ''
-                
-            if 'status' not in pending:
-                pending['status'] = 'pending'
-                
-            if 'creator_role' not in pending:
-                pending['creator_role'] = 'member'
-                
-            if 'creator_name' not in pending:
-                pending['creator_name'] = 'Unknown User'
-                
-            # Create the pendingGoal object
-            pending_goal_obj = pendingGoal(**pending)
-            valid_pending_goals.append(pending_goal_obj)
-        except Exception as e:
-            logger.warning(f"Skipping invalid pending goal {pending.get('goal_id', 'unknown')}: {e}")
-            continue
-
-    return valid_pending_goals
+        pending.setdefault('goal_type', 'Savings')
+        pending.setdefault('description', '')
+        pending.setdefault('creator_role', 'member')
+        pending.setdefault('creator_name', 'Unknown User')
+
+    return model_list_response(pendingGoal, pendings, skip_invalid=True)
 
 @router.post("/pending/{goal_id}/approve")
 async def approve_or_reject_goal(goal_id: str, approval: goalApproval, user=Depends(verify_token)):
@@ -723,22 +789,24 @@ async def approve_or_reject_goal(goal_id: str, approval: goalApproval, user=Depe
             # Convert the model to dict and handle date serialization
             goal_dict = new_goal.model_dump()
             
-            # Handle date serialization for MongoDB
-            if 'target_date' in goal_dict and goal_dict['target_date'] is not None:
-                if isinstance(goal_dict['target_date'], date):
-                    goal_dict['target_date'] = goal_dict['target_date'].isoformat()
+            # Store the deadline as a BSON date so the calendar index can range-scan it
+            goal_dict['target_date'] = to_target_datetime(goal_dict.get('target_date')) or goal_dict.get('target_date')
+            goal_dict['progress_ratio'] = 0.0
             
             # Add creator UID for filtering
             goal_dict['creator_uid'] = pending_goal.get('creator_uid')
             
             await goals_collection.insert_one(goal_dict)
+            await record_goal_created(goal_dict.get('group_id'), goal_dict.get('status'))
             
             pool_status = {
                 "goal_id": goal_id,
                 "current_amount": 0.0, 
                 "is_paid": False, 
                 "status": "active",
-                "contributors": []
+                "contributors": [],
+                "totals_by_uid": {},
+                "contributor_count": 0
             }
             
             await pool_status_collection.insert_one(pool_status)
@@ -820,39 +888,23 @@ async def test_get_goals_no_auth():
         return {"error": str(e)}
 
 @router.get("/public", response_model=List[goal])
+@uses_analytics_reads
 async def get_all_goals_public():
     """Temporary public endpoint for testing"""
     try:
-        goals = await goals_collection.find().to_list(length=None)
-        # Convert ObjectId to string and ensure proper data format
-        validated_goals = []
+        goals = await goals_collection.find({}, {"_id": 0}).to_list(length=None)
         for goal_data in goals:
-            try:
-                # Remove MongoDB ObjectId
-                if '_id' in goal_data:
-                    del goal_data['_id']
-                # Fix missing goal_type field
-                if 'goal_type' not in goal_data or goal_data['goal_type'] is None:
-                    goal_data['goal_type'] = 'Savings'  # Default value
-                # Fix target_date format - convert datetime to date string
-                if 'target_date' in goal_data:
-                    if hasattr(goal_data['target_date'], 'date'):
-                        goal_data['target_date'] = goal_data['target_date'].date().isoformat()
-                    elif hasattr(goal_data['target_date'], 'isoformat'):
-                        goal_data['target_date'] = goal_data['target_date'].isoformat()
-                # Validate and create goal object
-                goal_obj = goal(**goal_data)
-                validated_goals.append(goal_obj)
-            except Exception:
-                # Silently skip invalid goal data
-                continue
-        
-        return validated_goals
+            # Fix missing goal_type field; target_date datetimes are handled by the validator
+            if goal_data.get('goal_type') is None:
+                goal_data['goal_type'] = 'Savings'  # Default value
+        # Invalid goal data is skipped
+        return model_list_response(goal, goals, skip_invalid=True)
     except Exception as e:
         logger.error(f"Error fetching goals: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch goals: {str(e)}")
 
 @router.get("/", response_model=List[goal])
+@uses_analytics_reads
 async def get_all_goals(user=Depends(verify_token)):
     try:
         user_uid = user.get('uid') if user else None
@@ -860,34 +912,23 @@ async def get_all_goals(user=Depends(verify_token)):
         user_role = user_doc.get("role", {}).get("role_type", "contributor") if user_doc else "contributor"
 
         user_group_id = user_doc.get("role", {}).get("group_id") if user_doc and user_doc.get("role") else None
-        goals = await goals_collection.find({"group_id" : user_group_id}).to_list(length=None)
+        goals = await goals_collection.find({"group_id" : user_group_id}, {"_id": 0}).to_list(length=None)
         logger.info(f"User {user_uid} ({user_role}): Found {len(goals)} total goals")
 
-        validated_goals = []
+        # Current amounts from pool_status in one round trip instead of one per goal
+        amounts = {
+            pool["goal_id"]: pool.get("current_amount", 0.0)
+            async for pool in pool_status_collection.find(
+                {"goal_id": {"$in": [g.get("goal_id") for g in goals]}},
+                {"_id": 0, "goal_id": 1, "current_amount": 1}
+            )
+        }
         for goal_data in goals:
-            try:
-                if '_id' in goal_data:
-                    del goal_data['_id']
-                if 'goal_type' not in goal_data or goal_data['goal_type'] is None:
-                    goal_data['goal_type'] = 'Savings'
-                if 'target_date' in goal_data:
-                    if hasattr(goal_data['target_date'], 'date'):
-                        goal_data['target_date'] = goal_data['target_date'].date().isoformat()
-                    elif hasattr(goal_data['target_date'], 'isoformat'):
-                        goal_data['target_date'] = goal_data['target_date'].isoformat()
-                # Fetch current amount from pool_status_collection
-                pool = await pool_status_collection.find_one({"goal_id": goal_data["goal_id"]})
-                if pool and "current_amount" in pool:
-                    goal_data["current_amount"] = pool["current_amount"]
-                else:
-                    goal_data["current_amount"] = 0.0
-                
-                goal_obj = goal(**goal_data)
-                validated_goals.append(goal_obj)
-            except Exception:
-                continue
-
-        return validated_goals
+            if goal_data.get('goal_type') is None:
+                goal_data['goal_type'] = 'Savings'
+            goal_data["current_amount"] = amounts.get(goal_data.get("goal_id"), 0.0)
+
+        return model_list_response(goal, goals, skip_invalid=True)
     except Exception as e:
         logger.error(f"Error fetching goals: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch goals: {str(e)}")
@@ -932,7 +973,9 @@ async def contribute_to_goal(goal_id: str, contribution: contributionData, user=
             "current_amount": 0.0,
             "is_paid": False,
             "status": goal_item.get("status", "active"),
-            "contributors": []
+            "contributors": [],
+            "totals_by_uid": {},
+            "contributor_count": 0
         }
         await pool_status_collection.insert_one(pool_doc)
         pool = pool_doc
@@ -941,29 +984,23 @@ async def contribute_to_goal(goal_id: str, contribution: contributionData, user=
 
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Amount must be positive")
-    # Update contribution in pool_status_collection
-    await pool_status_collection.update_one(
-        {"goal_id": goal_id},
-        {
-            "$inc": {"current_amount": amount},
-            "$push": {
-                "contributors": {
-                    "name": contribution.contributor_name,
-                    "uid": owner_uid,
-                    "amount": amount,
-                    "payment_method": contribution.payment_method or "virtual_balance",
-                    "reference_number": contribution.reference_number or "",
-                    "timestamp": datetime.now().isoformat()
-                }
-            }
-        }
-    )
+    # Update contribution in pool_status_collection (totals_by_uid moves in the same write)
+    await record_pool_contribution(goal_id, owner_uid, [{
+        "name": contribution.contributor_name,
+        "uid": owner_uid,
+        "amount": amount,
+        "payment_method": contribution.payment_method or "virtual_balance",
+        "reference_number": contribution.reference_number or "",
+        "timestamp": datetime.now().isoformat()
+    }])
 
     # Update current_amount in goals_collection as well
     await goals_collection.update_one(
         {"goal_id": goal_id},
-        {"$inc": {"current_amount": contribution.amount}}
+        add_to_current_amount(contribution.amount)
     )
+    invalidate_goal_snapshot(goal_id)
+    await record_contribution((goal_item or {}).get("group_id"), contribution.amount)
 
 
     # Always resolve owner_uid from user or contributor_name
@@ -1012,25 +1049,18 @@ async def contribute_to_goal(goal_id: str, contribution: contributionData, user=
 
 
     # Prepare response as before
-    updated_pool = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
+    updated_pool = await pool_status_collection.find_one(
+        {"goal_id": goal_id}, {"_id": 0, "current_amount": 1, f"totals_by_uid.{uid_key(owner_uid)}": 1}
+    ) or {}
     goal_item = await goals_collection.find_one({"goal_id": goal_id}) or {}
 
-    # --- Quota logic: If user finishes their quota, set it to 0 in the goal's members list ---
+    # --- Quota logic: If user finishes their quota, set it to 0 ---
     # Move this after the pool is updated and re-fetched so the latest payment is included
-    if updated_pool and "contributors" in updated_pool and goal_item and "members" in goal_item and isinstance(goal_item["members"], list):
-        user_total_contribution = sum(
-            c.get("amount", 0) for c in updated_pool["contributors"]
-            if str(c.get("uid")) == str(owner_uid)
-        )
-        for member in goal_item["members"]:
-            logger.info(f"Checking member id: {member.get('id')} vs owner_uid: {owner_uid}")
-            if str(member.get("id")) == str(owner_uid):
-                member_quota = member.get("quota", 0)
-                logger.info(f"User {owner_uid} total contribution: {user_total_contribution}, quota: {member_quota}")
-                if member_quota > 0 and user_total_contribution >= member_quota:
-                    logger.info(f"Setting quota to 0 for member {owner_uid}")
-                    member["quota"] = 0
-        await goals_collection.update_one({"goal_id": goal_id}, {"$set": {"members": goal_item["members"]}})
+    if updated_pool:
+        user_total_contribution = member_total(updated_pool, owner_uid)
+        # Conditional update: only a positive quota the total now covers is zeroed
+        if await settle_member_quota("goal", goal_id, owner_uid, user_total_contribution):
+            logger.info(f"Setting quota to 0 for member {owner_uid} (total contribution: {user_total_contribution})")
 
     current = float(updated_pool.get("current_amount", 0))
     target = float(goal_item.get("goal_amount", 1))  # Avoid division by zero
@@ -1052,10 +1082,8 @@ async def contribute_to_goal(goal_id: str, contribution: contributionData, user=
         if isinstance(auto_payment_settings, dict) and auto_payment_settings.get("enabled"):
             response["auto_payment"] = await process_bank_free_auto_payment(goal_id)
         else:
-            await goals_collection.update_one(
-                {"goal_id": goal_id},
-                {"$set": {"status": "awaiting_payment"}}
-            )
+            # Only the contribution that wins the transition moves the goal; later ones see it done
+            await transition_goal_status(goal_id, "awaiting_payment", ("active",))
             response["status"] = "awaiting_payment"
 
     return response
@@ -1083,8 +1111,8 @@ async def update_goal_status(goal_id: str, status: str, user=Depends(verify_toke
         raise HTTPException(status_code=404, detail="Goal not found")
 
     # Update status in both collections
-    await goals_collection.update_one({"goal_id": goal_id}, {"$set": {"status": status}})
-    await pool_status_collection.update_one({"goal_id": goal_id}, {"$set": {"status": status}})
+    if goal_item.get("status") != status and not await transition_goal_status(goal_id, status):
+        raise HTTPException(status_code=409, detail=f"Goal cannot move from '{goal_item.get('status')}' to '{status}'")
 
     return {"message": f"Goal '{goal_item['title']}' status updated to {status}"}
 
@@ -1095,8 +1123,11 @@ async def delete_goal(goal_id: str, user=Depends(verify_token)):
         raise HTTPException(status_code=404, detail="Goal not found")
 
     # Delete from both collections
-    await goals_collection.delete_one({"goal_id": goal_id})
+    result = await goals_collection.delete_one({"goal_id": goal_id})
     await pool_status_collection.delete_one({"goal_id": goal_id})
+    invalidate_goal_snapshot(goal_id)
+    if result.deleted_count:
+        await record_goal_deleted(goal_item.get("group_id"), goal_item.get("status"), goal_item.get("current_amount", 0))
 
     return {"message": f"Goal '{goal_item['title']}' deleted successfully"}
 
@@ -1112,31 +1143,13 @@ async def payout_goal(goal_id: str, manager_approval: bool, user=Depends(verify_
         raise HTTPException(status_code=400, detail="Goal is not awaiting payment.")
 
     if manager_approval:
-        # Update goals collection
-        await goals_collection.update_one(
-            {"goal_id": goal_id},
-            {"$set": {"status": "completed", "is_paid": True}}
-        )
-
-        # Update pool_status_collection
-        await pool_status_collection.update_one(
-            {"goal_id": goal_id},
-            {"$set": {"status": "completed", "is_paid": True}}
-        )
+        if not await transition_goal_status(goal_id, "completed", ("awaiting_payment",), {"is_paid": True}):
+            raise HTTPException(status_code=409, detail="Goal is no longer awaiting payment.")
 
         return {"message": f"Goal '{goal_item['title']}' has been paid out."}
     else:
-        # Update goals collection
-        await goals_collection.update_one(
-            {"goal_id": goal_id},
-            {"$set": {"status": "active"}}
-        )
-
-        # Update pool_status_collection
-        await pool_status_collection.update_one(
-            {"goal_id": goal_id},
-            {"$set": {"status": "active"}}
-        )
+        if not await transition_goal_status(goal_id, "active", ("awaiting_payment",)):
+            raise HTTPException(status_code=409, detail="Goal is no longer awaiting payment.")
 
         return {"message": f"Payment for goal '{goal_item['title']}' has been rejected by the manager."}
 
@@ -1148,30 +1161,35 @@ async def get_auto_payment_queue(user=Depends(verify_token)):
     pending_auto_payments = await auto_payment_queue_collection.find({}, {"_id": 0}).to_list(length=None)
     # ^ {} means no filter, {"_id": 0} hides Mongo's internal ID
 
-    return {
+    return BSONJSONResponse({
         "pending_auto_payments": pending_auto_payments,
         "total_pending": len(pending_auto_payments)
-    }
+    })
 
 @router.post("/{goal_id}/auto-payment/confirm")
 async def confirm_auto_payment(goal_id: str, confirmation: AutoPaymentConfirmation, user=Depends(verify_token)):
     """Manager confirms or rejects auto payment"""
-    auto_payment_queue = await auto_payment_queue_collection.find_one({"goal_id": goal_id})
-    if not auto_payment_queue:
-        raise HTTPException(status_code=404, detail="Goal not found in auto payment queue")
-    
     if confirmation.goal_id != goal_id:
         raise HTTPException(status_code=400, detail="Goal ID mismatch")
     
     goal_item = await goals_collection.find_one({"goal_id": goal_id})
     if not goal_item:
         raise HTTPException(status_code=404, detail="Goal not found")
+    # The goal status is authoritative; the queue entry is only the manager's worklist.
+    # A goal already paid through the virtual balance goes through again, so a
+    # payout left pending by an interrupted confirmation is released.
+    already_paid = (
+        goal_item.get("status") == "completed" and goal_item.get("is_paid")
+        and await virtual_balances_collection.count_documents({"payout_id": f"payout_{goal_id}"}, limit=1)
+    )
+    if goal_item.get("status") != "awaiting_auto_payment" and not (already_paid and confirmation.approve_payment):
+        raise HTTPException(status_code=404, detail="Goal not found in auto payment queue")
     
     logger.info(f"🤖 Auto payment confirmation for goal {goal_id}: {'APPROVED' if confirmation.approve_payment else 'REJECTED'} by {confirmation.manager_name}")
     
     if confirmation.approve_payment:
-        # Execute bank-free auto payment
-        result = await process_bank_free_auto_payment(goal_id)
+        # Execute the confirmed payout (virtual balance transfer)
+        result = await process_virtual_balance_payment(goal_id, from_statuses=("awaiting_auto_payment",))
         return {
             "message": f"Auto payment approved and executed by {confirmation.manager_name}",
             "payment_result": result,
@@ -1179,8 +1197,8 @@ async def confirm_auto_payment(goal_id: str, confirmation: AutoPaymentConfirmati
         }
     else:
         # Reject auto payment - revert to manual
-        await goals_collection.update_one({"goal_id": goal_id}, {"$set": {"status": "awaiting_payment"}})
-        await pool_status_collection.update_one({"goal_id": goal_id}, {"$set": {"status": "awaiting_payment"}})
+        if not await transition_goal_status(goal_id, "awaiting_payment", ("awaiting_auto_payment",)):
+            raise HTTPException(status_code=409, detail="Auto payment was already processed")
         
         # Remove from queue
         await auto_payment_queue_collection.delete_one({"goal_id": goal_id})
@@ -1217,10 +1235,10 @@ async def get_auto_payment_status(goal_id: str, user=Depends(verify_token)):
 
     return {
         "goal_id": goal_id,
-        "goal_title": goal_item.title,
-        "auto_payment_settings": goal_item.auto_payment_settings,
+        "goal_title": goal_item.get("title"),
+        "auto_payment_settings": goal_item.get("auto_payment_settings"),
         "in_auto_payment_queue": bool(auto_payment_queue),
-        "current_status": goal_item.status
+        "current_status": goal_item.get("status")
     }
 
 
@@ -1229,7 +1247,7 @@ async def get_auto_payment_status(goal_id: str, user=Depends(verify_token)):
 async def get_virtual_balances():
     """Get all virtual payout balances"""
     virtual_balances = await virtual_balances_collection.find().to_list(length=None)
-    return {
+    return BSONJSONResponse({
         "virtual_balances": virtual_balances,
         "total_balances": len(virtual_balances) # UHHHHHHHHHHHH im not sure what to do with this yet
-    }
\ No newline at end of file
+    })
\ No newline at end of file
@@ -0,0 +1,71 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+# Goals keep target_date as a BSON date (midnight) and a denormalised
+# progress_ratio (current_amount / goal_amount), indexed together with status,
+# so deadline risk windows are index range scans instead of a scan that
+# re-parses every goal's date string.
+
+RISK_WINDOW_DAYS = 7  # widest deadline window assess_goal_risk cares about
+# Progress percentages handle_milestone_events reacts to; the last one reached
+# is kept on pool_status and copied onto the goal as last_milestone_reached
+MILESTONES = (25, 50, 75, 90, 100)
+
+def to_target_datetime(value) -> Optional[datetime]:
+    """Normalise a date, datetime or ISO string to midnight of that day."""
+    if isinstance(value, datetime):
+        return datetime.combine(value.date(), time.min)
+    if isinstance(value, date):
+        return datetime.combine(value, time.min)
+    if isinstance(value, str):
+        try:
+            return datetime.combine(datetime.fromisoformat(value).date(), time.min)
+        except ValueError:
+            return None
+    return None
+
+def compute_progress_ratio(current_amount, goal_amount) -> float:
+    goal_amount = float(goal_amount or 0)
+    return float(current_amount or 0) / goal_amount if goal_amount > 0 else 0.0
+
+def risk_window_end(today: Optional[date] = None, days: int = RISK_WINDOW_DAYS) -> datetime:
+    """Latest target_date that falls inside the risk window starting today."""
+    today = today or date.today()
+    return datetime.combine(today + timedelta(days=days), time.min)
+
+# Update pipeline stage: progress_ratio from the document's own amounts
+REFRESH_PROGRESS_RATIO = {"$set": {"progress_ratio": {"$cond": [
+    {"$gt": ["$goal_amount", 0]},
+    {"$divide": [{"$ifNull": ["$current_amount", 0]}, "$goal_amount"]},
+    0
+]}}}
+
+def add_to_current_amount(amount: float) -> list:
+    """Update pipeline that adds to current_amount and refreshes progress_ratio in one write."""
+    return [
+        {"$set": {"current_amount": {"$add": [{"$ifNull": ["$current_amount", 0]}, amount]}}},
+        REFRESH_PROGRESS_RATIO,
+    ]
+
+def deadline_risk_clauses(today: Optional[date] = None) -> list:
+    """$or clauses matching the deadline bands of scheduler.assess_goal_risk.
+
+    Fully funded goals and goals past a milestone not recorded yet are
+    included whatever their deadline, so completion and milestone workflows
+    run on the next cycle instead of the next full sweep. Goals whose
+    target_date is not yet a BSON date or that lack progress_ratio (written
+    before the calendar fields existed) are always included.
+    """
+    return [
+        {"target_date": {"$lte": risk_window_end(today, 1)}},
+        {"target_date": {"$lte": risk_window_end(today, 3)}, "progress_ratio": {"$lt": 0.7}},
+        {"target_date": {"$lte": risk_window_end(today, 7)}, "progress_ratio": {"$lt": 0.5}},
+        {"progress_ratio": {"$gte": 1}},
+        *(
+            # $not also matches goals that have no last_milestone_reached yet
+            {"progress_ratio": {"$gte": milestone / 100}, "last_milestone_reached": {"$not": {"$gte": milestone}}}
+            for milestone in MILESTONES if milestone < 100
+        ),
+        {"target_date": {"$not": {"$type": "date"}}},
+        {"progress_ratio": {"$exists": False}},
+    ]
@@ -0,0 +1,87 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+# Per-goal analytics snapshots (group view + calculate_group_analytics output)
+# shared by every request in this process. Each snapshot remembers the
+# pool_status revision it was built from. Writers in this process drop the
+# entry right after their write (and bump the goal's generation, so a snapshot
+# whose reads started before the write is not cached); writes from other
+# processes are noticed by re-reading the revision once a snapshot is older
+# than revalidate_after.
+
+SNAPSHOT_CONFIG = {
+    "max_entries": 2048,
+    "revalidate_after": 15.0,  # seconds a snapshot is served without checking its revision
+}
+
+# Merge into the "$inc" of every pool_status write that changes what a snapshot shows
+REVISION_BUMP = {"revision": 1}
+
+class GoalSnapshotCache:
+    """LRU map of goal_id -> snapshot dict. Snapshots are shared; treat them as read-only."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        # goal_id -> invalidation generation, bounded like the entries; goals
+        # that fell out of it report the newest generation dropped
+        self._generations: OrderedDict = OrderedDict()
+        self._clock = 0
+        self._dropped_generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+
+    def get(self, goal_id: str) -> Optional[dict]:
+        snapshot = self._entries.get(goal_id)
+        if snapshot is not None:
+            self._entries.move_to_end(goal_id)
+        return snapshot
+
+    def generation(self, goal_id: str) -> int:
+        """Take before reading what a snapshot is built from and pass to put."""
+        return self._generations.get(goal_id, self._dropped_generation)
+
+    def put(self, goal_id: str, snapshot: dict, generation: int) -> bool:
+        """Cache snapshot unless the goal was invalidated since `generation` was taken."""
+        if self.generation(goal_id) != generation:
+            return False
+        snapshot.setdefault("checked_at", time.monotonic())
+        self._entries[goal_id] = snapshot
+        self._entries.move_to_end(goal_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def is_fresh(self, snapshot: dict) -> bool:
+        return time.monotonic() - snapshot["checked_at"] < SNAPSHOT_CONFIG["revalidate_after"]
+
+    def mark_checked(self, snapshot: dict):
+        snapshot["checked_at"] = time.monotonic()
+        self.revalidations += 1
+
+    def invalidate(self, goal_id: str):
+        self._clock += 1
+        self._generations[goal_id] = self._clock
+        self._generations.move_to_end(goal_id)
+        while len(self._generations) > self.max_entries:
+            _, dropped = self._generations.popitem(last=False)
+            self._dropped_generation = max(self._dropped_generation, dropped)
+        if self._entries.pop(goal_id, None) is not None:
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "invalidations": self.invalidations,
+        }
+
+goal_snapshots = GoalSnapshotCache(SNAPSHOT_CONFIG["max_entries"])
+
+def invalidate_goal_snapshot(goal_id: str):
+    goal_snapshots.invalidate(goal_id)
@@ -0,0 +1,91 @@
+from typing import Iterable, List, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from .mongo import groups_collection, group_members_collection
+
+# Group membership lives in group_members, one document per member, so a large
+# group never loads or rewrites a members array. The group document carries
+# member_count, active_member_count and role_counts, kept in step with $inc by
+# the helpers below. Kept free of auth imports so ai_tools_clean can use it.
+
+MEMBER_ROLES = ("manager", "contributor")
+MEMBER_PROJECTION = {"_id": 0, "group_id": 0}
+
+def member_count_delta(member: dict, sign: int) -> dict:
+    """$inc for the group counters when member joins (sign=1) or leaves (sign=-1)."""
+    inc = {"member_count": sign, f"role_counts.{member.get('role') or 'contributor'}": sign}
+    if member.get("is_active", True):
+        inc["active_member_count"] = sign
+    return inc
+
+def member_recipient(member: dict) -> Optional[str]:
+    # user_id is only present on members migrated from the old embedded array
+    return member.get("user_id") or member.get("firebase_uid")
+
+async def add_group_member(group_id: str, member: dict) -> bool:
+    """Insert a membership; returns False if the user is already a member."""
+    try:
+        await group_members_collection.insert_one({**member, "group_id": group_id})
+    except DuplicateKeyError:
+        return False
+    await groups_collection.update_one({"group_id": group_id}, {"$inc": member_count_delta(member, 1)})
+    return True
+
+async def remove_group_member(group_id: str, firebase_uid: str) -> bool:
+    member = await group_members_collection.find_one_and_delete({"group_id": group_id, "firebase_uid": firebase_uid})
+    if member is None:
+        return False
+    await groups_collection.update_one({"group_id": group_id}, {"$inc": member_count_delta(member, -1)})
+    return True
+
+async def set_member_role(group_id: str, firebase_uid: str, role: str) -> bool:
+    # find_one_and_update hands back the previous role atomically, so
+    # concurrent role changes still move the counters by the right amount
+    previous = await group_members_collection.find_one_and_update(
+        {"group_id": group_id, "firebase_uid": firebase_uid},
+        {"$set": {"role": role}},
+        projection={"role": 1, "_id": 0}
+    )
+    if previous is None:
+        return False
+    old_role = previous.get("role") or "contributor"
+    if old_role != role:
+        await groups_collection.update_one(
+            {"group_id": group_id},
+            {"$inc": {f"role_counts.{old_role}": -1, f"role_counts.{role}": 1}}
+        )
+    return True
+
+async def is_group_member(group_id: str, firebase_uid: str) -> bool:
+    return await group_members_collection.find_one({"group_id": group_id, "firebase_uid": firebase_uid}, {"_id": 1}) is not None
+
+async def count_member_groups(firebase_uid: str, group_ids: Iterable[str]) -> int:
+    """How many of group_ids the user belongs to."""
+    return await group_members_collection.count_documents({"group_id": {"$in": list(group_ids)}, "firebase_uid": firebase_uid})
+
+async def get_member_page(group_id: str, limit: int, after: Optional[str] = None) -> dict:
+    """Members ordered by firebase_uid; pass next_after back as after for the next page."""
+    query = {"group_id": group_id}
+    if after:
+        query["firebase_uid"] = {"$gt": after}
+    members = await group_members_collection.find(query, MEMBER_PROJECTION).sort("firebase_uid", 1).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(members) > limit
+    members = members[:limit]
+    return {
+        "members": members,
+        "next_after": members[-1]["firebase_uid"] if has_more else None,
+        "has_more": has_more,
+    }
+
+async def list_member_recipients(group_id: str, role: Optional[str] = None, exclude: Optional[str] = None) -> List[str]:
+    """Notification recipients of a group, read from the index without loading member details."""
+    query = {"group_id": group_id}
+    if role:
+        query["role"] = role
+    recipients = []
+    async for member in group_members_collection.find(query, {"_id": 0, "firebase_uid": 1, "user_id": 1}):
+        recipient = member_recipient(member)
+        if recipient and recipient != exclude:
+            recipients.append(recipient)
+    return recipients
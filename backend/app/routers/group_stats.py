@@ -0,0 +1,154 @@
+import logging
+from typing import Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from .mongo import groups_collection, group_members_collection, goals_collection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Materialised group statistics. Besides the membership counters kept by
+# group_membership, each group document carries
+#   total_goals, goal_status_counts.<status>, total_contributions
+# moved by $inc wherever goals are created, deleted, change status or receive
+# contributions. reconcile_group_stats recomputes everything from goals and
+# group_members and is run periodically by the scheduler to repair drift
+# (e.g. a crash between a goal write and its counter update).
+
+GROUP_STATS_CONFIG = {
+    "reconcile_batch_size": 200,  # groups recomputed per aggregation round trip
+}
+
+STATS_PROJECTION = {
+    "_id": 0,
+    "name": 1,
+    "created_at": 1,
+    "member_count": 1,
+    "active_member_count": 1,
+    "role_counts": 1,
+    "total_goals": 1,
+    "goal_status_counts": 1,
+    "total_contributions": 1,
+}
+STAT_FIELDS = [field for field in STATS_PROJECTION if field not in ("_id", "name", "created_at")]
+
+def status_key(status: Optional[str]) -> str:
+    # goals written before status was always set count as active
+    return status or "active"
+
+async def record_goal_created(group_id: Optional[str], status: Optional[str] = "active", current_amount: float = 0.0):
+    if not group_id:
+        return
+    await groups_collection.update_one({"group_id": group_id}, {"$inc": {
+        "total_goals": 1,
+        f"goal_status_counts.{status_key(status)}": 1,
+        "total_contributions": float(current_amount or 0),
+    }})
+
+async def record_goal_deleted(group_id: Optional[str], status: Optional[str], current_amount: float = 0.0):
+    if not group_id:
+        return
+    await groups_collection.update_one({"group_id": group_id}, {"$inc": {
+        "total_goals": -1,
+        f"goal_status_counts.{status_key(status)}": -1,
+        "total_contributions": -float(current_amount or 0),
+    }})
+
+async def record_goal_status_change(group_id: Optional[str], old_status: Optional[str], new_status: str):
+    if not group_id or status_key(old_status) == status_key(new_status):
+        return
+    await groups_collection.update_one({"group_id": group_id}, {"$inc": {
+        f"goal_status_counts.{status_key(old_status)}": -1,
+        f"goal_status_counts.{status_key(new_status)}": 1,
+    }})
+
+async def record_contribution(group_id: Optional[str], amount: float):
+    if not group_id or not amount:
+        return
+    await groups_collection.update_one({"group_id": group_id}, {"$inc": {"total_contributions": float(amount)}})
+
+async def compute_group_stats(group_ids: List[str]) -> dict:
+    """Stats for the given groups recomputed from goals and group_members."""
+    stats = {
+        group_id: {
+            "total_goals": 0,
+            "goal_status_counts": {},
+            "total_contributions": 0.0,
+            "member_count": 0,
+            "active_member_count": 0,
+            "role_counts": {},
+        }
+        for group_id in group_ids
+    }
+    async for row in goals_collection.aggregate([
+        {"$match": {"group_id": {"$in": group_ids}}},
+        {"$group": {
+            "_id": {"group_id": "$group_id", "status": {"$ifNull": ["$status", "active"]}},
+            "count": {"$sum": 1},
+            "amount": {"$sum": {"$ifNull": ["$current_amount", 0]}},
+        }},
+    ]):
+        group = stats[row["_id"]["group_id"]]
+        group["total_goals"] += row["count"]
+        group["goal_status_counts"][row["_id"]["status"]] = row["count"]
+        group["total_contributions"] += float(row["amount"])
+    async for row in group_members_collection.aggregate([
+        {"$match": {"group_id": {"$in": group_ids}}},
+        {"$group": {
+            "_id": {"group_id": "$group_id", "role": {"$ifNull": ["$role", "contributor"]}},
+            "count": {"$sum": 1},
+            "active": {"$sum": {"$cond": [{"$ifNull": ["$is_active", True]}, 1, 0]}},
+        }},
+    ]):
+        group = stats[row["_id"]["group_id"]]
+        group["member_count"] += row["count"]
+        group["active_member_count"] += row["active"]
+        group["role_counts"][row["_id"]["role"]] = row["count"]
+    return stats
+
+def stats_differ(stored: dict, computed: dict) -> bool:
+    for field, value in computed.items():
+        current = stored.get(field)
+        if field == "total_contributions":
+            if round(float(current or 0), 2) != round(value, 2):
+                return True
+        elif isinstance(value, dict):
+            # zero entries left behind by $inc are not drift
+            if {k: v for k, v in (current or {}).items() if v} != value:
+                return True
+        elif current != value:
+            return True
+    return False
+
+async def reconcile_group_stats(group_ids: Optional[Iterable[str]] = None) -> int:
+    """Recompute the stats of the given (default: all) groups and rewrite the ones that drifted.
+
+    Returns how many groups were corrected. An $inc landing between the
+    aggregation and the $set is lost until the next run, which is the
+    trade-off for never locking the group.
+    """
+    batch_size = GROUP_STATS_CONFIG["reconcile_batch_size"]
+    query = {"group_id": {"$in": list(group_ids)}} if group_ids is not None else {"group_id": {"$exists": True}}
+    projection = {"_id": 0, "group_id": 1, **{field: 1 for field in STAT_FIELDS}}
+    cursor = groups_collection.find(query, projection).batch_size(batch_size)
+    corrected = 0
+    while True:
+        stored = {g["group_id"]: g for g in await cursor.to_list(length=batch_size)}
+        if not stored:
+            break
+        computed = await compute_group_stats(list(stored))
+        updates = [
+            UpdateOne({"group_id": group_id}, {"$set": group_stats})
+            for group_id, group_stats in computed.items()
+            if stats_differ(stored[group_id], group_stats)
+        ]
+        if updates:
+            await groups_collection.bulk_write(updates, ordered=False)
+            corrected += len(updates)
+    if corrected:
+        logger.info(f"🔧 Group stats reconciled: corrected {corrected} groups")
+    return corrected
+
+async def get_group_stats(group_id: str) -> Optional[dict]:
+    return await groups_collection.find_one({"group_id": group_id}, STATS_PROJECTION)
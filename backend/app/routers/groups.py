@@ -1,10 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from datetime import datetime
-from .mongo import users_collection, groups_collection
+from .mongo import uses_analytics_reads, users_collection, groups_collection
 from .verify_token import verify_token
+from .responses import model_list_response, model_projection
 from .ai_tools_clean import send_welcome_notification
+from .group_stats import get_group_stats
+from .group_membership import (
+    MEMBER_ROLES,
+    add_group_member,
+    remove_group_member,
+    set_member_role,
+    get_member_page,
+)
 import logging
 import random, string
 
@@ -53,12 +62,23 @@ class GroupResponse(BaseModel):
     name: str
     description: str
     manager_id: str
-    members: List[GroupMember]
+    members: List[GroupMember] = []
     created_at: str
     is_active: bool
     total_goals: int
     total_contributions: float
-    member_count: int
+    member_count: int = 0
+    active_member_count: int = 0
+    role_counts: Dict[str, int] = {}
+
+# Members live in group_members; group reads carry only the first few
+GROUP_MEMBERS_CONFIG = {
+    "preview": 20,  # members embedded in GET /groups/{group_id}
+    "page_size": 100,
+    "max_page_size": 500,
+}
+# Projection value that keeps a not yet migrated embedded members array off the wire
+NO_MEMBERS = {"$literal": []}
 
 @router.post("/", response_model=GroupResponse)
 async def create_group(group: GroupCreate, user=Depends(verify_token)):
@@ -104,47 +124,53 @@ async def create_group(group: GroupCreate, user=Depends(verify_token)):
             total_goals=0,
             total_contributions=0.0
         )
-        await groups_collection.insert_one(new_group.model_dump())
+        # Counters start at zero and are raised by add_group_member
+        await groups_collection.insert_one({
+            **new_group.model_dump(exclude={"members"}),
+            "member_count": 0,
+            "active_member_count": 0,
+            "role_counts": {}
+        })
+        await add_group_member(group_id, manager_member.model_dump())
         logger.info(f"New group created: {group.name} by manager {group.manager_id}")
         return GroupResponse(
             **new_group.model_dump(),
-            member_count=len(new_group.members)
+            member_count=1,
+            active_member_count=1,
+            role_counts={"manager": 1}
         )
     except Exception as e:
         logger.error(f"Group creation error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Group creation failed: {str(e)}")
 
 @router.get("/", response_model=List[GroupResponse])
+@uses_analytics_reads
 async def get_all_groups(user=Depends(verify_token)):
     """Get all groups"""
-    groups = await groups_collection.find().to_list(length=None)
-
-    return [GroupResponse(**group) for group in groups]
+    # Members are not listed here. Rows are validated: test groups, $inc'd
+    # stats and legacy documents do not all match GroupResponse
+    groups = await groups_collection.find({}, model_projection(GroupResponse, members=NO_MEMBERS)).to_list(length=None)
+    return model_list_response(GroupResponse, groups, skip_invalid=True)
 
 @router.get("/{group_id}", response_model=GroupResponse)
 async def get_group(group_id: str, user=Depends(verify_token)):
     """Get specific group by ID"""
-    group = await groups_collection.find_one({"group_id": group_id})
+    group = await groups_collection.find_one({"group_id": group_id}, model_projection(GroupResponse, members=NO_MEMBERS))
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    return GroupResponse(
-        **group,
-        member_count=len(group["members"])
-    )
+    page = await get_member_page(group_id, GROUP_MEMBERS_CONFIG["preview"])
+    group["members"] = page["members"]
+    return GroupResponse(**group)
 
 @router.post("/{group_id}/members", response_model=GroupResponse)
 async def add_member_to_group(group_id: str, member_request: AddMemberRequest, user=Depends(verify_token)):
     """Add a member to group"""
-    group = await groups_collection.find_one({"group_id": group_id})
+    if member_request.role not in MEMBER_ROLES:
+        raise HTTPException(status_code=400, detail=f"Role must be one of: {', '.join(MEMBER_ROLES)}")
+    group = await groups_collection.find_one({"group_id": group_id}, {"_id": 1})
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
-    
-    # Check if user is already a member
-    for member in group.get("members", []):
-        if member.get("firebase_uid") == member_request.firebase_uid:
-            raise HTTPException(status_code=400, detail="User is already a member of this group")
-    
 
     # Fetch member first_name and last_name from users_collection
     member_user = await users_collection.find_one({"firebase_uid": member_request.firebase_uid})
@@ -165,10 +191,9 @@ async def add_member_to_group(group_id: str, member_request: AddMemberRequest, u
         is_active=True
     )
 
-    await groups_collection.update_one(
-        {"group_id": group_id},
-        {"$push": {"members": new_member.model_dump()}}
-    )
+    # The unique (group_id, firebase_uid) index rejects duplicates
+    if not await add_group_member(group_id, new_member.model_dump()):
+        raise HTTPException(status_code=400, detail="User is already a member of this group")
 
     # Update user's profile with group_id and role_type
     await users_collection.update_one(
@@ -187,53 +212,58 @@ async def add_member_to_group(group_id: str, member_request: AddMemberRequest, u
         is_first_time=True
     )
 
-    updated_group = await groups_collection.find_one({"group_id": group_id})
+    updated_group = await groups_collection.find_one({"group_id": group_id}, model_projection(GroupResponse, members=NO_MEMBERS))
     if not updated_group:
         raise HTTPException(status_code=500, detail="Failed to fetch updated group")
 
     logger.info(f"User {member_request.firebase_uid} added to group {group_id} as {member_request.role}")
 
-    return GroupResponse(
-        **updated_group,
-        member_count=len(updated_group["members"])
-    )
+    updated_group["members"] = [new_member]
+    return GroupResponse(**updated_group)
 
 @router.delete("/{group_id}/members/{firebase_uid}")
 async def remove_member_from_group(group_id: str, firebase_uid: str, user=Depends(verify_token)):
     """Remove a member from group"""
     # First check if group exists
-    group = await groups_collection.find_one({"group_id": group_id})
+    group = await groups_collection.find_one({"group_id": group_id}, {"_id": 1})
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
 
-    # Check if the member exists
-    members = group.get("members", [])
-    if not any(member.get("firebase_uid") == firebase_uid for member in members):
+    if not await remove_group_member(group_id, firebase_uid):
         raise HTTPException(status_code=404, detail="Member not found in this group")
 
-    # Remove the member using $pull
-    await groups_collection.update_one(
-        {"group_id": group_id},
-        {"$pull": {"members": {"firebase_uid": firebase_uid}}}
-    )
-
     logger.info(f"User {firebase_uid} removed from group {group_id}")
     return {"message": f"User {firebase_uid} removed from group successfully"}
 
 @router.get("/{group_id}/members", response_model=List[GroupMember])
-async def get_group_members(group_id: str, user=Depends(verify_token)):
-    """Get all members of a group"""
-    group = await groups_collection.find_one({"group_id": group_id})
+async def get_group_members(
+    group_id: str,
+    response: Response,
+    limit: int = Query(GROUP_MEMBERS_CONFIG["page_size"], ge=1, le=GROUP_MEMBERS_CONFIG["max_page_size"]),
+    after: Optional[str] = None,
+    user=Depends(verify_token)
+):
+    """Get a page of group members ordered by firebase_uid.
+
+    The body stays a plain list; when there are more members the
+    X-Next-After header holds the value to pass as after for the next page.
+    """
+    group = await groups_collection.find_one({"group_id": group_id}, {"member_count": 1})
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    members = group.get("members", [])
-    return members
+    page = await get_member_page(group_id, limit, after)
+    response.headers["X-Total-Count"] = str(group.get("member_count", 0))
+    if page["next_after"]:
+        response.headers["X-Next-After"] = page["next_after"]
+    return page["members"]
 
 @router.put("/{group_id}/members/{firebase_uid}/role")
 async def update_member_role(group_id: str, firebase_uid: str, new_role: str, user=Depends(verify_token)):
     """Update member role in group"""
-    group = await groups_collection.find_one({"group_id": group_id})
+    if new_role not in MEMBER_ROLES:
+        raise HTTPException(status_code=400, detail=f"Role must be one of: {', '.join(MEMBER_ROLES)}")
+    group = await groups_collection.find_one({"group_id": group_id}, {"_id": 1})
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
@@ -242,17 +272,8 @@ async def update_member_role(group_id: str, firebase_uid: str, new_role: str, us
     #     raise HTTPException(status_code=400, detail="Cannot change manager role")
     
     # Find and update member
-    await groups_collection.update_one(
-        {
-            "group_id": group_id,
-            "members.firebase_uid": firebase_uid
-        },
-        {
-            "$set": {
-                "members.$.role": new_role
-            }
-        }
-    )
+    if not await set_member_role(group_id, firebase_uid, new_role):
+        raise HTTPException(status_code=404, detail="Member not found in this group")
     return {"message": f"Member role updated to {new_role}"}
 
 # We settle on one group per person so i dont think we need this route
@@ -322,26 +343,26 @@ async def delete_group(group_id: str):
 
 @router.get("/{group_id}/stats")
 async def get_group_statistics(group_id: str):
-    """Get group statistics"""
-    group = await groups_collection.find_one({"group_id": group_id})
+    """Get group statistics (materialised counters, see group_stats)"""
+    group = await get_group_stats(group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    members = group.get("members", [])
-    
-    active_members = len([m for m in members if m.get("is_active")])
-    managers = len([m for m in members if m.get("role") == "manager"])
-    contributors = len([m for m in members if m.get("role") == "contributor"])
+    role_counts = group.get("role_counts", {})
+    goal_counts = group.get("goal_status_counts", {})
     
     return {
         "group_id": group_id,
         "group_name": group["name"],
-        "total_members": len(group.members),
-        "active_members": active_members,
-        "managers": managers,
-        "contributors": contributors,
-        "total_goals": group["total_goals"],
-        "total_contributions": group["total_contributions"],
+        "total_members": group.get("member_count", 0),
+        "active_members": group.get("active_member_count", 0),
+        "managers": role_counts.get("manager", 0),
+        "contributors": role_counts.get("contributor", 0),
+        "total_goals": group.get("total_goals", 0),
+        "active_goals": goal_counts.get("active", 0),
+        "completed_goals": goal_counts.get("completed", 0),
+        "goal_status_counts": {status: count for status, count in goal_counts.items() if count},
+        "total_contributions": round(group.get("total_contributions", 0.0), 2),
         # "average_contribution": group.total_contributions / active_members if active_members > 0 else 0,
         "created_at": group["created_at"]
     }
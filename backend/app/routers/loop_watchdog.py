@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from .metrics import LOOP_BLOCKS, LOOP_LAG_QUANTILES, LOOP_LAG_SECONDS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Event loop watchdog. A ticker coroutine sleeps for tick_interval and
+# records how late it woke up (scheduling lag). A watcher thread checks the
+# ticker's heartbeat; when the loop has not come back for block_threshold,
+# whatever is running on the loop thread at that moment is the blocking
+# callback, so its stack is logged once per stall.
+
+LOOP_WATCHDOG_CONFIG = {
+    "enabled": os.getenv("LOOP_WATCHDOG", "1") != "0",
+    "tick_interval": 0.25,  # seconds between ticks
+    "block_threshold": float(os.getenv("LOOP_BLOCK_THRESHOLD", 0.2)),  # seconds of stall before logging a stack
+    "window": 240,  # recent ticks kept for the quantile gauges (~1 minute)
+    "quantile_every": 4,  # ticks between quantile gauge updates
+    "stack_limit": 30,  # innermost frames logged
+}
+
+class LoopWatchdog:
+    def __init__(self, config: dict = LOOP_WATCHDOG_CONFIG):
+        self.config = config
+        self.lags = deque(maxlen=config["window"])
+        self.last_tick = time.monotonic()
+        self.blocks = 0
+        self.loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def _tick(self):
+        interval = self.config["tick_interval"]
+        ticks = 0
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self.last_tick = now
+            lag = max(0.0, now - expected)
+            self.lags.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            ticks += 1
+            if ticks % self.config["quantile_every"] == 0:
+                ordered = sorted(self.lags)
+                for q in (0.5, 0.9, 0.99):
+                    LOOP_LAG_QUANTILES.set(ordered[min(len(ordered) - 1, int(q * len(ordered)))], quantile=q)
+                LOOP_LAG_QUANTILES.set(ordered[-1], quantile=1)
+
+    def _watch(self):
+        interval = self.config["tick_interval"]
+        threshold = self.config["block_threshold"]
+        reported_tick = None
+        while not self._stop.wait(interval / 2):
+            last_tick = self.last_tick
+            stalled = time.monotonic() - last_tick - interval
+            if stalled < threshold or reported_tick == last_tick:
+                continue
+            reported_tick = last_tick
+            self.blocks += 1
+            LOOP_BLOCKS.inc()
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame, limit=self.config["stack_limit"])) if frame else "unavailable\n"
+            logger.warning(f"🧱 Event loop blocked for {stalled * 1000:.0f}ms+, loop thread is in:\n{stack}")
+
+    def start(self):
+        if self._task is not None:
+            return
+        self.loop_thread_id = threading.get_ident()
+        self.last_tick = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"🐕 Loop watchdog started (block threshold {self.config['block_threshold'] * 1000:.0f}ms)")
+
+    def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        self._stop.set()
+        self._thread.join()
+        self._task = self._thread = None
+
+loop_watchdog = LoopWatchdog()
+
+def start_loop_watchdog():
+    if LOOP_WATCHDOG_CONFIG["enabled"]:
+        loop_watchdog.start()
@@ -0,0 +1,95 @@
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .mongo import member_quotas_collection
+
+# Per-member quotas, one document per (owner_type, owner_id, member_id) where
+# the owner is a goal or a plan. Lookups hit the unique index, bulk
+# allocation is a single unordered bulk_write per chunk, and every write bumps
+# the document's version so clients can allocate with optimistic concurrency.
+
+QUOTA_CONFIG = {
+    "bulk_chunk_size": 1000,  # operations per bulk_write / ids per read-back query
+}
+
+QUOTA_PROJECTION = {"_id": 0, "id": "$member_id", "name": 1, "quota": 1, "version": 1}
+DUPLICATE_KEY = 11000
+
+def quota_owner(plan_id: Optional[str], goal_id: Optional[str]) -> Tuple[str, str]:
+    return ("plan", str(plan_id)) if plan_id else ("goal", str(goal_id))
+
+def quota_key(owner_type: str, owner_id: str, member_id: str) -> dict:
+    return {"owner_type": owner_type, "owner_id": owner_id, "member_id": str(member_id)}
+
+async def get_member_quota(owner_type: str, owner_id: str, member_id: str) -> Optional[dict]:
+    return await member_quotas_collection.find_one(quota_key(owner_type, owner_id, member_id), QUOTA_PROJECTION)
+
+def quota_write(owner_type: str, owner_id: str, member: dict, write_id: str, now: str) -> UpdateOne:
+    query = quota_key(owner_type, owner_id, member["id"])
+    expected = member.get("version")
+    if expected is not None:
+        # Only overwrite the version the client read; no upsert, so a stale
+        # version simply matches nothing and is reported as a conflict
+        query["version"] = expected
+    fields = {"quota": float(member["quota"]), "updated_at": now, "write_id": write_id}
+    if member.get("name") is not None:
+        fields["name"] = member["name"]
+    return UpdateOne(
+        query,
+        {"$set": fields, "$inc": {"version": 1}, "$setOnInsert": {"created_at": now}},
+        upsert=expected is None
+    )
+
+async def bulk_write_quotas(operations: List[UpdateOne]):
+    try:
+        await member_quotas_collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Two allocations inserting the same new member race on the unique
+        # index; the loser's document now exists, so its update is replayed once
+        retry = [operations[err["index"]] for err in e.details.get("writeErrors", []) if err.get("code") == DUPLICATE_KEY]
+        if len(retry) < len(e.details.get("writeErrors", [])):
+            raise
+        if retry:
+            await member_quotas_collection.bulk_write(retry, ordered=False)
+
+async def allocate_member_quotas(owner_type: str, owner_id: str, members: List[dict]) -> dict:
+    """Set quotas for many members at once.
+
+    Members carrying a version are only updated if that is still the stored
+    version; the ones that lost a race come back in conflicts with their
+    current values. Repeated ids in one request: the last one wins.
+    """
+    by_id: Dict[str, dict] = {str(m["id"]): m for m in members}
+    write_id = uuid.uuid4().hex
+    now = datetime.now().isoformat()
+    chunk_size = QUOTA_CONFIG["bulk_chunk_size"]
+    ids = list(by_id)
+
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        await bulk_write_quotas([quota_write(owner_type, owner_id, by_id[i], write_id, now) for i in chunk])
+
+    updated, conflicts = [], []
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        async for doc in member_quotas_collection.find(
+            {"owner_type": owner_type, "owner_id": owner_id, "member_id": {"$in": chunk}},
+            {**QUOTA_PROJECTION, "write_id": 1}
+        ):
+            (updated if doc.pop("write_id", None) == write_id else conflicts).append(doc)
+    # A versioned update of a member that has no quota yet matched nothing
+    found = {doc["id"] for doc in updated + conflicts}
+    conflicts.extend({"id": i, "quota": None, "version": None} for i in ids if i not in found)
+    return {"updated_members": updated, "conflicts": conflicts}
+
+async def settle_member_quota(owner_type: str, owner_id: str, member_id: str, total_contributed: float) -> bool:
+    """Zero a member's quota once their contributions cover it; True if it was settled."""
+    result = await member_quotas_collection.update_one(
+        {**quota_key(owner_type, owner_id, member_id), "quota": {"$gt": 0, "$lte": total_contributed}},
+        {"$set": {"quota": 0.0, "updated_at": datetime.now().isoformat()}, "$inc": {"version": 1}}
+    )
+    return result.modified_count > 0
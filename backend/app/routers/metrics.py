@@ -0,0 +1,287 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+# In-process metrics rendered in the Prometheus text format at /metrics.
+# Counters, gauges and histograms are keyed by label values; observations come
+# from the request middleware, pymongo's command listener (which runs on
+# Motor's executor threads, hence the lock), the loop watchdog and the
+# AI/scheduler call sites.
+
+METRICS_CONFIG = {
+    # seconds; HTTP, Mongo and LLM latencies span ~1ms to ~1min
+    "latency_buckets": (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+    "cycle_buckets": (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0),
+}
+
+_registry = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=None):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets or METRICS_CONFIG["latency_buckets"]))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, [list(s[0]), s[1], s[2]]) for key, s in self._series.items())
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "ambag_http_request_duration_seconds", "HTTP request latency by router", ("router", "method", "status")
+)
+MONGO_COMMANDS = Counter(
+    "ambag_mongo_commands_total", "Mongo commands by collection and outcome", ("collection", "command", "outcome")
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "ambag_mongo_command_duration_seconds", "Mongo command latency by collection", ("collection", "command")
+)
+MONGO_POOL_CHECKOUT_SECONDS = Histogram(
+    "ambag_mongo_pool_checkout_seconds", "Wait for a pooled Mongo connection", ("pool", "outcome")
+)
+MONGO_POOL_CHECKED_OUT = Gauge("ambag_mongo_pool_checked_out", "Mongo connections currently checked out", ("pool",))
+MONGO_POOL_CONNECTIONS = Gauge("ambag_mongo_pool_connections", "Open Mongo connections", ("pool",))
+LLM_REQUEST_SECONDS = Histogram(
+    "ambag_llm_request_duration_seconds", "LLM call latency by caller", ("caller", "outcome")
+)
+LLM_TOKENS = Counter("ambag_llm_tokens_total", "LLM tokens used by caller", ("caller", "kind"))
+SCHEDULER_CYCLE_SECONDS = Histogram(
+    "ambag_scheduler_cycle_duration_seconds", "Scheduler cycle duration by job", ("job", "mode"),
+    buckets=METRICS_CONFIG["cycle_buckets"]
+)
+SCHEDULER_STAGE_SECONDS = Counter(
+    "ambag_scheduler_stage_seconds_total", "Time spent per monitoring stage", ("stage",)
+)
+SCHEDULER_GOALS = Counter("ambag_scheduler_goals_processed_total", "Goals analysed by the monitoring cycle")
+LOOP_LAG_SECONDS = Histogram(
+    "ambag_event_loop_lag_seconds", "Event loop scheduling lag per watchdog tick",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+LOOP_LAG_QUANTILES = Gauge(
+    "ambag_event_loop_lag_recent_seconds", "Event loop lag quantiles over the recent watchdog window", ("quantile",)
+)
+STARTUP_SECONDS = Gauge("ambag_startup_seconds", "Import and resource initialisation time by phase", ("phase",))
+LOOP_BLOCKS = Counter("ambag_event_loop_blocks_total", "Stalls longer than the watchdog block threshold")
+
+def route_group(scope: dict) -> str:
+    """First segment of the matched route template ('/ai-tools/{id}' -> 'ai-tools'), bounded cardinality."""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    return path.strip("/").split("/", 1)[0] or "root"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per router.
+
+    Event streams are left out: their duration is the client's session, not
+    a request latency.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        response = {"status": 500, "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type" and value.startswith(b"text/event-stream"):
+                        response["stream"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not response["stream"]:
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start,
+                    router=route_group(scope), method=scope["method"], status=response["status"]
+                )
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Counts and times every command per collection; pass it to the client's event_listeners."""
+
+    def __init__(self):
+        self._pending: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._pending.pop((event.connection_id, event.request_id), "")
+        MONGO_COMMANDS.inc(collection=collection, command=event.command_name, outcome=outcome)
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, collection=collection, command=event.command_name)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Checkout wait time and pool occupancy for one client's pools (labelled by workload)."""
+
+    def __init__(self, pool: str):
+        self.pool = pool
+
+    def connection_checked_out(self, event):
+        MONGO_POOL_CHECKOUT_SECONDS.observe(event.duration or 0.0, pool=self.pool, outcome="ok")
+        MONGO_POOL_CHECKED_OUT.inc(1, pool=self.pool)
+
+    def connection_check_out_failed(self, event):
+        MONGO_POOL_CHECKOUT_SECONDS.observe(event.duration or 0.0, pool=self.pool, outcome=event.reason)
+
+    def connection_checked_in(self, event):
+        MONGO_POOL_CHECKED_OUT.inc(-1, pool=self.pool)
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.inc(1, pool=self.pool)
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.inc(-1, pool=self.pool)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+@contextmanager
+def observe_llm_call(caller: str):
+    """Time an LLM call; set call["usage"] to the response usage to count tokens."""
+    call: Dict[str, Optional[object]] = {"usage": None}
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield call
+        outcome = "ok"
+    finally:
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, caller=caller, outcome=outcome)
+        usage = call["usage"]
+        if usage is not None:
+            LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, caller=caller, kind="prompt")
+            LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, caller=caller, kind="completion")
+
+def record_scheduler_cycle(job: str, seconds: float, mode: str = "", stage_seconds: Optional[dict] = None, goals: int = 0):
+    SCHEDULER_CYCLE_SECONDS.observe(seconds, job=job, mode=mode)
+    for stage, value in (stage_seconds or {}).items():
+        SCHEDULER_STAGE_SECONDS.inc(value, stage=stage)
+    if goals:
+        SCHEDULER_GOALS.inc(goals)
@@ -1,31 +1,263 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+import asyncio
+import functools
+import logging
 import os
-from dotenv import load_dotenv
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from .metrics import MongoCommandMetrics, MongoPoolMetrics
+from .query_tracer import QueryTraceListener
+from .read_routing import ANALYTICS_READ_PREFERENCE, WriteTimeListener, current_read_route, read_after
+from .resources import resources
 
 
-load_dotenv()
+# Two clients with separate pools: interactive (requests) and background
+# (scheduler, reconcilers, change streams), so a scheduler burst queues on its
+# own pool instead of taking connections from user requests. Code running
+# inside background_pool() (and every task it creates) resolves collections on
+# the background client; everything else uses the interactive one.
+MONGO_POOL_CONFIG = {
+	"interactive": {
+		"maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 50)),
+		"minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 5)),
+	},
+	"background": {
+		"maxPoolSize": int(os.getenv("MONGO_BACKGROUND_MAX_POOL_SIZE", 20)),
+		"minPoolSize": int(os.getenv("MONGO_BACKGROUND_MIN_POOL_SIZE", 2)),
+	},
+	"shared": {
+		"connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000)),
+		"serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)),
+		"waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 10000)),  # max wait for a pooled connection
+		"maxIdleTimeMS": 5 * 60 * 1000,
+	},
+}
+MONGO_WORKLOADS = ("interactive", "background")
 
-# Use the correct environment variable for MongoDB URI
-MONGO_URI = os.getenv("MONGODB_URI")
-if not MONGO_URI:
-	raise RuntimeError("MONGODB_URI environment variable is not set. Please set it in your environment.")
-client = AsyncIOMotorClient(MONGO_URI)
-db = client["ambag_database"]
+current_workload: ContextVar[str] = ContextVar("mongo_workload", default="interactive")
+# Causally consistent session of the current analytics_reads() block, if any
+current_session: ContextVar[Optional[object]] = ContextVar("mongo_session", default=None)
+
+# Collection methods that get the current causal session injected
+SESSION_OPERATIONS = frozenset((
+	"find", "find_one", "aggregate", "count_documents", "distinct",
+	"insert_one", "insert_many", "update_one", "update_many", "replace_one",
+	"delete_one", "delete_many", "find_one_and_update", "find_one_and_delete", "bulk_write",
+))
+
+@contextmanager
+def background_pool():
+	token = current_workload.set("background")
+	try:
+		yield
+	finally:
+		current_workload.reset(token)
+
+def create_client(workload: str):
+	# Use the correct environment variable for MongoDB URI
+	mongo_uri = os.getenv("MONGODB_URI")
+	if not mongo_uri:
+		raise RuntimeError("MONGODB_URI environment variable is not set. Please set it in your environment.")
+	return AsyncIOMotorClient(
+		mongo_uri,
+		appname=f"ambag-{workload}",
+		event_listeners=[MongoCommandMetrics(), QueryTraceListener(), WriteTimeListener(), MongoPoolMetrics(workload)],
+		**MONGO_POOL_CONFIG["shared"],
+		**MONGO_POOL_CONFIG[workload],
+	)
+
+def client_resource(workload: str) -> str:
+	return "mongo_client" if workload == "interactive" else f"mongo_{workload}_client"
+
+def db_resource(workload: str) -> str:
+	return "mongo_db" if workload == "interactive" else f"mongo_{workload}_db"
+
+for _workload in MONGO_WORKLOADS:
+	resources.register(client_resource(_workload), lambda w=_workload: create_client(w), close=lambda c: c.close())
+	resources.register(db_resource(_workload), lambda w=_workload: resources.get(client_resource(w))[os.getenv("MONGODB_DB", "ambag_database")])
+
+class LazyResource:
+	"""Module-level stand-in for a per-workload resource; built on first attribute access, re-resolved after an override."""
+
+	def __init__(self, resolve):
+		self._resolve_target = resolve
+		self._targets = {}
+		self._version = -1
+
+	def _route(self) -> tuple:
+		return (current_workload.get(),)
+
+	def _resolve(self):
+		if self._version != resources.version:
+			self._targets = {}
+			self._version = resources.version
+		route = self._route()
+		target = self._targets.get(route)
+		if target is None:
+			target = self._targets[route] = self._resolve_target(*route)
+		return target
+
+	def __getattr__(self, attr):
+		return getattr(self._resolve(), attr)
+
+	def __getitem__(self, key):
+		return self._resolve()[key]
+
+class LazyCollection(LazyResource):
+	"""Also routed by read preference: inside analytics_reads() reads go to secondaries."""
+
+	def __init__(self, name: str):
+		super().__init__(self._collection)
+		self.name = name
+
+	def _collection(self, workload: str, read_route: str):
+		collection = resources.get(db_resource(workload))[self.name]
+		if read_route == "analytics" and ANALYTICS_READ_PREFERENCE is not None:
+			collection = collection.with_options(read_preference=ANALYTICS_READ_PREFERENCE)
+		return collection
+
+	def _route(self) -> tuple:
+		return (current_workload.get(), current_read_route.get())
+
+	def __getattr__(self, attr):
+		value = getattr(self._resolve(), attr)
+		session = current_session.get()
+		if session is not None and attr in SESSION_OPERATIONS and current_workload.get() == "interactive":
+			return functools.partial(value, session=session)
+		return value
+
+class LazyDatabase(LazyResource):
+	def __getitem__(self, name: str):
+		# Module-level db["x"] lookups must not connect at import time
+		return LazyCollection(name)
+
+client = LazyResource(lambda workload: resources.get(client_resource(workload)))
+db = LazyDatabase(lambda workload: resources.get(db_resource(workload)))
+
+@asynccontextmanager
+async def analytics_reads():
+	"""Read from secondaries (bounded staleness) inside this block.
+
+	If the request carried an X-Read-After token the reads run in a causally
+	consistent session advanced to it, so they include the caller's own
+	earlier write.
+	"""
+	route_token = current_read_route.set("analytics")
+	session = session_token = None
+	after = read_after.get()
+	if after is not None and ANALYTICS_READ_PREFERENCE is not None and current_workload.get() == "interactive":
+		session = await resources.get("mongo_client").start_session(causal_consistency=True)
+		session.advance_operation_time(after)
+		session_token = current_session.set(session)
+	try:
+		yield
+	finally:
+		if session is not None:
+			current_session.reset(session_token)
+			await session.end_session()
+		current_read_route.reset(route_token)
+
+def uses_analytics_reads(func):
+	"""Run an async function (e.g. a read-only endpoint) inside analytics_reads()."""
+	@functools.wraps(func)
+	async def wrapper(*args, **kwargs):
+		async with analytics_reads():
+			return await func(*args, **kwargs)
+	return wrapper
+
+async def warm_up_pools():
+	"""Open minPoolSize connections per pool now instead of on the first requests after a deploy.
+
+	Concurrent pings each check out a connection, so the handshakes (TCP,
+	TLS, auth) happen in parallel; pymongo keeps the pools at minPoolSize
+	from then on.
+	"""
+	async def warm(workload: str):
+		mongo_client = resources.get(client_resource(workload))
+		size = max(1, MONGO_POOL_CONFIG[workload]["minPoolSize"])
+		try:
+			await asyncio.gather(*(mongo_client.admin.command("ping") for _ in range(size)))
+		except Exception as e:
+			logger.warning(f"Could not warm up the {workload} Mongo pool: {e}")
+
+	await asyncio.gather(*(warm(workload) for workload in MONGO_WORKLOADS))
 
 users_collection = db["users"]
 member_requests_collection = db["member_requests"]
 groups_collection = db["groups"]
+# One document per (group_id, firebase_uid); groups keep member_count/role_counts
+group_members_collection = db["group_members"]
 goals_collection = db["goals"]
 pool_status_collection = db["pool_status"]
 pending_goals_collection = db["pending_goals"]
 auto_payment_queue_collection = db["auto_payment_queue"]
 plans_collection = db["plans_collection"]
+# One quota per (owner_type goal|plan, owner_id, member_id)
+member_quotas_collection = db["member_quotas"]
 virtual_balances_collection = db["virtual_balances"]
 request_collection = db["requests"]
 
 smart_reminders_collection = db["smart_reminders"]
 notifications_collection = db["notifications"]
+# One {_id: recipient, unread: n} document per inbox
+notification_counters_collection = db["notification_counters"]
+# Read auto-generated notifications are deleted this long after being read
+READ_NOTIFICATIONS_TTL_SECONDS = int(os.getenv("READ_NOTIFICATIONS_TTL_SECONDS", 30 * 24 * 3600))
 executed_actions_collection = db["executed_actions"]
 
 conversations_collection = db["conversations"]
-simulation_results_collection = db["simulation_results"]
\ No newline at end of file
+# One document per distinct (baseline, scenario set), keyed by result_key
+simulation_results_collection = db["simulation_results"]
+SIMULATION_RESULTS_TTL_SECONDS = int(os.getenv("SIMULATION_RESULTS_TTL_SECONDS", 30 * 24 * 3600))
+
+# Scheduler risk assessments, one document per event, expired by TTL
+monitoring_events_collection = db["monitoring_events"]
+MONITORING_EVENTS_TTL_SECONDS = int(os.getenv("MONITORING_EVENTS_TTL_SECONDS", 14 * 24 * 3600))
+# Progress of maintenance scripts, one {_id: job name, ...} document per job
+migration_checkpoints_collection = db["migration_checkpoints"]
+
+logger = logging.getLogger(__name__)
+
+# (collection, keys, options) for every index the app relies on
+INDEXES = [
+	(monitoring_events_collection, [("timestamp", ASCENDING)], {"name": "timestamp_ttl", "expireAfterSeconds": MONITORING_EVENTS_TTL_SECONDS}),
+	(monitoring_events_collection, [("goal_id", ASCENDING), ("timestamp", DESCENDING)], {"name": "goal_timestamp"}),
+	# Deadline calendar: scheduler risk-window scans and at-risk counts
+	(goals_collection, [("status", ASCENDING), ("target_date", ASCENDING), ("progress_ratio", ASCENDING)], {"name": "status_target_date_progress"}),
+	# Payout state machine: one queue entry and one payout record per goal
+	(auto_payment_queue_collection, [("goal_id", ASCENDING)], {"name": "goal_id_unique", "unique": True}),
+	(virtual_balances_collection, [("payout_id", ASCENDING)], {"name": "payout_id_unique", "unique": True, "partialFilterExpression": {"payout_id": {"$exists": True}}}),
+	# since-cursor reads and notification stream catch-up
+	(notifications_collection, [("group_id", ASCENDING), ("_id", ASCENDING)], {"name": "group_id_id"}),
+	(notifications_collection, [("recipient", ASCENDING), ("_id", ASCENDING)], {"name": "recipient_id"}),
+	(smart_reminders_collection, [("group_id", ASCENDING), ("_id", ASCENDING)], {"name": "group_id_id"}),
+	(smart_reminders_collection, [("goal_id", ASCENDING), ("_id", ASCENDING)], {"name": "goal_id_id"}),
+	(executed_actions_collection, [("group_id", ASCENDING), ("_id", ASCENDING)], {"name": "group_id_id"}),
+	# Dashboard rows' member counts ($lookup on groups.group_id)
+	(groups_collection, [("group_id", ASCENDING)], {"name": "group_id"}),
+	# Inbox pages (keyset on timestamp, _id) and retention of read auto-generated notifications
+	(notifications_collection, [("recipient", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], {"name": "recipient_timestamp"}),
+	(notifications_collection, [("read_at", ASCENDING)], {"name": "read_at_ttl", "expireAfterSeconds": READ_NOTIFICATIONS_TTL_SECONDS, "partialFilterExpression": {"auto_generated": True}}),
+	# Per-group goal lists and the group stats reconciler
+	(goals_collection, [("group_id", ASCENDING), ("status", ASCENDING)], {"name": "group_id_status"}),
+	# Quota lookups and bulk allocation
+	(member_quotas_collection, [("owner_type", ASCENDING), ("owner_id", ASCENDING), ("member_id", ASCENDING)], {"name": "owner_member_unique", "unique": True}),
+	# Every goal-scoped pool read/write, the pool_status reconciler's $lookup and its upserts
+	(pool_status_collection, [("goal_id", ASCENDING)], {"name": "goal_id"}),
+	# Reused simulation runs; results expire a while after they were first computed
+	(simulation_results_collection, [("result_key", ASCENDING)], {"name": "result_key_unique", "unique": True, "partialFilterExpression": {"result_key": {"$exists": True}}}),
+	(simulation_results_collection, [("created_at", ASCENDING)], {"name": "created_at_ttl", "expireAfterSeconds": SIMULATION_RESULTS_TTL_SECONDS}),
+	# Group membership: one row per member, member pages keyset on firebase_uid
+	(group_members_collection, [("group_id", ASCENDING), ("firebase_uid", ASCENDING)], {"name": "group_id_firebase_uid_unique", "unique": True}),
+	(group_members_collection, [("firebase_uid", ASCENDING)], {"name": "firebase_uid"}),
+]
+
+async def ensure_indexes():
+	"""Create missing indexes; safe to run on every startup."""
+	for collection, keys, options in INDEXES:
+		try:
+			await collection.create_index(keys, **options)
+		except Exception as e:
+			logger.warning(f"Could not create index {options.get('name', keys)} on {collection.name}: {e}")
\ No newline at end of file
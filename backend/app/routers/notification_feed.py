@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Iterable, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from .mongo import background_pool, notifications_collection
+from .notification_store import find_since
+from .responses import dumps_bson
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Live notifications for SSE clients. One consumer per process watches
+# notification inserts (or polls for them on a standalone mongod, where change
+# streams are not available) and copies each new notification into the
+# bounded queue of every matching subscriber, so the number of open streams
+# never depends on the number of clients.
+
+NOTIFICATION_FEED_CONFIG = {
+    "subscriber_queue_size": 100,  # a subscriber this far behind loses its oldest events
+    "retry_seconds": 5.0,  # wait before reopening a failed change stream
+    "poll_interval": 3.0,  # fallback when change streams are unavailable (standalone mongod)
+    "poll_batch_size": 500,
+}
+
+# OperationFailure code of $changeStream on a standalone server
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+def format_event(doc: dict) -> str:
+    return f"id: {doc['_id']}\nevent: notification\ndata: {dumps_bson(doc).decode()}\n\n"
+
+class NotificationSubscription:
+    """One client's stream: notifications of a group and/or recipients, as encoded events."""
+
+    def __init__(self, group_id: Optional[str], recipients: Iterable[str], queue_size: int):
+        self.group_id = group_id
+        self.recipients = frozenset(recipients or ())
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    @property
+    def keys(self) -> Tuple[str, ...]:
+        # Indexed by group when there is one (the recipient filter is checked on delivery)
+        return (f"group:{self.group_id}",) if self.group_id else tuple(f"recipient:{r}" for r in self.recipients)
+
+    def matches(self, doc: dict) -> bool:
+        if self.group_id and doc.get("group_id") != self.group_id:
+            return False
+        return not self.recipients or doc.get("recipient") in self.recipients
+
+    def offer(self, item: Tuple[ObjectId, str]):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+class NotificationFeed:
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # "group:<id>" / "recipient:<id>" -> {NotificationSubscription}
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        self._polling = False
+        self._last_polled_id = None
+        self.mode = "stopped"
+
+    def subscribe(self, group_id: Optional[str], recipients: Iterable[str]) -> NotificationSubscription:
+        subscription = NotificationSubscription(group_id, recipients, NOTIFICATION_FEED_CONFIG["subscriber_queue_size"])
+        for key in subscription.keys:
+            self._subscribers[key].add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: NotificationSubscription):
+        for key in subscription.keys:
+            subs = self._subscribers.get(key)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[key]
+
+    def publish(self, doc: dict):
+        """Deliver a new notification to every matching subscriber; never blocks."""
+        subs = set()
+        for key in (f"group:{doc.get('group_id')}", f"recipient:{doc.get('recipient')}"):
+            subs.update(self._subscribers.get(key, ()))
+        message = None
+        for subscription in subs:
+            if subscription.matches(doc):
+                message = message or format_event(doc)
+                subscription.offer((doc["_id"], message))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            # The change stream holds a connection for its lifetime; keep it off the request pool
+            with background_pool():
+                self._task = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
+
+    async def _consume(self):
+        logger.info("📡 Notification feed consumer started")
+        while True:
+            try:
+                if self._polling:
+                    await self._poll()
+                async with notifications_collection.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=self._resume_token,
+                ) as stream:
+                    self.mode = "change_stream"
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        self.publish(change["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if getattr(e, "code", None) == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("📡 Notification feed falling back to polling")
+                    self._polling = True
+                    continue
+                # An expired resume token would fail forever; start from now instead
+                self._resume_token = None
+                logger.warning(f"Notification feed error, retrying in {NOTIFICATION_FEED_CONFIG['retry_seconds']}s: {e}")
+            await asyncio.sleep(NOTIFICATION_FEED_CONFIG["retry_seconds"])
+
+    async def _poll(self):
+        self.mode = "polling"
+        if self._last_polled_id is None:
+            # Only what is inserted from now on is new, not the history
+            newest = await notifications_collection.find({}, {"_id": 1}).sort("_id", -1).limit(1).to_list(length=1)
+            self._last_polled_id = newest[0]["_id"] if newest else ObjectId()
+        while True:
+            docs = await find_since(notifications_collection, {}, self._last_polled_id, NOTIFICATION_FEED_CONFIG["poll_batch_size"])
+            for doc in docs:
+                self._last_polled_id = doc["_id"]
+                self.publish(doc)
+            if len(docs) < NOTIFICATION_FEED_CONFIG["poll_batch_size"]:
+                await asyncio.sleep(NOTIFICATION_FEED_CONFIG["poll_interval"])
+
+notification_feed = NotificationFeed()
@@ -0,0 +1,106 @@
+from fastapi import HTTPException
+from typing import List, Optional, Tuple
+from collections import Counter
+from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING, UpdateOne
+
+from .mongo import notifications_collection, notification_counters_collection
+
+# Read helpers shared by the notification REST endpoints and the push stream.
+# Kept free of auth imports so ai_tools_clean (and the scheduler) can use them.
+
+def parse_since(since: Optional[str]) -> Optional[ObjectId]:
+    if not since:
+        return None
+    try:
+        return ObjectId(since)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="since must be a notification id")
+
+async def find_since(collection, query: dict, since: Optional[ObjectId], limit: Optional[int] = None) -> list:
+    """Documents matching query inserted after the since id, oldest first."""
+    if since is not None:
+        query = {**query, "_id": {"$gt": since}}
+    cursor = collection.find(query).sort("_id", 1)
+    if limit:
+        cursor = cursor.limit(limit)
+    return await cursor.to_list(length=limit)
+
+# --- Per-recipient inbox ---
+# Notifications carry read/read_at; notification_counters keeps one
+# {_id: recipient, unread: n} document per recipient so badge counts never
+# scan the inbox. Inbox pages use keyset pagination on (recipient, timestamp, _id).
+
+async def insert_notifications(docs: list):
+    """Insert notifications as unread and bump each recipient's unread counter."""
+    if not docs:
+        return
+    for doc in docs:
+        doc.setdefault("read", False)
+    await notifications_collection.insert_many(docs)
+    unread = Counter(doc.get("recipient") for doc in docs if doc.get("recipient") and not doc["read"])
+    if unread:
+        # Counters are created here; notifications from before counters are
+        # counted in by scripts/recount_notification_counters.py
+        await notification_counters_collection.bulk_write(
+            [UpdateOne({"_id": recipient}, {"$inc": {"unread": count}}, upsert=True) for recipient, count in unread.items()],
+            ordered=False
+        )
+
+async def get_unread_count(recipient: str) -> int:
+    counter = await notification_counters_collection.find_one({"_id": recipient})
+    if counter is not None:
+        return max(0, counter.get("unread", 0))
+    # Nothing inserted since counters existed (and not backfilled yet): count, read-only
+    return await notifications_collection.count_documents({"recipient": recipient, "read": {"$ne": True}})
+
+def encode_inbox_cursor(doc: dict) -> str:
+    return f"{doc.get('timestamp', '')}|{doc['_id']}"
+
+def decode_inbox_cursor(cursor: str) -> Tuple[str, ObjectId]:
+    timestamp, _, object_id = cursor.rpartition("|")
+    try:
+        return timestamp, ObjectId(object_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid inbox cursor")
+
+async def get_inbox_page(recipient: str, limit: int, cursor: Optional[str] = None, unread_only: bool = False) -> dict:
+    """Newest-first page of a recipient's notifications plus the cursor for the next page."""
+    query = {"recipient": recipient}
+    if unread_only:
+        query["read"] = {"$ne": True}
+    if cursor:
+        timestamp, object_id = decode_inbox_cursor(cursor)
+        query["$or"] = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": object_id}},
+        ]
+    docs = await notifications_collection.find(query).sort(
+        [("timestamp", DESCENDING), ("_id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return {
+        "notifications": docs,
+        "next_cursor": encode_inbox_cursor(docs[-1]) if has_more else None,
+        "has_more": has_more,
+    }
+
+async def mark_notifications_read(recipient: str, ids: Optional[List[ObjectId]] = None) -> int:
+    """Mark the given (or all) unread notifications of a recipient as read; returns how many changed."""
+    query = {"recipient": recipient, "read": {"$ne": True}}
+    if ids is not None:
+        query["_id"] = {"$in": ids}
+    result = await notifications_collection.update_many(
+        query, {"$set": {"read": True, "read_at": datetime.now(timezone.utc)}}
+    )
+    # Subtract what this call changed (never reset to 0), so a notification
+    # inserted meanwhile keeps its $inc
+    if result.modified_count:
+        await notification_counters_collection.update_one(
+            {"_id": recipient},
+            [{"$set": {"unread": {"$max": [0, {"$subtract": [{"$ifNull": ["$unread", 0]}, result.modified_count]}]}}}]
+        )
+    return result.modified_count
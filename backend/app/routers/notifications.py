@@ -0,0 +1,131 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+import asyncio
+import logging
+
+from .mongo import notifications_collection
+from .group_membership import count_member_groups
+from .notification_feed import notification_feed, format_event
+from .notification_store import (
+    parse_since,
+    find_since,
+    get_inbox_page,
+    get_unread_count,
+    mark_notifications_read,
+)
+from .responses import BSONJSONResponse
+from .verify_token import verify_token
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/notifications", tags=["notifications"])
+
+class MarkReadRequest(BaseModel):
+    ids: Optional[List[str]] = None  # omit to mark the whole inbox read
+
+NOTIFICATION_STREAM_CONFIG = {
+    "heartbeat_seconds": 15,  # comment line sent when nothing happened, keeps proxies from closing the stream
+    "catch_up_limit": 200,  # max missed notifications replayed on reconnect
+}
+
+def parse_last_event_id(last_event_id: Optional[str]) -> Optional[ObjectId]:
+    """Notification id of an SSE event id (older clients may send "<id>.<resume token>")."""
+    if not last_event_id:
+        return None
+    try:
+        return ObjectId(last_event_id.partition(".")[0])
+    except (InvalidId, TypeError):
+        return None
+
+async def notification_events(request: Request, group_id: Optional[str], recipients: List[str], since: Optional[ObjectId]):
+    config = NOTIFICATION_STREAM_CONFIG
+    # Subscribe before catching up, so nothing inserted meanwhile is missed (it is seen twice at most)
+    subscription = notification_feed.subscribe(group_id, recipients)
+    sent = set()
+    try:
+        if since is not None:
+            query = {}
+            if group_id:
+                query["group_id"] = group_id
+            if recipients:
+                query["recipient"] = {"$in": recipients}
+            for doc in await find_since(notifications_collection, query, since, config["catch_up_limit"]):
+                sent.add(doc["_id"])
+                yield format_event(doc)
+
+        while not await request.is_disconnected():
+            try:
+                doc_id, message = await asyncio.wait_for(subscription.queue.get(), timeout=config["heartbeat_seconds"])
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if doc_id not in sent:
+                yield message
+    finally:
+        notification_feed.unsubscribe(subscription)
+        if subscription.dropped:
+            logger.info(f"Notification stream subscriber dropped {subscription.dropped} events")
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    group_id: Optional[str] = None,
+    recipient: Optional[List[str]] = Query(None),
+    since: Optional[str] = None,
+    user=Depends(verify_token)
+):
+    """Server-sent events for new notifications of a group and/or recipients.
+
+    Reconnecting clients send Last-Event-ID (EventSource does this
+    automatically) or pass since=<notification id> to receive what they missed.
+    Callers can only stream their own notifications and groups they belong to.
+    """
+    if not group_id and not recipient:
+        raise HTTPException(status_code=400, detail="group_id or recipient is required")
+    uid = inbox_recipient(user)
+    if recipient and set(recipient) != {uid}:
+        raise HTTPException(status_code=403, detail="Can only stream your own notifications")
+    if group_id and await count_member_groups(uid, {group_id}) < 1:
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+    since_id = parse_last_event_id(request.headers.get("last-event-id")) or parse_since(since)
+
+    return StreamingResponse(
+        notification_events(request, group_id, recipient or [], since_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def inbox_recipient(user: dict) -> str:
+    recipient = user.get("uid") or user.get("firebase_uid")
+    if not recipient:
+        raise HTTPException(status_code=401, detail="Token has no uid")
+    return recipient
+
+@router.get("/inbox")
+async def get_inbox(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    unread_only: bool = False,
+    user=Depends(verify_token)
+):
+    """Newest-first page of the caller's notifications; pass next_cursor to get the next page."""
+    recipient = inbox_recipient(user)
+    page = await get_inbox_page(recipient, limit, cursor, unread_only)
+    page["unread_count"] = await get_unread_count(recipient)
+    return BSONJSONResponse(page)
+
+@router.get("/inbox/unread-count")
+async def get_inbox_unread_count(user=Depends(verify_token)):
+    return {"unread_count": await get_unread_count(inbox_recipient(user))}
+
+@router.post("/inbox/mark-read")
+async def mark_inbox_read(body: MarkReadRequest, user=Depends(verify_token)):
+    recipient = inbox_recipient(user)
+    ids = [parse_since(i) for i in body.ids] if body.ids is not None else None
+    updated = await mark_notifications_read(recipient, ids)
+    return {"marked_read": updated, "unread_count": await get_unread_count(recipient)}
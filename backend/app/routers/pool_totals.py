@@ -0,0 +1,94 @@
+from typing import Optional
+
+from .goal_snapshots import REVISION_BUMP
+from .mongo import pool_status_collection
+
+# Per-member contribution totals on pool_status:
+#   totals_by_uid: {<uid key>: total contributed}, contributor_count: distinct uids
+# Both move in the same update that appends to contributors, so the quota
+# check and the analytics never have to re-sum the contributors array.
+# Contributors without a Firebase uid are keyed by their name, like the
+# contributor entries themselves. Pools written before these fields existed
+# are read from the contributors array and seeded from it on their next
+# contribution, so nothing depends on backfill_pool_totals.py having run.
+
+def uid_key(uid) -> str:
+    """Escape a uid for use as a field name ('.' splits paths, a leading '$' is an operator)."""
+    return str(uid).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+def uid_from_key(key: str) -> str:
+    return key.replace("%24", "$").replace("%2E", ".").replace("%25", "%")
+
+def pool_member_totals(pool: Optional[dict]) -> dict:
+    """totals_by_uid of a pool, recomputed from contributors on a pool that predates it."""
+    if not pool:
+        return {}
+    if "totals_by_uid" in pool:
+        return pool["totals_by_uid"] or {}
+    return contributor_totals(pool.get("contributors"))
+
+def pool_contributor_count(pool: Optional[dict]) -> int:
+    if pool and "contributor_count" in pool:
+        return pool["contributor_count"] or 0
+    return len(pool_member_totals(pool))
+
+def member_total(pool: Optional[dict], uid) -> float:
+    if not pool or uid is None:
+        return 0.0
+    return float(pool_member_totals(pool).get(uid_key(uid), 0) or 0)
+
+async def seed_pool_totals(goal_id: str):
+    """Give a pool without totals_by_uid the totals of its contributors array.
+
+    Compare-and-set on the revision read, so contributions written meanwhile
+    are not left out; reread and retry until the pool has its totals.
+    """
+    while True:
+        pool = await pool_status_collection.find_one(
+            {"goal_id": goal_id, "totals_by_uid": {"$exists": False}}, {"contributors": 1, "revision": 1}
+        )
+        if pool is None:
+            return
+        totals = contributor_totals(pool.get("contributors"))
+        result = await pool_status_collection.update_one(
+            {"_id": pool["_id"], "totals_by_uid": {"$exists": False}, "revision": pool.get("revision")},
+            {"$set": {"totals_by_uid": totals, "contributor_count": len(totals)}}
+        )
+        if result.matched_count:
+            return
+
+async def record_pool_contribution(goal_id: str, uid, entries: list):
+    """Append contributor entries for one uid and move current_amount, totals_by_uid and contributor_count together.
+
+    The first write only matches while the uid has no total yet, so
+    contributor_count goes up exactly once per uid even under concurrency.
+    """
+    await seed_pool_totals(goal_id)
+    amount = sum(float(e.get("amount", 0) or 0) for e in entries)
+    total_field = f"totals_by_uid.{uid_key(uid)}"
+    inc = {"current_amount": amount, total_field: amount, **REVISION_BUMP}
+    update = {"$push": {"contributors": {"$each": entries}}}
+    result = await pool_status_collection.update_one(
+        {"goal_id": goal_id, total_field: {"$exists": False}},
+        {**update, "$inc": {**inc, "contributor_count": 1}}
+    )
+    if result.matched_count == 0:
+        await pool_status_collection.update_one({"goal_id": goal_id}, {**update, "$inc": inc})
+
+# Aggregation expression for contributor_count, counting distinct contributors
+# on a pool that predates the field
+CONTRIBUTOR_COUNT_EXPR = {"$ifNull": ["$contributor_count", {"$size": {"$setDifference": [
+    {"$map": {"input": {"$ifNull": ["$contributors", []]}, "in": {"$ifNull": ["$$this.uid", "$$this.name"]}}},
+    [None],
+]}}]}
+
+def contributor_totals(contributors: list) -> dict:
+    """totals_by_uid recomputed from a contributors array (backfill and repair)."""
+    totals = {}
+    for c in contributors or []:
+        uid = c.get("uid") or c.get("name")
+        if uid is None:
+            continue
+        key = uid_key(uid)
+        totals[key] = totals.get(key, 0.0) + float(c.get("amount", 0) or 0)
+    return totals
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from .verify_token import require_admin
+
+# On-demand sampling profiler for a live worker. A background thread reads
+# the event loop thread's stack (and optionally every other thread, e.g.
+# Motor's executor) at a fixed interval for a bounded window and returns the
+# samples as collapsed stacks ("frame;frame;frame count"), which flamegraph.pl,
+# speedscope and inferno read directly. A ticker coroutine measures event loop
+# lag over the same window, so blocking calls on the loop show up both as
+# lag and as the stack that caused it.
+
+PROFILING_CONFIG = {
+    "max_seconds": 60,
+    "default_seconds": 10,
+    "min_interval_ms": 1,
+    "default_interval_ms": 5,
+    "max_depth": 128,
+}
+
+router = APIRouter(prefix="/admin/profile", tags=["admin"])
+
+_profile_lock = asyncio.Lock()
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    path = code.co_filename
+    if path.startswith(APP_ROOT):
+        path = os.path.relpath(path, APP_ROOT)
+    else:
+        path = os.path.basename(path)
+    return f"{code.co_name} ({path}:{frame.f_lineno})"
+
+def collapse(frame, max_depth: int) -> str:
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_ids: Optional[set], interval: float, max_depth: int):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_ids = thread_ids  # None: every thread except the sampler
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            if self.thread_ids is None:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = collapse(frame, self.max_depth)
+                if self.thread_ids is None:
+                    stack = f"{names.get(ident, ident)};{stack}"
+                self.samples[stack] += 1
+            self.sample_count += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+async def measure_loop_lag(interval: float, stop: asyncio.Event) -> list:
+    lags = []
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+    return lags
+
+def is_idle(stack: str) -> bool:
+    # the loop thread parked in select() waiting for I/O
+    return stack.rsplit(";", 1)[-1].startswith("select (selectors.py")
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+@router.get("/sample")
+async def sample_stacks(
+    seconds: float = Query(PROFILING_CONFIG["default_seconds"], gt=0, le=PROFILING_CONFIG["max_seconds"]),
+    interval_ms: float = Query(PROFILING_CONFIG["default_interval_ms"], ge=PROFILING_CONFIG["min_interval_ms"]),
+    all_threads: bool = False,
+    include_idle: bool = False,
+    user=Depends(require_admin)
+):
+    """Sample this worker's stacks for `seconds` and return them as collapsed stacks.
+
+    Loop lag over the window is returned in X-Loop-Lag-* headers (ms).
+    Samples of the loop waiting in select() are dropped unless include_idle.
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+    async with _profile_lock:
+        interval = interval_ms / 1000
+        thread_ids = None if all_threads else {threading.get_ident()}
+        sampler = StackSampler(thread_ids, interval, PROFILING_CONFIG["max_depth"])
+        stop = asyncio.Event()
+        lag_task = asyncio.create_task(measure_loop_lag(interval, stop))
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+            stop.set()
+            lags = await lag_task
+
+    lines = [
+        f"{stack} {count}"
+        for stack, count in sampler.samples.most_common()
+        if include_idle or not is_idle(stack)
+    ]
+    headers = {
+        "X-Profile-Samples": str(sampler.sample_count),
+        "X-Loop-Lag-P50": f"{percentile(lags, 0.5) * 1000:.1f}",
+        "X-Loop-Lag-P99": f"{percentile(lags, 0.99) * 1000:.1f}",
+        "X-Loop-Lag-Max": f"{max(lags, default=0.0) * 1000:.1f}",
+    }
+    return Response("\n".join(lines) + "\n", media_type="text/plain", headers=headers)
@@ -0,0 +1,255 @@
+import asyncio
+import logging
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Iterable, Optional
+
+from pymongo.errors import PyMongoError
+
+from .mongo import background_pool, db, goals_collection, pool_status_collection
+from .notification_feed import CHANGE_STREAMS_UNSUPPORTED
+from .responses import dumps_bson
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Live goal progress for group members. One change stream per process watches
+# goals and pool_status; each change is turned into at most a few events,
+# encoded once, and copied into the bounded queue of every subscriber of the
+# goal's group. On a standalone mongod, where change streams are not
+# available, the goals of subscribed groups are polled instead and compared
+# with what the previous poll saw.
+
+PROGRESS_FEED_CONFIG = {
+    "subscriber_queue_size": 100,  # a subscriber this far behind loses its oldest events
+    "retry_seconds": 5.0,  # wait before reopening a failed change stream
+    "group_cache_size": 10000,  # goal_id -> group_id entries for pool_status events
+    "poll_interval": 3.0,  # fallback when change streams are unavailable (standalone mongod)
+}
+
+WATCHED_FIELDS = ("current_amount", "progress_ratio", "status", "last_milestone_reached")
+
+CHANGE_PIPELINE = [
+    {"$match": {
+        "ns.coll": {"$in": [goals_collection.name, pool_status_collection.name]},
+        "operationType": {"$in": ["insert", "update", "replace"]},
+    }},
+    # Keep change events small: only the fields the feed turns into events
+    {"$project": {
+        "ns.coll": 1,
+        "operationType": 1,
+        **{f"updateDescription.updatedFields.{field}": 1 for field in WATCHED_FIELDS},
+        **{f"fullDocument.{field}": 1 for field in WATCHED_FIELDS},
+        "fullDocument.goal_id": 1,
+        "fullDocument.group_id": 1,
+        "fullDocument.goal_amount": 1,
+        "fullDocument.title": 1,
+    }},
+]
+
+def encode_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {dumps_bson(event).decode()}\n\n"
+
+def goal_progress_event(goal: dict, event_type: str = "progress") -> dict:
+    goal_amount = float(goal.get("goal_amount") or 0)
+    current_amount = float(goal.get("current_amount") or 0)
+    return {
+        "type": event_type,
+        "goal_id": goal.get("goal_id"),
+        "group_id": goal.get("group_id"),
+        "title": goal.get("title"),
+        "status": goal.get("status"),
+        "current_amount": current_amount,
+        "goal_amount": goal_amount,
+        "progress_percentage": round(current_amount / goal_amount * 100, 2) if goal_amount > 0 else 0.0,
+        "timestamp": datetime.now().isoformat(),
+    }
+
+class Subscription:
+    """One client's view of the feed: a bounded queue of encoded events."""
+
+    def __init__(self, group_ids: Iterable[str], queue_size: int):
+        self.group_ids = frozenset(group_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, message: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+class ProgressFeed:
+    def __init__(self, autostart: bool = True):
+        self.autostart = autostart  # False lets benchmarks drive handle_change without Mongo
+        self._subscribers = defaultdict(set)  # group_id -> {Subscription}
+        self._goal_groups: OrderedDict = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+        self._polling = False
+        self.mode = "stopped"
+        self.events_published = 0
+        self.deliveries = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len({sub for subs in self._subscribers.values() for sub in subs})
+
+    def subscribe(self, group_ids: Iterable[str]) -> Subscription:
+        subscription = Subscription(group_ids, PROGRESS_FEED_CONFIG["subscriber_queue_size"])
+        for group_id in subscription.group_ids:
+            self._subscribers[group_id].add(subscription)
+        if self.autostart:
+            self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for group_id in subscription.group_ids:
+            subs = self._subscribers.get(group_id)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[group_id]
+
+    def publish(self, event: dict):
+        """Fan an event out to every subscriber of its group; never blocks."""
+        subs = self._subscribers.get(event.get("group_id"))
+        if not subs:
+            return
+        message = encode_event(event)
+        for subscription in subs:
+            subscription.offer(message)
+        self.events_published += 1
+        self.deliveries += len(subs)
+
+    def remember_group(self, goal_id: Optional[str], group_id: Optional[str]):
+        if not goal_id or not group_id:
+            return
+        self._goal_groups[goal_id] = group_id
+        self._goal_groups.move_to_end(goal_id)
+        while len(self._goal_groups) > PROGRESS_FEED_CONFIG["group_cache_size"]:
+            self._goal_groups.popitem(last=False)
+
+    async def group_for_goal(self, goal_id: Optional[str]) -> Optional[str]:
+        if not goal_id:
+            return None
+        if goal_id not in self._goal_groups:
+            goal = await goals_collection.find_one({"goal_id": goal_id}, {"group_id": 1})
+            self.remember_group(goal_id, (goal or {}).get("group_id"))
+        return self._goal_groups.get(goal_id)
+
+    async def handle_change(self, change: dict):
+        """Turn one change stream document into feed events."""
+        doc = change.get("fullDocument") or {}
+        updated = (change.get("updateDescription") or {}).get("updatedFields") or {}
+        whole_doc = change.get("operationType") in ("insert", "replace")
+
+        if change.get("ns", {}).get("coll") == goals_collection.name:
+            self.remember_group(doc.get("goal_id"), doc.get("group_id"))
+            if not self._subscribers.get(doc.get("group_id")):
+                return
+            if whole_doc or "current_amount" in updated or "progress_ratio" in updated:
+                self.publish(goal_progress_event(doc))
+            if whole_doc or "status" in updated:
+                self.publish({
+                    "type": "status",
+                    "goal_id": doc.get("goal_id"),
+                    "group_id": doc.get("group_id"),
+                    "status": doc.get("status"),
+                    "timestamp": datetime.now().isoformat(),
+                })
+            return
+
+        # pool_status: milestones are recorded there by the scheduler
+        if "last_milestone_reached" in updated:
+            group_id = await self.group_for_goal(doc.get("goal_id"))
+            if self._subscribers.get(group_id):
+                self.publish({
+                    "type": "milestone",
+                    "goal_id": doc.get("goal_id"),
+                    "group_id": group_id,
+                    "milestone": updated["last_milestone_reached"],
+                    "timestamp": datetime.now().isoformat(),
+                })
+
+    def start(self):
+        if self._task is None or self._task.done():
+            # The change stream holds a connection for its lifetime; keep it off the request pool
+            with background_pool():
+                self._task = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
+
+    async def _consume(self):
+        logger.info("📡 Goal progress feed consumer started")
+        while True:
+            try:
+                if self._polling:
+                    await self._poll()
+                async with db.watch(
+                    CHANGE_PIPELINE,
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                ) as stream:
+                    self.mode = "change_stream"
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        try:
+                            await self.handle_change(change)
+                        except Exception as e:
+                            logger.error(f"Progress feed failed to handle change: {e}")
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                if getattr(e, "code", None) == CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("📡 Goal progress feed falling back to polling")
+                    self._polling = True
+                    continue
+                # An expired resume token would fail forever; start from now instead
+                self._resume_token = None
+                logger.warning(f"Progress feed error, retrying in {PROGRESS_FEED_CONFIG['retry_seconds']}s: {e}")
+            await asyncio.sleep(PROGRESS_FEED_CONFIG["retry_seconds"])
+
+    async def _poll(self):
+        """Replay what changed on the subscribed groups' goals as change stream documents."""
+        self.mode = "polling"
+        seen = {}  # (collection, goal_id) -> watched fields at the previous poll
+        while True:
+            group_ids = list(self._subscribers)
+            current = {}
+            if group_ids:
+                goals = await goals_collection.find(
+                    {"group_id": {"$in": group_ids}},
+                    {"_id": 0, "goal_id": 1, "group_id": 1, "goal_amount": 1, "title": 1, **{field: 1 for field in WATCHED_FIELDS}},
+                ).to_list(length=None)
+                pools = await pool_status_collection.find(
+                    {"goal_id": {"$in": [goal.get("goal_id") for goal in goals]}},
+                    {"_id": 0, "goal_id": 1, "last_milestone_reached": 1},
+                ).to_list(length=None)
+                for collection, docs in ((goals_collection.name, goals), (pool_status_collection.name, pools)):
+                    for doc in docs:
+                        key = (collection, doc.get("goal_id"))
+                        fields = {field: doc[field] for field in WATCHED_FIELDS if field in doc}
+                        current[key] = fields
+                        if key not in seen:
+                            continue  # first sighting: nothing happened yet as far as subscribers know
+                        updated = {field: value for field, value in fields.items() if seen[key].get(field) != value}
+                        if updated:
+                            await self.handle_change({
+                                "ns": {"coll": collection},
+                                "operationType": "update",
+                                "fullDocument": doc,
+                                "updateDescription": {"updatedFields": updated},
+                            })
+            seen = current
+            await asyncio.sleep(PROGRESS_FEED_CONFIG["poll_interval"])
+
+progress_feed = ProgressFeed()
@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from bson import encode
+from pymongo import monitoring
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Request-scoped Mongo round-trip tracing. QueryTraceMiddleware puts a
+# RequestTrace in a context variable; Motor copies the context onto its
+# executor threads, so QueryTraceListener sees the trace of the request that
+# issued each command. Every response gets a Server-Timing header with the
+# round trips and Mongo time. With flagging on (APP_ENV development/staging;
+# off when unset) commands are also fingerprinted, and requests over the
+# thresholds are logged with their most repeated commands.
+
+QUERY_TRACE_CONFIG = {
+    "flag": os.getenv("APP_ENV", "production") in ("development", "staging"),
+    "max_round_trips": int(os.getenv("QUERY_TRACE_MAX_ROUND_TRIPS", 25)),
+    "max_repeats": int(os.getenv("QUERY_TRACE_MAX_REPEATS", 3)),  # identical commands per request
+    "report_top": 3,
+}
+
+# Per-command fields that differ between otherwise identical commands
+VOLATILE_FIELDS = ("lsid", "$clusterTime", "$db", "txnNumber", "$readPreference", "cursor", "apiVersion")
+
+class RequestTrace:
+    def __init__(self):
+        self.round_trips = 0
+        self.db_seconds = 0.0
+        self.repeats = Counter()
+        self._lock = threading.Lock()
+
+    def record_command(self, signature):
+        with self._lock:
+            self.repeats[signature] += 1
+
+    def record_reply(self, seconds: float):
+        with self._lock:
+            self.round_trips += 1
+            self.db_seconds += seconds
+
+    def repeated(self) -> list:
+        return [(signature, count) for signature, count in self.repeats.most_common() if count > 1]
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+def command_signature(command_name: str, command) -> tuple:
+    # getMore is paging through one cursor, not a repeated query
+    if command_name == "getMore":
+        return (command_name, command.get("getMore"))
+    stable = {k: v for k, v in command.items() if k not in VOLATILE_FIELDS}
+    return (command_name, command.get(command_name), hash(encode(stable)))
+
+class QueryTraceListener(monitoring.CommandListener):
+    def started(self, event):
+        trace = current_trace.get()
+        if trace is not None and QUERY_TRACE_CONFIG["flag"]:
+            trace.record_command(command_signature(event.command_name, event.command))
+
+    def succeeded(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.record_reply(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            trace.record_reply(event.duration_micros / 1e6)
+
+def server_timing(trace: RequestTrace) -> bytes:
+    value = f'db;dur={trace.db_seconds * 1000:.1f};desc="{trace.round_trips} round trips"'
+    if QUERY_TRACE_CONFIG["flag"]:
+        repeated = sum(count - 1 for _, count in trace.repeated())
+        value += f', dbrepeat;desc="{repeated} repeated"'
+    return value.encode()
+
+def report(scope: dict, trace: RequestTrace, elapsed: float):
+    route = getattr(scope.get("route"), "path", scope.get("path"))
+    repeated = trace.repeated()
+    logger.debug(
+        f"{scope['method']} {route}: {trace.round_trips} round trips, "
+        f"{trace.db_seconds * 1000:.1f}ms in Mongo of {elapsed * 1000:.1f}ms"
+    )
+    config = QUERY_TRACE_CONFIG
+    if not config["flag"]:
+        return
+    worst = repeated[0][1] if repeated else 0
+    if trace.round_trips > config["max_round_trips"] or worst > config["max_repeats"]:
+        top = ", ".join(f"{sig[0]} {sig[1]} x{count}" for sig, count in repeated[:config["report_top"]])
+        logger.warning(
+            f"🐢 Possible N+1 in {scope['method']} {route}: {trace.round_trips} round trips "
+            f"({trace.db_seconds * 1000:.1f}ms){'; repeated: ' + top if top else ''}"
+        )
+
+class QueryTraceMiddleware:
+    """Pure ASGI middleware attaching a RequestTrace to every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", server_timing(trace))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            report(scope, trace, time.perf_counter() - start)
@@ -0,0 +1,98 @@
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+from bson import Timestamp
+from pymongo import monitoring
+from pymongo.read_preferences import SecondaryPreferred
+
+# Read routing. By default every read goes to the primary (money paths such
+# as contributions and balances rely on that). Code running inside
+# mongo.analytics_reads() reads from secondaries, tolerating up to
+# max_staleness_seconds of replication lag.
+#
+# Read-your-own-writes across requests: a response that wrote carries an
+# X-Read-After token (the operationTime of its last write). A client that
+# sends it back on its next request gets its analytics reads in a causally
+# consistent session, so the secondary waits until it has applied that
+# write before answering.
+
+READ_ROUTING_CONFIG = {
+    "analytics": os.getenv("MONGO_ANALYTICS_READS", "secondaryPreferred"),  # "primary" turns routing off
+    "max_staleness_seconds": int(os.getenv("MONGO_ANALYTICS_MAX_STALENESS", 90)),  # pymongo's minimum is 90
+}
+
+ANALYTICS_READ_PREFERENCE = (
+    None if READ_ROUTING_CONFIG["analytics"] == "primary"
+    else SecondaryPreferred(max_staleness=READ_ROUTING_CONFIG["max_staleness_seconds"])
+)
+
+READ_AFTER_HEADER = "X-Read-After"
+WRITE_COMMANDS = frozenset(("insert", "update", "delete", "findAndModify"))
+
+current_read_route: ContextVar[str] = ContextVar("read_route", default="primary")
+read_after: ContextVar[Optional[Timestamp]] = ContextVar("read_after", default=None)
+
+class RequestWrites:
+    def __init__(self):
+        self.last_operation_time: Optional[Timestamp] = None
+
+request_writes: ContextVar[Optional[RequestWrites]] = ContextVar("request_writes", default=None)
+
+def encode_token(operation_time: Timestamp) -> str:
+    return f"{operation_time.time}.{operation_time.inc}"
+
+def decode_token(value: Optional[str]) -> Optional[Timestamp]:
+    try:
+        seconds, increment = (value or "").split(".")
+        return Timestamp(int(seconds), int(increment))
+    except ValueError:
+        return None
+
+class WriteTimeListener(monitoring.CommandListener):
+    """Remembers the operationTime of the request's last write (replica sets report one)."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        if event.command_name not in WRITE_COMMANDS:
+            return
+        writes = request_writes.get()
+        operation_time = event.reply.get("operationTime")
+        if writes is None or operation_time is None:
+            return
+        if writes.last_operation_time is None or operation_time > writes.last_operation_time:
+            writes.last_operation_time = operation_time
+
+    def failed(self, event):
+        pass
+
+class ReadAfterMiddleware:
+    """Pure ASGI middleware: reads the client's X-Read-After token and hands out a new one after writes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = READ_AFTER_HEADER.lower().encode()
+        token = next((value.decode() for name, value in scope["headers"] if name == header), None)
+        writes = RequestWrites()
+        after_token = read_after.set(decode_token(token))
+        writes_token = request_writes.set(writes)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and writes.last_operation_time is not None:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (header, encode_token(writes.last_operation_time).encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            read_after.reset(after_token)
+            request_writes.reset(writes_token)
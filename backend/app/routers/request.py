@@ -4,7 +4,10 @@ from fastapi import APIRouter, HTTPException, Depends, Body
 from pydantic import BaseModel
 from datetime import datetime
 from .mongo import db, users_collection, goals_collection
+from .goal_calendar import to_target_datetime
 from .verify_token import verify_token
+from .responses import BSONJSONResponse
+from .group_stats import record_goal_created
 from bson import ObjectId
 
 # --- router initialization ---
@@ -47,7 +50,8 @@ async def approve_member_request(request_id: str, user=Depends(verify_token)):
         "current_amount": 0.0,
         "creator_role": user_role,
         "creator_name": creator_name,
-        "target_date": target_date,
+        "target_date": to_target_datetime(target_date) or target_date,
+        "progress_ratio": 0.0,
         "is_paid": False,
         "status": "active",
         "created_at": data.get("created_at"),
@@ -55,6 +59,7 @@ async def approve_member_request(request_id: str, user=Depends(verify_token)):
         "auto_payment_settings": metadata.get("auto_payment_settings", None)
     }
     await goals_collection.insert_one(goal_doc)
+    await record_goal_created(goal_doc.get("group_id"))
     await requests_collection.delete_one({"_id": ObjectId(request_id)})
     return {"message": "Request approved and added to goals."}
 
@@ -111,7 +116,8 @@ async def create_member_request(request: MemberRequest, user=Depends(verify_toke
             "current_amount": 0.0,
             "creator_role": user_role,
             "creator_name": creator_name,
-            "target_date": target_date,
+            "target_date": to_target_datetime(target_date) or target_date,
+            "progress_ratio": 0.0,
             "is_paid": False,
             "status": "active",
             "created_at": data.get("created_at"),
@@ -119,13 +125,14 @@ async def create_member_request(request: MemberRequest, user=Depends(verify_toke
             "auto_payment_settings": metadata.get("auto_payment_settings", None)
         }
         result = await goals_collection.insert_one(goal_doc)
+        await record_goal_created(goal_doc.get("group_id"))
         return {"message": "Manager request submitted as goal", "goal_id": str(result.inserted_id)}
     else:
         result = await requests_collection.insert_one(data)
         return {"message": "Request submitted", "request_id": str(result.inserted_id)}
 
 # Manager: View all member requests
-@router.get("/", response_model=list)
+@router.get("/", response_class=BSONJSONResponse)
 async def list_member_requests(user=Depends(verify_token)):
     user_id = user.get("uid")
     user_doc = await users_collection.find_one({"firebase_uid": user_id})
@@ -134,9 +141,5 @@ async def list_member_requests(user=Depends(verify_token)):
         raise HTTPException(status_code=403, detail="Only managers can view all member requests.")
     user_group_id = user_doc.get("role", {}).get("group_id", "abcd") if user_doc else "abcd"
     requests = await requests_collection.find({"metadata.group_id": user_group_id}).to_list(length=None)
-    # Convert ObjectId to string for each request
-    for req in requests:
-        if "_id" in req:
-            req["_id"] = str(req["_id"])
-    return requests
+    return BSONJSONResponse(requests)
 
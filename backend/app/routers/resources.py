@@ -0,0 +1,96 @@
+import asyncio
+import importlib
+import inspect
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from dotenv import find_dotenv, load_dotenv
+
+from .metrics import STARTUP_SECONDS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Process-wide clients (Mongo, Firebase, OpenAI) are registered here by the
+# module that owns them and built on first use instead of at import time, so
+# importing the app needs no credentials and no network. The lifespan warms
+# them up concurrently (or in the background with LAZY_STARTUP=1) and closes
+# them on shutdown. Benchmarks and scripts can swap any of them for a local
+# fake with resources.override(). The .env file is loaded here, once.
+
+# Nearest .env above this package (app/.env, else backend/.env)
+load_dotenv(find_dotenv())
+
+RESOURCE_CONFIG = {
+    # Serve immediately and warm up in the background; the first requests
+    # build whatever is not ready yet themselves
+    "lazy_startup": os.getenv("LAZY_STARTUP", "0") == "1",
+}
+
+class Resources:
+    def __init__(self):
+        self._factories: Dict[str, Callable] = {}
+        self._closers: Dict[str, Optional[Callable]] = {}
+        self._instances: Dict[str, object] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.version = 0  # bumped by override() so cached handles re-resolve
+        self.timings: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable, close: Optional[Callable] = None):
+        self._factories[name] = factory
+        self._closers[name] = close
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str):
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._locks[name]:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name]()
+                self.timings[name] = time.perf_counter() - start
+                STARTUP_SECONDS.set(self.timings[name], phase=f"init:{name}")
+                logger.info(f"🔌 {name} initialised in {self.timings[name] * 1000:.0f}ms")
+        return self._instances[name]
+
+    def is_ready(self, name: str) -> bool:
+        return name in self._instances
+
+    def override(self, name: str, instance):
+        """Use `instance` for `name` from now on (local fakes for benchmarks and scripts)."""
+        self._instances[name] = instance
+        self.version += 1
+
+    async def warm_up(self, *names: str):
+        """Build the given resources concurrently, off the event loop."""
+        await asyncio.gather(*(asyncio.to_thread(self.get, name) for name in names))
+
+    async def aclose(self):
+        for name, instance in list(self._instances.items()):
+            close = self._closers.get(name)
+            if close is None or instance is None:
+                continue
+            try:
+                result = close(instance)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Closing {name} failed: {e}")
+        self._instances.clear()
+        self.version += 1
+
+resources = Resources()
+
+def timed_import(module_name: str):
+    """Import a module and record how long it took (including first imports of its dependencies)."""
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+    resources.timings[f"import:{module_name}"] = elapsed
+    STARTUP_SECONDS.set(elapsed, phase=f"import:{module_name}")
+    return module
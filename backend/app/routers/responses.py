@@ -0,0 +1,93 @@
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, List, Type
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+try:
+    import orjson
+except ImportError:  # plain json keeps working, just slower
+    orjson = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# JSON for raw Mongo documents. ObjectId, Decimal128 and pydantic models go
+# through bson_default; orjson handles datetime/date natively. Handlers that
+# return BSONJSONResponse(...) directly also skip FastAPI's jsonable_encoder
+# walk, which is where most of the time on large list responses went.
+
+def bson_default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, Decimal128):
+        return float(obj.to_decimal())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, (datetime, date)):  # json fallback only; orjson never gets here
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bson(content: Any) -> bytes:
+        return orjson.dumps(content, default=bson_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps_bson(content: Any) -> bytes:
+        return json.dumps(content, default=bson_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class BSONJSONResponse(JSONResponse):
+    """JSONResponse that serialises Mongo documents as they come out of Motor."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bson(content)
+
+# List endpoints: validate every row in one TypeAdapter call (the loop runs in
+# pydantic-core) and serialise with the same adapter. Returning a Response
+# means FastAPI does not validate the list a second time against
+# response_model, which is still declared for the OpenAPI schema.
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+def validate_rows(model: Type[BaseModel], rows: list, skip_invalid: bool = False) -> list:
+    """Validate DB rows as model instances; with skip_invalid bad rows are dropped instead of raising."""
+    adapter = list_adapter(model)
+    try:
+        return adapter.validate_python(rows)
+    except ValidationError as e:
+        if not skip_invalid:
+            raise
+        bad = {err["loc"][0] for err in e.errors() if err["loc"]}
+        logger.warning(f"Skipping {len(bad)} invalid {model.__name__} rows")
+        return adapter.validate_python([row for i, row in enumerate(rows) if i not in bad])
+
+def model_list_response(model: Type[BaseModel], rows: list, trusted: bool = False, skip_invalid: bool = False) -> Response:
+    """JSON response for a list of model rows.
+
+    trusted=True is for documents this app wrote from an already validated
+    model: rows are wrapped with model_construct and not checked again.
+    """
+    adapter = list_adapter(model)
+    if trusted:
+        items = [model.model_construct(**row) for row in rows]
+        # nested models stay plain dicts under model_construct
+        return Response(adapter.dump_json(items, warnings=False), media_type="application/json")
+    items = validate_rows(model, rows, skip_invalid)
+    return Response(adapter.dump_json(items), media_type="application/json")
+
+def model_projection(model: Type[BaseModel], **computed) -> dict:
+    """find() projection for exactly the model's fields, plus computed expressions."""
+    return {"_id": 0, **{name: 1 for name in model.model_fields}, **computed}
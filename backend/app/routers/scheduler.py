@@ -1,12 +1,19 @@
 import asyncio
-from datetime import datetime, date, timedelta
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta, timezone
+from typing import Optional
 import logging
 from .ai_tools_clean import smart_reminder, SmartReminderRequest
 from fastapi import BackgroundTasks
 import json
 
-from .ai_client import get_ai_client
-from .mongo import goals_collection, pool_status_collection, pending_goals_collection, groups_collection
+from .ai_client import get_ai_client, get_rate_limit_events
+from .goal_calendar import MILESTONES, deadline_risk_clauses, risk_window_end
+from .group_stats import reconcile_group_stats
+from .metrics import record_scheduler_cycle
+from .mongo import background_pool, uses_analytics_reads, goals_collection, pool_status_collection, pending_goals_collection, groups_collection, monitoring_events_collection
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,10 +22,33 @@ SCHEDULER_CONFIG = {
     "monitoring_interval": 1800,  # 30 mins
     "api_timeout": 30.0,
     "max_retries": 3,
-    "api_base_url": "http://localhost:8000"
+    "api_base_url": "http://localhost:8000",
+    # Worker pool: in-flight goal analyses adapt between min and max
+    "min_concurrency": 2,
+    "initial_concurrency": 8,
+    "max_concurrency": 64,
+    "target_db_latency": 0.25,  # seconds of Mongo time per goal before backing off
+    "backoff_cooldown": 1.0,  # at most one halving per second
+    "queue_size": 256,
+    "cursor_batch_size": 500,
+    "milestone_history_limit": 20,  # newest entries kept in pool_status.milestone_history
+    # Cycles in between only visit goals inside a deadline risk window; every
+    # Nth cycle (and the first) sweeps all goals for milestones and inactivity
+    "full_sweep_every": 6,
+    "group_stats_reconcile_interval": 3600,  # seconds between group stats reconciler runs
 }
 
+MONITORED_STATUSES = ["active", "awaiting_payment"]
+
+# Stages that only talk to Mongo; their time per goal drives the concurrency limit
+DB_STAGES = ("pool_read", "ai_monitoring", "milestones")
+
+# Last finished cycle and a live view of the running one (see get_scheduler_status)
+monitoring_stats = {"last_cycle": None, "current_cycle": None, "cycles": 0}
+
 def parse_date(dt):
+    if isinstance(dt, datetime):
+        return dt.date()
     if isinstance(dt, date):
         return dt
     if isinstance(dt, str):
@@ -28,6 +58,170 @@ def parse_date(dt):
             pass
     return None
 
+@contextmanager
+def timed_stage(timings: Optional[dict], name: str):
+    """Add the wall time of the block to timings[name] (no-op without timings)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight goal analyses.
+
+    A goal whose Mongo stages stay under target_db_latency grows the limit by
+    1/limit (about +1 per full window). A slower goal or a new LLM rate limit
+    halves it, at most once per backoff_cooldown so one burst of slow goals
+    does not collapse the pool to the minimum.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int, target_latency: float, cooldown: float):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.cooldown = cooldown
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.peak = int(self.limit)
+        self.backoffs = 0
+        self.throttled = 0
+        self._last_backoff = float("-inf")
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, db_latency: float, throttled: bool = False):
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+            if throttled or db_latency > self.target_latency:
+                now = time.monotonic()
+                if now - self._last_backoff >= self.cooldown:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self._last_backoff = now
+                    self.backoffs += 1
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self.peak = max(self.peak, int(self.limit))
+            self._cond.notify_all()
+
+def monitoring_query(now: datetime, full_sweep: bool) -> dict:
+    query = {"status": {"$in": MONITORED_STATUSES}, "goal_id": {"$exists": True}}
+    if not full_sweep:
+        query["$or"] = deadline_risk_clauses(now.date())
+    return query
+
+async def run_monitoring_cycle(ai_client, now: Optional[datetime] = None, full_sweep: Optional[bool] = None) -> dict:
+    """Run one monitoring pass and return its stats.
+
+    Goals are streamed from Mongo into a bounded queue and analysed by a
+    worker pool whose effective size is governed by AdaptiveConcurrency.
+    Unless full_sweep is given, every full_sweep_every-th cycle visits all
+    monitored goals and the rest only the deadline risk window.
+    """
+    now = now or datetime.now()
+    config = SCHEDULER_CONFIG
+    if full_sweep is None:
+        full_sweep = monitoring_stats["cycles"] % max(1, config["full_sweep_every"]) == 0
+    monitoring_stats["cycles"] += 1
+    limiter = AdaptiveConcurrency(
+        config["initial_concurrency"],
+        config["min_concurrency"],
+        config["max_concurrency"],
+        config["target_db_latency"],
+        config["backoff_cooldown"],
+    )
+    queue: asyncio.Queue = asyncio.Queue(maxsize=config["queue_size"])
+    stage_seconds = defaultdict(float)
+    cycle = {
+        "started_at": now.isoformat(),
+        "mode": "full_sweep" if full_sweep else "risk_window",
+        "goals_queued": 0,
+        "goals_processed": 0,
+        "backlog": 0,
+        "peak_backlog": 0,
+    }
+    monitoring_stats["current_cycle"] = cycle
+    cycle_start = time.perf_counter()
+
+    async def worker():
+        while True:
+            goal = await queue.get()
+            try:
+                if goal is None:
+                    return
+                await limiter.acquire()
+                timings = {}
+                rate_limits_before = get_rate_limit_events()
+                try:
+                    await analyze_single_goal_production(goal.get("goal_id"), goal, ai_client, now, timings)
+                finally:
+                    db_latency = sum(timings.get(stage, 0.0) for stage in DB_STAGES)
+                    await limiter.release(db_latency, throttled=get_rate_limit_events() > rate_limits_before)
+                    for stage, seconds in timings.items():
+                        stage_seconds[stage] += seconds
+                    cycle["goals_processed"] += 1
+                    cycle["backlog"] = cycle["goals_queued"] - cycle["goals_processed"]
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(config["max_concurrency"])]
+    try:
+        cursor = goals_collection.find(monitoring_query(now, full_sweep)).batch_size(config["cursor_batch_size"])
+        while True:
+            with timed_stage(stage_seconds, "fetch"):
+                batch = await cursor.to_list(length=config["cursor_batch_size"])
+            if not batch:
+                break
+            for goal in batch:
+                if not goal.get("goal_id"):
+                    continue
+                await queue.put(goal)
+                cycle["goals_queued"] += 1
+                cycle["backlog"] = cycle["goals_queued"] - cycle["goals_processed"]
+                cycle["peak_backlog"] = max(cycle["peak_backlog"], cycle["backlog"])
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        monitoring_stats["current_cycle"] = None
+
+    analysis_seconds = time.perf_counter() - cycle_start
+    with timed_stage(stage_seconds, "system_optimization"):
+        await perform_system_optimization(ai_client)
+    with timed_stage(stage_seconds, "report"):
+        await generate_monitoring_report()
+
+    duration = time.perf_counter() - cycle_start
+    stats = {
+        "started_at": cycle["started_at"],
+        "mode": cycle["mode"],
+        "finished_at": datetime.now().isoformat(),
+        "duration_seconds": round(duration, 3),
+        "goals_processed": cycle["goals_processed"],
+        "goals_per_second": round(cycle["goals_processed"] / analysis_seconds, 2) if analysis_seconds > 0 else 0.0,
+        "backlog": cycle["backlog"],
+        "peak_backlog": cycle["peak_backlog"],
+        "concurrency": {
+            "final": int(limiter.limit),
+            "peak": limiter.peak,
+            "backoffs": limiter.backoffs,
+            "rate_limited_goals": limiter.throttled,
+        },
+        "stage_seconds": {stage: round(seconds, 3) for stage, seconds in stage_seconds.items()},
+    }
+    monitoring_stats["last_cycle"] = stats
+    record_scheduler_cycle("monitoring", duration, cycle["mode"], stage_seconds, cycle["goals_processed"])
+    return stats
+
 async def monitor_goals():
     ai_client = get_ai_client()
     logger.info("🤖 Production AI Goal Monitoring System Started")
@@ -38,30 +232,12 @@ async def monitor_goals():
         try:
             now = datetime.now()
             logger.info(f"🔍 Running production goal monitoring at {now.strftime('%Y-%m-%d %H:%M:%S')}")
-            active_goals_cursor = goals_collection.find({
-                "status": {"$in": ["active", "awaiting_payment"]},
-                "goal_id": {"$exists": True}
-            })
-            active_goals = await active_goals_cursor.to_list(length=None)
-            logger.info(f"Monitoring {len(active_goals)} active goals")
-
-            batch_size = 5
-            for i in range(0, len(active_goals), batch_size):
-                batch = active_goals[i:i + batch_size]
-                tasks = [
-                    analyze_single_goal_production(
-                        goal.get("goal_id"),
-                        goal,
-                        ai_client,
-                        now
-                    )
-                    for goal in batch if goal.get("goal_id")
-                ]
-                await asyncio.gather(*tasks, return_exceptions=True)
-                await asyncio.sleep(1)
-
-            await perform_system_optimization(ai_client)
-            await generate_monitoring_report()
+            stats = await run_monitoring_cycle(ai_client, now)
+            logger.info(
+                f"📊 Monitored {stats['goals_processed']} goals ({stats['mode']}) in {stats['duration_seconds']}s "
+                f"({stats['goals_per_second']} goals/s, peak backlog {stats['peak_backlog']}, "
+                f"concurrency {stats['concurrency']['final']}/{stats['concurrency']['peak']} final/peak)"
+            )
             logger.info(f"✅ Monitoring cycle completed. Next check in {SCHEDULER_CONFIG['monitoring_interval']}s")
             retry_count = 0
 
@@ -75,7 +251,17 @@ async def monitor_goals():
 
         await asyncio.sleep(SCHEDULER_CONFIG["monitoring_interval"])
 
-async def analyze_single_goal_production(goal_id: str, goal: dict, ai_client, now: datetime):
+async def reconcile_group_stats_periodically():
+    while True:
+        await asyncio.sleep(SCHEDULER_CONFIG["group_stats_reconcile_interval"])
+        try:
+            start = time.perf_counter()
+            await reconcile_group_stats()
+            record_scheduler_cycle("group_stats_reconcile", time.perf_counter() - start)
+        except Exception as e:
+            logger.error(f"Group stats reconciliation failed: {str(e)}")
+
+async def analyze_single_goal_production(goal_id: str, goal: dict, ai_client, now: datetime, timings: Optional[dict] = None):
     target_date = parse_date(goal.get("target_date"))
     if not target_date:
         logger.warning(f"Missing or invalid target_date for goal {goal_id}")
@@ -83,15 +269,19 @@ async def analyze_single_goal_production(goal_id: str, goal: dict, ai_client, no
     days_remaining = (target_date - now.date()).days
 
     try:
-        status = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
+        with timed_stage(timings, "pool_read"):
+            status = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
         current_amount = float(status.get("current_amount", 0) or 0)
         goal_amount = float(goal.get("goal_amount", 0) or 0)
         progress_percentage = (current_amount / goal_amount) * 100 if goal_amount > 0 else 0
         logger.info(f"📊 Goal Analysis: {goal.get('title','')[:30]}... | Progress: {progress_percentage:.1f}% | Days: {days_remaining}")
-        risk_factors = await assess_goal_risk(goal_id, goal, status, days_remaining, progress_percentage)
+        with timed_stage(timings, "risk"):
+            risk_factors = await assess_goal_risk(goal_id, goal, status, days_remaining, progress_percentage)
         if risk_factors.get("risk_level", "LOW") != "LOW":
-            await trigger_ai_monitoring_call(goal_id, risk_factors, ai_client)
-        await handle_milestone_events(goal_id, progress_percentage, ai_client)
+            with timed_stage(timings, "ai_monitoring"):
+                await trigger_ai_monitoring_call(goal_id, risk_factors, ai_client)
+        with timed_stage(timings, "milestones"):
+            await handle_milestone_events(goal_id, progress_percentage, ai_client, status, goal)
 
         # --- Agentic Deadline Reminder Logic (using assess_goal_risk) ---
         if "deadline_week_insufficient_progress" in risk_factors.get("factors", []):
@@ -105,7 +295,8 @@ async def analyze_single_goal_production(goal_id: str, goal: dict, ai_client, no
                     auto_send=True
                 )
                 try:
-                    await smart_reminder(reminder_request, BackgroundTasks())
+                    with timed_stage(timings, "reminder"):
+                        await smart_reminder(reminder_request, BackgroundTasks())
                     logger.info(f"Agentic deadline reminder sent for goal {goal_id}")
                     await pool_status_collection.update_one(
                         {"goal_id": goal_id},
@@ -154,31 +345,29 @@ async def trigger_ai_monitoring_call(goal_id: str, risk_factors: dict, ai_client
     try:
         # Direct function call or log only (no httpx)
         logger.info(f"🤖 AI monitoring completed for goal {goal_id} - Risk: {risk_factors.get('risk_level', 'UNKNOWN')} (direct call placeholder)")
-        monitoring_entry = {
-            "timestamp": datetime.now().isoformat(),
+        await monitoring_events_collection.insert_one({
+            "goal_id": goal_id,
+            "timestamp": datetime.now(timezone.utc),
+            "risk_level": risk_factors.get("risk_level", "UNKNOWN"),
             "risk_assessment": risk_factors,
             "ai_monitoring_result": {},
             "triggered_by": "production_scheduler"
-        }
-        await pool_status_collection.update_one(
-            {"goal_id": goal_id},
-            {
-                "$push": {"scheduler_monitoring": monitoring_entry},
-                "$setOnInsert": {"goal_id": goal_id}
-            },
-            upsert=True
-        )
+        })
     except Exception as e:
         logger.error(f"AI monitoring call failed for goal {goal_id}: {str(e)}")
 
-async def handle_milestone_events(goal_id: str, progress_percentage: float, ai_client):
-    milestones = [25, 50, 75, 90, 100]
+async def handle_milestone_events(goal_id: str, progress_percentage: float, ai_client, status: Optional[dict] = None, goal: Optional[dict] = None):
     current_milestone = None
-    for milestone in milestones:
+    for milestone in MILESTONES:
         if progress_percentage >= milestone:
             current_milestone = milestone
-    status = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
+    if status is None:
+        status = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
     last_milestone = status.get("last_milestone_reached", 0)
+    recorded = max(last_milestone, current_milestone or 0)
+    if goal is not None and recorded and goal.get("last_milestone_reached") != recorded:
+        # The goal's copy keeps it out of the risk-window milestone clauses once handled
+        await goals_collection.update_one({"goal_id": goal_id}, {"$set": {"last_milestone_reached": recorded}})
     if current_milestone and current_milestone > last_milestone:
         logger.info(f"🎯 Milestone achieved for goal {goal_id}: {current_milestone}%")
         milestone_entry = {
@@ -190,7 +379,10 @@ async def handle_milestone_events(goal_id: str, progress_percentage: float, ai_c
             {"goal_id": goal_id},
             {
                 "$set": {"last_milestone_reached": current_milestone},
-                "$push": {"milestone_history": milestone_entry},
+                "$push": {"milestone_history": {
+                    "$each": [milestone_entry],
+                    "$slice": -SCHEDULER_CONFIG["milestone_history_limit"]
+                }},
                 "$setOnInsert": {"goal_id": goal_id}
             },
             upsert=True
@@ -225,56 +417,50 @@ async def trigger_completion_workflow(goal_id: str, ai_client):
     except Exception as e:
         logger.error(f"Completion workflow trigger failed for goal {goal_id}: {str(e)}")
 
+async def count_goals_by_status() -> dict:
+    counts = {}
+    async for row in goals_collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return counts
+
 async def perform_system_optimization(ai_client):
     try:
-        total_goals_cursor = goals_collection.find({})
-        total_goals = await total_goals_cursor.to_list(length=None)
-        active_goals = [g for g in total_goals if g.get("status") == "active"]
-        completed_goals = [g for g in total_goals if g.get("status") == "completed"]
-        at_risk_goals = 0
-        for goal in active_goals:
-            goal_id = goal.get("goal_id")
-            if not goal_id:
-                continue
-            status = await pool_status_collection.find_one({"goal_id": goal_id}) or {}
-            current_amount = float(status.get("current_amount", 0) or 0)
-            goal_amount = float(goal.get("goal_amount", 0) or 0)
-            target_date = parse_date(goal.get("target_date"))
-            if target_date and goal_amount > 0:
-                progress = (current_amount / goal_amount) * 100
-                days_remaining = (target_date - datetime.now().date()).days
-                if days_remaining <= 7 and progress < 50:
-                    at_risk_goals += 1
-        total_goals_count = len(total_goals)
-        active_goals_count = len(active_goals)
-        completed_goals_count = len(completed_goals)
+        counts = await count_goals_by_status()
+        # Same rule as assess_goal_risk's week band: due within 7 days and under 50%
+        at_risk_goals = await goals_collection.count_documents({
+            "status": "active",
+            "target_date": {"$type": "date", "$lte": risk_window_end()},
+            "progress_ratio": {"$lt": 0.5},
+            "goal_amount": {"$gt": 0}
+        })
+        total_goals_count = sum(counts.values())
+        active_goals_count = counts.get("active", 0)
+        completed_goals_count = counts.get("completed", 0)
         logger.info(f"📈 System Stats - Total: {total_goals_count}, Active: {active_goals_count}, Completed: {completed_goals_count}, At Risk: {at_risk_goals}")
         if active_goals_count > 0 and at_risk_goals > (active_goals_count * 0.3):
             logger.warning(f"🚨 System alert: {at_risk_goals} goals at risk (>{30}% of active goals)")
     except Exception as e:
         logger.error(f"System optimization failed: {str(e)}")
 
+@uses_analytics_reads
 async def generate_monitoring_report():
     try:
-        total_goals_cursor = goals_collection.find({})
-        total_goals = await total_goals_cursor.to_list(length=None)
+        since = datetime.now(timezone.utc) - timedelta(seconds=SCHEDULER_CONFIG["monitoring_interval"])
+        by_risk_level = {}
+        async for row in monitoring_events_collection.aggregate([
+            {"$match": {"timestamp": {"$gte": since}}},
+            {"$group": {"_id": "$risk_level", "count": {"$sum": 1}}}
+        ]):
+            by_risk_level[row["_id"]] = row["count"]
+        recent_events = sum(by_risk_level.values())
         report = {
             "timestamp": datetime.now().isoformat(),
-            "total_goals_monitored": len(total_goals),
-            "ai_interventions_triggered": 0,
-            "risk_assessments_performed": 0,
+            "total_goals_monitored": await goals_collection.count_documents({}),
+            "ai_interventions_triggered": recent_events,
+            "risk_assessments_performed": recent_events,
+            "risk_levels": by_risk_level,
             "system_health": "HEALTHY"
         }
-        pool_status_cursor = pool_status_collection.find({})
-        pool_status_docs = await pool_status_cursor.to_list(length=None)
-        for status_doc in pool_status_docs:
-            monitoring_entries = status_doc.get("scheduler_monitoring", [])
-            recent_entries = [
-                entry for entry in monitoring_entries
-                if (datetime.now() - datetime.fromisoformat(entry.get("timestamp", datetime.now().isoformat()))).seconds < SCHEDULER_CONFIG["monitoring_interval"]
-            ]
-            report["ai_interventions_triggered"] += len(recent_entries)
-            report["risk_assessments_performed"] += len(recent_entries)
         logger.info(f"📋 Monitoring Report: {report['ai_interventions_triggered']} AI interventions, {report['risk_assessments_performed']} risk assessments")
     except Exception as e:
         logger.error(f"Monitoring report generation failed: {str(e)}")
@@ -286,7 +472,10 @@ def start_scheduler():
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
     print("🚀 Starting AI Goal Monitoring Scheduler...")
-    loop.create_task(monitor_goals())
+    # Tasks copy the context, so all their Mongo work goes to the background pool
+    with background_pool():
+        loop.create_task(monitor_goals())
+        loop.create_task(reconcile_group_stats_periodically())
     print("✅ Scheduler task created successfully!")
 
 async def trigger_manual_goal_analysis(goal_id: str):
@@ -298,20 +487,19 @@ async def trigger_manual_goal_analysis(goal_id: str):
     else:
         return f"Goal {goal_id} not found"
 
+@uses_analytics_reads
 async def get_scheduler_status():
     """Get current scheduler status and statistics"""
     try:
-        total_goals_cursor = goals_collection.find({})
-        total_goals = await total_goals_cursor.to_list(length=None)
-        
-        active_goals = [g for g in total_goals if g.get("status") == "active"]
-        awaiting_payment_goals = [g for g in total_goals if g.get("status") == "awaiting_payment"]
-        
+        counts = await count_goals_by_status()
+
         return {
             "status": "running",
-            "total_goals": len(total_goals),
-            "active_goals": len(active_goals),
-            "goals_awaiting_payment": len(awaiting_payment_goals),
+            "total_goals": sum(counts.values()),
+            "active_goals": counts.get("active", 0),
+            "goals_awaiting_payment": counts.get("awaiting_payment", 0),
+            "last_cycle": monitoring_stats["last_cycle"],
+            "current_cycle": monitoring_stats["current_cycle"],
             "last_check": datetime.now().isoformat()
         }
     except Exception as e:
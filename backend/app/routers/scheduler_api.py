@@ -8,9 +8,9 @@ class ManualAnalysisRequest(BaseModel):
     goal_id: str
 
 @router.get("/status")
-def scheduler_status():
+async def scheduler_status():
     """Get current scheduler status and statistics"""
-    return get_scheduler_status()
+    return await get_scheduler_status()
 
 @router.post("/analyze-goal")
 async def manual_goal_analysis(request: ManualAnalysisRequest):
@@ -2,14 +2,20 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Union
 from datetime import datetime, timedelta
+import hashlib
 import logging
 from uuid import uuid4
 
+import orjson
+from pymongo import ReturnDocument
+
 # Import AI client and data sources
 from .ai_client import get_ai_client
 # from .goal import goals, pool_status
 # from .groups import group_db
-from .mongo import simulation_results_collection, goals_collection, pool_status_collection, groups_collection
+from .mongo import uses_analytics_reads, simulation_results_collection, goals_collection, pool_status_collection, group_members_collection
+from .responses import BSONJSONResponse
+from .metrics import observe_llm_call
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -65,13 +71,16 @@ async def get_goal_baseline(goal_id: str) -> Optional[Dict]:
     contributors = pool_data.get("contributors", [])
     group_id = goal.get("group_id")
     if group_id:
-        group = await groups_collection.find_one({"group_id": group_id})
-        if group and "members" in group:
+        # Stable order, so the same members always give the same simulation_key
+        members = await group_members_collection.find(
+            {"group_id": group_id}, {"_id": 0, "name": 1, "member_name": 1, "amount": 1}
+        ).sort("firebase_uid", 1).to_list(length=None)
+        if members:
             # If group members exist, use them as contributors
             # Each member: { name, amount, ... }
             contributors = [
                 {"name": m.get("name", m.get("member_name", "Unknown")), "amount": m.get("amount", 0)}
-                for m in group["members"]
+                for m in members
             ]
 
     target_date = goal.get("target_date")
@@ -80,6 +89,8 @@ async def get_goal_baseline(goal_id: str) -> Optional[Dict]:
             target_date = datetime.fromisoformat(target_date).date()
         except:
             target_date = datetime.now().date()
+    elif isinstance(target_date, datetime):
+        target_date = target_date.date()
     elif not hasattr(target_date, 'isoformat'):
         target_date = datetime.now().date()
 
@@ -186,6 +197,23 @@ def calculate_scenario_impact(baseline: Dict, scenario: WhatIfScenario) -> Dict:
     return impact
 
 
+def simulation_key(baseline: Dict, scenarios: List[Dict], req: SimulationRequest) -> str:
+    """Hash of everything a simulation result depends on.
+
+    The baseline stands in for the goal's revision: it is built from the
+    goal, its pool and the group members, so any change to those (and the
+    daily days_remaining tick) gives a new key.
+    """
+    payload = {
+        "baseline": baseline,
+        "scenarios": scenarios,
+        "explain_outcomes": req.explain_outcomes,
+        "advisor_mode": req.advisor_mode,
+    }
+    return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS, default=str)).hexdigest()
+
+RESULT_PROJECTION = {"_id": 0, "simulation_id": 1, "impacts": 1}
+
 @router.post("/simulate")
 async def run_simulation(req: SimulationRequest):
     """Run the what-if simulation with the given scenarios"""
@@ -196,59 +224,85 @@ async def run_simulation(req: SimulationRequest):
         logger.warning(f"[simulate] Goal not found: {req.goal_id}")
         raise HTTPException(status_code=404, detail=f"Goal {req.goal_id} not found")
     
+    scenarios = [scenario.model_dump() for scenario in req.scenarios]
+    result_key = simulation_key(baseline, scenarios, req)
+    # Identical request on an unchanged goal: hand back the stored run
+    stored = await simulation_results_collection.find_one_and_update(
+        {"result_key": result_key},
+        {"$inc": {"runs": 1}, "$set": {"last_run_at": datetime.now()}},
+        projection=RESULT_PROJECTION,
+    )
+    if stored:
+        return {"simulation_id": stored["simulation_id"], "goal_id": req.goal_id, "impacts": stored["impacts"], "reused": True}
+    
     all_impacts = []
     for scenario in req.scenarios:
         impact = calculate_scenario_impact(baseline, scenario)
         all_impacts.append(impact)
     
-    # Store simulation result in DB
-    simulation_id = str(uuid4())
+    # Store simulation result in DB; a concurrent identical run keeps the first insert
+    now = datetime.now()
     simulation_result = {
-        "simulation_id": simulation_id,
+        "simulation_id": str(uuid4()),
+        "result_key": result_key,
         "goal_id": req.goal_id,
-        "scenarios": req.scenarios,
+        "scenarios": scenarios,
         "baseline": baseline,
         "impacts": all_impacts,
-        "created_at": datetime.now(),
+        "created_at": now,
         "explain_outcomes": req.explain_outcomes,
         "advisor_mode": req.advisor_mode
     }
-    await simulation_results_collection.insert_one(simulation_result)
+    stored = await simulation_results_collection.find_one_and_update(
+        {"result_key": result_key},
+        {"$setOnInsert": simulation_result, "$inc": {"runs": 1}, "$set": {"last_run_at": now}},
+        projection=RESULT_PROJECTION,
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
     
     return {
-        "simulation_id": simulation_id,
+        "simulation_id": stored["simulation_id"],
         "goal_id": req.goal_id,
-        "impacts": all_impacts
+        "impacts": stored["impacts"],
+        "reused": False
     }
 
 
 
 @router.get("/dashboard")
+@uses_analytics_reads
 async def simulation_dashboard():
     """Get overview of all simulation activity"""
     
-    total_simulations = await simulation_results_collection.count_documents({})
-    unique_goals_list = await simulation_results_collection.distinct("goal_id")
-    unique_goals = len(unique_goals_list)
-    
-    # Count scenario types 
-    scenario_types = {}
-    all_simulations = await simulation_results_collection.find({}).to_list(length=None)
-    for sim in all_simulations:
-        for scenario in sim.get("scenarios", []):
-            scenario_type = scenario.get("scenario_type")
-            if scenario_type:
-                scenario_types[scenario_type] = scenario_types.get(scenario_type, 0) + 1
+    # Stored results count once per run they served (results from before
+    # deduplication have no runs field and count once)
+    runs = {"$ifNull": ["$runs", 1]}
+    overview = await simulation_results_collection.aggregate([
+        {"$project": {"_id": 0, "goal_id": 1, "runs": runs, "scenario_types": "$scenarios.scenario_type"}},
+        {"$facet": {
+            "totals": [{"$group": {"_id": None, "simulations": {"$sum": "$runs"}}}],
+            "goals": [{"$group": {"_id": "$goal_id"}}, {"$match": {"_id": {"$ne": None}}}, {"$count": "count"}],
+            "scenario_types": [
+                {"$unwind": "$scenario_types"},
+                {"$group": {"_id": "$scenario_types", "count": {"$sum": "$runs"}}},
+            ],
+        }},
+    ]).to_list(length=1)
+    facet = overview[0] if overview else {}
+    total_simulations = facet["totals"][0]["simulations"] if facet.get("totals") else 0
+    unique_goals = facet["goals"][0]["count"] if facet.get("goals") else 0
+    scenario_types = {row["_id"]: row["count"] for row in facet.get("scenario_types", []) if row["_id"]}
 
 
     recent_simulations = await simulation_results_collection.find({}).sort("_id", -1).limit(5).to_list(length=5)
-    return {
+    return BSONJSONResponse({
         "total_simulations": total_simulations,
         "unique_goals_analyzed": unique_goals,
         "scenario_type_breakdown": scenario_types,
         "recent_simulations": recent_simulations,
         "generated_at": datetime.now().isoformat()
-    }
+    })
 
 
 # ===== AI-Driven Chart Generation =====
@@ -440,12 +494,14 @@ async def generate_charts(req: ChartGenerationRequest):
             ai_prompt = no_goal_selected_response(goal_list, req.prompt)
             client = get_ai_client()
             try:
-                response = await client.chat.completions.create(
-                    model="deepseek/deepseek-chat",
-                    messages=[{"role": "user", "content": ai_prompt}],
-                    max_tokens=300,
-                    temperature=0.7,
-                )
+                with observe_llm_call("simulation") as call:
+                    response = await client.chat.completions.create(
+                        model="deepseek/deepseek-chat",
+                        messages=[{"role": "user", "content": ai_prompt}],
+                        max_tokens=300,
+                        temperature=0.7,
+                    )
+                    call["usage"] = response.usage
                 ai_message = response.choices[0].message.content if response and response.choices else "Please select a goal to analyze from the list."
             except Exception as e:
                 logger.warning(f"AI message generation failed, using fallback. Error: {e}")
@@ -487,12 +543,14 @@ async def generate_charts(req: ChartGenerationRequest):
     try:
         client = get_ai_client()
         if client:
-            response = await client.chat.completions.create(
-                model="deepseek/deepseek-chat",
-                messages=[{"role": "user", "content": ai_instructions}],
-                max_tokens=900,
-                temperature=0.5,
-            )
+            with observe_llm_call("simulation") as call:
+                response = await client.chat.completions.create(
+                    model="deepseek/deepseek-chat",
+                    messages=[{"role": "user", "content": ai_instructions}],
+                    max_tokens=900,
+                    temperature=0.5,
+                )
+                call["usage"] = response.usage
             content = response.choices[0].message.content if response and response.choices else None
             cleaned = content
             if cleaned:
@@ -3,8 +3,9 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 from uuid import uuid4
-from .mongo import users_collection, member_requests_collection
+from .mongo import uses_analytics_reads, users_collection, member_requests_collection
 from .verify_token import verify_token
+from .responses import model_list_response, model_projection
 from .goal import notify_manager_of_request, notify_member_of_request_response
 import logging
 
@@ -210,9 +211,10 @@ async def get_user_profile(user_id: str, user=Depends(verify_token)):
     return UserResponse(**user_data)
 
 @router.get("/", response_model=List[UserResponse])
+@uses_analytics_reads
 async def get_all_users(user=Depends(verify_token)):
-    users = await users_collection.find().to_list(length=None)
-    return [UserResponse(**user) for user in users]
+    users = await users_collection.find({}, model_projection(UserResponse)).to_list(length=None)
+    return model_list_response(UserResponse, users)
 
 @router.put("/profile/{user_id}", response_model=UserResponse)
 async def update_user_profile(user_id: str, update_data: UserUpdate, user=Depends(verify_token)):
@@ -253,9 +255,10 @@ async def delete_user(user_id: str, user=Depends(verify_token)):
     return {"message": "User deleted successfully"}
 
 @router.get("/by-role/{role_type}", response_model=List[UserResponse])
+@uses_analytics_reads
 async def get_users_by_role(role_type: str, user=Depends(verify_token)):
-    users = await users_collection.find({"role.role_type": role_type}).to_list(length=None)
-    return [UserResponse(**user) for user in users]
+    users = await users_collection.find({"role.role_type": role_type}, model_projection(UserResponse)).to_list(length=None)
+    return model_list_response(UserResponse, users)
 
 # Member Request Endpoints
 @router.post("/requests")
@@ -2,19 +2,18 @@ from firebase_admin import credentials, auth, initialize_app
 from fastapi import HTTPException, Request, Depends
 import firebase_admin
 import os
-from dotenv import load_dotenv
+from .resources import resources
 
-# Load environment variables
-load_dotenv()
-
-cred_path = os.getenv("FIREBASE_CRED_PATH")
-if cred_path:
+def init_firebase():
+    cred_path = os.getenv("FIREBASE_CRED_PATH")
+    if not cred_path:
+        raise RuntimeError("Firebase credentials not found")
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
     # Use the path as-is; Docker working directory is /app
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(cred_path)
-        initialize_app(cred)
-else:
-    raise RuntimeError("Firebase credentials not found")
+    return initialize_app(credentials.Certificate(cred_path))
+
+resources.register("firebase", init_firebase)
 
 async def verify_token(request: Request):
     auth_header = request.headers.get("Authorization")
@@ -23,11 +22,21 @@ async def verify_token(request: Request):
         raise HTTPException(status_code=401, detail="Missing or invalid token")
     
     id_token = auth_header.split("Bearer ")[1]
+    # Outside the try: missing credentials are a server error, not a bad token
+    firebase_app = resources.get("firebase")
     
     try:
         # Try to verify the token normally first
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = auth.verify_id_token(id_token, app=firebase_app)
         return decoded_token
     except Exception as e:
         # Suppress error details
-        raise HTTPException(status_code=401, detail="Invalid Firebase token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid Firebase token")
+
+# Admins: a Firebase custom claim admin=true, or a uid listed in ADMIN_UIDS (comma separated)
+ADMIN_UIDS = {uid.strip() for uid in os.getenv("ADMIN_UIDS", "").split(",") if uid.strip()}
+
+async def require_admin(user=Depends(verify_token)):
+    if user.get("admin") is True or user.get("uid") in ADMIN_UIDS:
+        return user
+    raise HTTPException(status_code=403, detail="Admin access required")
@@ -0,0 +1,71 @@
+# Backfill totals_by_uid and contributor_count on pool_status documents.
+# Both are recomputed from the contributors array (entries without a uid are
+# keyed by contributor name, like record_pool_contribution does) and only
+# pools whose stored values differ are rewritten, so re-running is cheap.
+# Each rewrite only applies if the pool's revision is still the one that was
+# read (every contribution bumps it); pools that changed meanwhile are
+# skipped and counted, re-run to pick them up.
+#
+#   python scripts/backfill_pool_totals.py [--dry-run] [--batch-size 500]
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pymongo import UpdateOne  # noqa: E402
+
+from routers.goal_snapshots import REVISION_BUMP  # noqa: E402
+from routers.mongo import client, pool_status_collection  # noqa: E402
+from routers.pool_totals import contributor_totals  # noqa: E402
+
+
+def totals_differ(stored: dict, computed: dict) -> bool:
+    stored = stored or {}
+    if stored.keys() != computed.keys():
+        return True
+    return any(round(float(stored[k] or 0), 2) != round(v, 2) for k, v in computed.items())
+
+
+async def write_updates(updates: list) -> int:
+    """Apply the updates; returns how many were skipped because their pool changed."""
+    result = await pool_status_collection.bulk_write(updates, ordered=False)
+    return len(updates) - result.matched_count
+
+
+async def backfill_pool_totals(dry_run: bool, batch_size: int):
+    scanned = changed = skipped = 0
+    updates = []
+    projection = {"contributors": 1, "totals_by_uid": 1, "contributor_count": 1, "revision": 1}
+    async for pool in pool_status_collection.find({}, projection).batch_size(batch_size):
+        scanned += 1
+        totals = contributor_totals(pool.get("contributors"))
+        if not totals_differ(pool.get("totals_by_uid"), totals) and pool.get("contributor_count") == len(totals):
+            continue
+        changed += 1
+        # The revision bump drops cached goal snapshots built from the old view
+        updates.append(UpdateOne(
+            {"_id": pool["_id"], "revision": pool.get("revision")},
+            {"$set": {"totals_by_uid": totals, "contributor_count": len(totals)}, "$inc": REVISION_BUMP}
+        ))
+        if len(updates) >= batch_size:
+            if not dry_run:
+                skipped += await write_updates(updates)
+            updates = []
+    if updates and not dry_run:
+        skipped += await write_updates(updates)
+    action = "Would update" if dry_run else "Updated"
+    print(f"{action} {changed - skipped} of {scanned} pools.")
+    if skipped:
+        print(f"{skipped} pools received contributions during the run and were skipped; re-run to backfill them.")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill per-member contribution totals on pool_status")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(backfill_pool_totals(args.dry_run, args.batch_size))
@@ -0,0 +1,98 @@
+# Benchmark JSON rendering of large list responses.
+# Builds N synthetic notification-shaped Mongo documents (ObjectId, datetime,
+# Decimal128, nested metadata) and times three ways of turning them into a
+# response body:
+#   loop+encoder  stringify _id by hand, then FastAPI's jsonable_encoder + JSONResponse
+#   encoder       jsonable_encoder with an ObjectId custom encoder + JSONResponse
+#   bson          BSONJSONResponse.render (orjson when installed, json otherwise)
+# No MongoDB is needed.
+#
+#   python scripts/benchmark_json_responses.py --documents 10000 --repeat 5
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from routers.responses import BSONJSONResponse, orjson  # noqa: E402
+
+
+def make_documents(count: int) -> list:
+    now = datetime.now()
+    return [
+        {
+            "_id": ObjectId(),
+            "group_id": f"group{i % 100}",
+            "recipient": f"uid{i % 1000}",
+            "type": "contribution_reminder",
+            "message": f"Reminder {i}: your share for the goal is due soon",
+            "amount": Decimal128(f"{i % 5000}.50"),
+            "read": i % 3 == 0,
+            "auto_generated": True,
+            "timestamp": now - timedelta(minutes=i),
+            "metadata": {"goal_id": f"goal{i % 500}", "priority": "medium", "tags": ["ai", "reminder"]},
+        }
+        for i in range(count)
+    ]
+
+
+def loop_then_encoder(docs: list) -> bytes:
+    rows = []
+    for doc in docs:
+        doc = dict(doc)
+        doc["_id"] = str(doc["_id"])
+        doc["amount"] = float(doc["amount"].to_decimal())
+        rows.append(doc)
+    return JSONResponse(jsonable_encoder({"notifications": rows})).body
+
+
+def encoder_only(docs: list) -> bytes:
+    content = jsonable_encoder(
+        {"notifications": docs},
+        custom_encoder={ObjectId: str, Decimal128: lambda d: float(d.to_decimal())},
+    )
+    return JSONResponse(content).body
+
+
+def bson_response(docs: list) -> bytes:
+    return BSONJSONResponse({"notifications": docs}).body
+
+
+def time_it(fn, docs: list, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(docs)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON list response rendering")
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_documents(args.documents)
+    print(f"documents: {args.documents}, repeat: {args.repeat}, backend: {'orjson' if orjson else 'json'}")
+    baseline = None
+    for name, fn in (("loop+encoder", loop_then_encoder), ("encoder", encoder_only), ("bson", bson_response)):
+        timings = time_it(fn, docs, args.repeat)
+        median = statistics.median(timings)
+        baseline = baseline or median
+        size = len(fn(docs))
+        print(f"{name:<13} median {median * 1000:8.1f} ms  best {min(timings) * 1000:8.1f} ms  "
+              f"{size / 1024:8.0f} KiB  x{baseline / median:.1f}")
+
+
+if __name__ == "__main__":
+    main()
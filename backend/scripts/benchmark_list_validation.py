@@ -0,0 +1,129 @@
+# Benchmark list endpoint validation cost per 1k rows.
+# Compares the old per-row path (Model(**row) in a loop, then FastAPI
+# validating and serialising the list again through response_model) with
+# model_list_response (one TypeAdapter validation + dump_json, or
+# model_construct for trusted rows). Uses the real UserResponse,
+# GroupResponse and goal models with synthetic rows; no MongoDB or Firebase
+# credentials are needed (both are only initialised on first use).
+#
+#   python scripts/benchmark_list_validation.py --rows 1000 --repeat 20
+
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List
+
+from fastapi._compat import ModelField
+from fastapi.responses import JSONResponse
+from fastapi.utils import create_model_field
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from routers.goal import goal  # noqa: E402
+from routers.groups import GroupResponse  # noqa: E402
+from routers.responses import model_list_response  # noqa: E402
+from routers.users import UserResponse  # noqa: E402
+
+
+def user_rows(count: int) -> list:
+    now = datetime.now().isoformat()
+    return [
+        {
+            "firebase_uid": f"uid{i}",
+            "profile": {"first_name": f"First{i}", "last_name": f"Last{i}"},
+            "role": {"role_type": "contributor", "permissions": [], "group_id": f"group{i % 50}"},
+            "created_at": now,
+            "last_login": now,
+        }
+        for i in range(count)
+    ]
+
+
+def group_rows(count: int) -> list:
+    now = datetime.now().isoformat()
+    members = [
+        {"firebase_uid": f"uid{m}", "first_name": "First", "last_name": "Last", "role": "contributor",
+         "joined_at": now, "contribution_total": 100.0, "is_active": True}
+        for m in range(5)
+    ]
+    return [
+        {
+            "group_id": f"group{i}", "name": f"Group {i}", "description": "Benchmark group", "manager_id": "uid0",
+            "members": members, "created_at": now, "is_active": True, "total_goals": 3,
+            "total_contributions": 1500.0, "member_count": len(members),
+        }
+        for i in range(count)
+    ]
+
+
+def goal_rows(count: int) -> list:
+    now = datetime.now()
+    return [
+        {
+            "goal_id": f"goal{i}", "group_id": f"group{i % 50}", "title": f"Goal {i}", "description": "",
+            "goal_amount": 10000.0, "goal_type": "Savings", "current_amount": float(i % 10000),
+            "creator_role": "manager", "creator_name": "Manager", "target_date": now + timedelta(days=i % 90),
+            "is_paid": False, "status": "active", "created_at": now.isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def response_field(model) -> ModelField:
+    return create_model_field(name="Response", type_=List[model], mode="serialization")
+
+
+def old_path(model, rows: list, field: ModelField):
+    # what the endpoints did before: build models in Python, then FastAPI
+    # validates and serialises them again for response_model
+    # (the same validate + serialize steps as fastapi.routing.serialize_response)
+    content = [model(**dict(row)) for row in rows]
+    value, errors = field.validate(content, {}, loc=("response",))
+    assert not errors
+    return JSONResponse(field.serialize(value, mode="json")).body
+
+
+def new_path(model, rows: list, trusted: bool):
+    return model_list_response(model, rows, trusted=trusted).body
+
+
+def timed(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list response validation")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    per_1k = 1000 / args.rows
+    print(f"rows: {args.rows}, repeat: {args.repeat} (ms per 1k rows)")
+    cases = (
+        ("UserResponse", UserResponse, user_rows, False),
+        ("GroupResponse", GroupResponse, group_rows, False),
+        ("goal", goal, goal_rows, False),
+    )
+    for name, model, make_rows, trusted in cases:
+        rows = make_rows(args.rows)
+        field = response_field(model)
+        before = timed(lambda: old_path(model, rows, field), args.repeat)
+        validated = timed(lambda: new_path(model, rows, False), args.repeat)
+        line = (f"{name:<14} before {before * 1000 * per_1k:7.2f}  "
+                f"TypeAdapter {validated * 1000 * per_1k:7.2f} (x{before / validated:.1f})")
+        if trusted:
+            constructed = timed(lambda: new_path(model, rows, True), args.repeat)
+            line += f"  model_construct {constructed * 1000 * per_1k:7.2f} (x{before / constructed:.1f})"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Benchmark progress feed fan-out on one worker.
+# Subscribes N in-process clients (default 1000) to the goal progress feed and
+# pushes synthetic goals change events through ProgressFeed.handle_change, the
+# same path the change stream consumer uses. No MongoDB is needed: the feed is
+# created with autostart=False so no change stream is opened.
+#
+#   python scripts/benchmark_progress_feed.py --subscribers 1000 --events 2000 --groups 1 [--trace-memory]
+#
+# Reports fan-out throughput and the time from handle_change until every
+# subscriber of the group has read the event.
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+
+from routers.progress_feed import ProgressFeed  # noqa: E402
+
+
+def goal_change(goal_id: str, group_id: str, amount: float) -> dict:
+    return {
+        "operationType": "update",
+        "ns": {"coll": "goals"},
+        "updateDescription": {"updatedFields": {"current_amount": amount, "progress_ratio": amount / 10000}},
+        "fullDocument": {
+            "goal_id": goal_id,
+            "group_id": group_id,
+            "title": "Benchmark goal",
+            "status": "active",
+            "current_amount": amount,
+            "goal_amount": 10000.0,
+        },
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark progress feed fan-out")
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=1, help="subscribers are spread over this many groups")
+    parser.add_argument("--trace-memory", action="store_true", help="report peak memory (slows the run down)")
+    args = parser.parse_args()
+
+    if args.trace_memory:
+        tracemalloc.start()
+    feed = ProgressFeed(autostart=False)
+    group_ids = [f"group{i}" for i in range(args.groups)]
+    subscriptions = [feed.subscribe([group_ids[i % args.groups]]) for i in range(args.subscribers)]
+    per_group = {g: sum(1 for s in subscriptions if g in s.group_ids) for g in group_ids}
+
+    received = 0
+    target = 0
+    all_received = asyncio.Event()
+
+    async def client(subscription):
+        nonlocal received
+        while True:
+            await subscription.queue.get()
+            received += 1
+            if received >= target:
+                all_received.set()
+
+    clients = [asyncio.create_task(client(s)) for s in subscriptions]
+    await asyncio.sleep(0)
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(args.events):
+        group_id = group_ids[i % args.groups]
+        received = 0
+        target = per_group[group_id]
+        all_received.clear()
+        t0 = time.perf_counter()
+        await feed.handle_change(goal_change(f"goal{i % 50}", group_id, float(i % 10000)))
+        await all_received.wait()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    for task in clients:
+        task.cancel()
+    latencies.sort()
+    print(f"subscribers:        {args.subscribers} over {args.groups} group(s)")
+    print(f"events:             {args.events} ({feed.deliveries} deliveries)")
+    print(f"deliveries/s:       {feed.deliveries / elapsed:,.0f}")
+    print(f"fan-out p50:        {statistics.median(latencies) * 1000:.2f} ms")
+    print(f"fan-out p99:        {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+    print(f"dropped events:     {sum(s.dropped for s in subscriptions)}")
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+# Benchmark one scheduler monitoring cycle against a local MongoDB.
+# Seeds synthetic goals + pool_status rows into a throwaway database, runs
+# run_monitoring_cycle once and prints the cycle stats.
+#
+#   python scripts/benchmark_scheduler.py --goals 10000 [--risk-window]
+#
+# Uses MONGODB_URI (default mongodb://localhost:27017) and the database named
+# by --db, never the app's ambag_database.
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+
+def build_goal(now: datetime, rng: random.Random):
+    goal_id = str(uuid.uuid4())
+    goal_amount = float(rng.choice([1000, 2500, 5000, 12000]))
+    goal = {
+        "goal_id": goal_id,
+        "group_id": f"bench{rng.randint(0, 199):03d}",
+        "title": f"Benchmark goal {goal_id[:8]}",
+        "goal_amount": goal_amount,
+        "goal_type": "Savings",
+        "creator_role": "manager",
+        "creator_name": "Benchmark",
+        "target_date": datetime.combine((now + timedelta(days=rng.randint(-2, 60))).date(), time.min),
+        "status": "active",
+        "created_at": now.isoformat(),
+    }
+    # Keep progress under 100% so no completion workflow fires, and mark the
+    # deadline reminder as already sent so the benchmark never calls the LLM.
+    contributors = [
+        {
+            "name": f"member{i}",
+            "uid": f"member{i}",
+            "amount": round(goal_amount * rng.uniform(0.01, 0.15), 2),
+            "timestamp": (now - timedelta(days=rng.randint(0, 30))).isoformat(),
+        }
+        for i in range(rng.randint(0, 6))
+    ]
+    current_amount = sum(c["amount"] for c in contributors)
+    goal["current_amount"] = current_amount
+    goal["progress_ratio"] = current_amount / goal_amount
+    pool = {
+        "goal_id": goal_id,
+        "current_amount": current_amount,
+        "is_paid": False,
+        "status": "active",
+        "contributors": contributors,
+        "last_deadline_reminder": now.strftime("%Y-%m-%d"),
+    }
+    return goal, pool
+
+
+async def seed(mongo, count: int, seed_value: int):
+    rng = random.Random(seed_value)
+    now = datetime.now()
+    await mongo.goals_collection.delete_many({})
+    await mongo.pool_status_collection.delete_many({})
+    await mongo.pool_status_collection.create_index("goal_id")
+    await mongo.ensure_indexes()
+    batch_goals, batch_pools = [], []
+    for _ in range(count):
+        goal, pool = build_goal(now, rng)
+        batch_goals.append(goal)
+        batch_pools.append(pool)
+        if len(batch_goals) == 1000:
+            await mongo.goals_collection.insert_many(batch_goals)
+            await mongo.pool_status_collection.insert_many(batch_pools)
+            batch_goals, batch_pools = [], []
+    if batch_goals:
+        await mongo.goals_collection.insert_many(batch_goals)
+        await mongo.pool_status_collection.insert_many(batch_pools)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark one scheduler monitoring cycle")
+    parser.add_argument("--goals", type=int, default=10000)
+    parser.add_argument("--db", default="ambag_scheduler_benchmark")
+    parser.add_argument("--max-concurrency", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--risk-window", action="store_true", help="run a risk-window cycle instead of a full sweep")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark database afterwards")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    os.environ["MONGODB_DB"] = args.db
+    sys.path.insert(0, str(APP_DIR))
+    logging_level = os.getenv("BENCH_LOG_LEVEL", "WARNING")
+
+    import logging
+    from routers import mongo, scheduler
+
+    logging.getLogger().setLevel(logging_level)
+    for name in ("routers.scheduler", "routers.ai_tools_clean"):
+        logging.getLogger(name).setLevel(logging_level)
+
+    if args.max_concurrency:
+        scheduler.SCHEDULER_CONFIG["max_concurrency"] = args.max_concurrency
+
+    print(f"Seeding {args.goals} goals into {args.db} ...")
+    await seed(mongo, args.goals, args.seed)
+
+    stats = await scheduler.run_monitoring_cycle(ai_client=None, full_sweep=not args.risk_window)
+    print(json.dumps(stats, indent=2))
+    legacy_sleep = math.ceil(args.goals / 5)
+    print(f"Legacy batches-of-5 loop would have slept {legacy_sleep}s on top of its query time.")
+
+    if not args.keep:
+        await mongo.client.drop_database(args.db)
+    mongo.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
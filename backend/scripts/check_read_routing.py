@@ -0,0 +1,82 @@
+# Check read routing against a replica set (a local one is enough):
+#
+#   mongod --replSet rs0 --port 27017 --dbpath /tmp/rs0-a
+#   mongod --replSet rs0 --port 27018 --dbpath /tmp/rs0-b
+#   mongosh --eval 'rs.initiate({_id: "rs0", members: [{_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"}]})'
+#   MONGODB_URI="mongodb://localhost:27017,localhost:27018/?replicaSet=rs0" python scripts/check_read_routing.py
+#
+# Writes a marker document, then reads it back three ways and reports which
+# member served each read: a default (primary) read, an analytics read, and
+# an analytics read carrying the write's X-Read-After token (causal session).
+
+import argparse
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pymongo import monitoring  # noqa: E402
+
+from routers.read_routing import RequestWrites, encode_token, decode_token, read_after, request_writes  # noqa: E402
+
+served_by = []
+
+
+class ServedBy(monitoring.CommandListener):
+    def started(self, event):
+        if event.command_name == "find":
+            served_by.append((event.connection_id, event.command.get("readConcern")))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+monitoring.register(ServedBy())
+
+from routers.mongo import analytics_reads, client, db  # noqa: E402
+
+
+async def check_read_routing(collection_name: str):
+    collection = db[collection_name]
+    marker = uuid.uuid4().hex
+
+    writes = RequestWrites()
+    request_writes.set(writes)
+    await collection.insert_one({"marker": marker})
+    if writes.last_operation_time is None:
+        print("No operationTime on the write reply: not a replica set, routing cannot be checked.")
+        client.close()
+        return
+    token = encode_token(writes.last_operation_time)
+    print(f"write token: {token}")
+
+    found = await collection.find_one({"marker": marker})
+    print(f"primary read      -> {served_by[-1][0]} found={found is not None}")
+
+    async with analytics_reads():
+        found = await collection.find_one({"marker": marker})
+    print(f"analytics read    -> {served_by[-1][0]} found={found is not None} (may miss under lag)")
+
+    read_after.set(decode_token(token))
+    async with analytics_reads():
+        found = await collection.find_one({"marker": marker})
+    print(f"read-after read   -> {served_by[-1][0]} found={found is not None} readConcern={served_by[-1][1]}")
+    assert found is not None, "causal read did not see its own write"
+
+    await collection.delete_many({"marker": marker})
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check secondary routing and read-your-writes on a replica set")
+    parser.add_argument("--collection", default="read_routing_check")
+    args = parser.parse_args()
+    if not os.getenv("MONGODB_URI"):
+        sys.exit("MONGODB_URI must point at a replica set")
+    asyncio.run(check_read_routing(args.collection))
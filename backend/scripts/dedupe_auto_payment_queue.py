@@ -0,0 +1,64 @@
+# Prepare auto_payment_queue and virtual_balances for their unique indexes.
+# Keeps the oldest auto_payment_queue entry per goal and the oldest
+# virtual_balances payout per payout_id, deletes the duplicates and strips the
+# embedded goal copies older queue entries carried (title and group_id are
+# kept as goal_title / group_id). Run before restarting the API so
+# ensure_indexes can build the indexes.
+#
+#   python scripts/dedupe_auto_payment_queue.py [--dry-run]
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from routers.mongo import auto_payment_queue_collection, client, ensure_indexes, virtual_balances_collection  # noqa: E402
+
+
+async def delete_duplicates(collection, key: str, match: dict, dry_run: bool) -> int:
+    """Delete all but the oldest document of `match` per value of `key`; returns how many (would) go."""
+    duplicates = 0
+    async for group in collection.aggregate([
+        {"$match": match},
+        {"$sort": {"_id": 1}},
+        {"$group": {"_id": f"${key}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ]):
+        extra = group["ids"][1:]
+        duplicates += len(extra)
+        print(f"  {collection.name}: {key} {group['_id']!r} has {group['count']} rows, keeping {group['ids'][0]}")
+        if not dry_run:
+            await collection.delete_many({"_id": {"$in": extra}})
+    return duplicates
+
+
+async def dedupe_auto_payment_queue(dry_run: bool):
+    duplicates = await delete_duplicates(auto_payment_queue_collection, "goal_id", {}, dry_run)
+    payouts = await delete_duplicates(virtual_balances_collection, "payout_id", {"payout_id": {"$exists": True}}, dry_run)  # partial index
+
+    stripped = await auto_payment_queue_collection.count_documents({"goal": {"$exists": True}})
+    if not dry_run and stripped:
+        await auto_payment_queue_collection.update_many(
+            {"goal": {"$exists": True}},
+            [
+                {"$set": {
+                    "goal_title": {"$ifNull": ["$goal_title", "$goal.title"]},
+                    "group_id": {"$ifNull": ["$group_id", "$goal.group_id"]},
+                }},
+                {"$unset": "goal"},
+            ]
+        )
+    if not dry_run:
+        await ensure_indexes()
+
+    action = "Would remove" if dry_run else "Removed"
+    print(f"{action} {duplicates} duplicate queue entries, {payouts} duplicate payouts and {stripped} embedded goal copies.")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicate auto_payment_queue and virtual_balances payouts before adding their unique indexes")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(dedupe_auto_payment_queue(parser.parse_args().dry_run))
@@ -0,0 +1,74 @@
+# Backfill the deadline calendar fields on existing goals.
+# Converts string target_date values to BSON dates (midnight) and sets
+# progress_ratio, so the status/target_date/progress_ratio index covers every
+# goal. The ratio is computed inside the update from the goal's own
+# current_amount, so a contribution landing during the run is never
+# overwritten (goal amounts that disagree with their pool are
+# sync_pool_status.py's job). Goals whose target_date cannot be parsed are
+# reported and left untouched. Runs in _id ranges through
+# routers.batch_migrations (--resume after an interruption).
+#
+#   python scripts/migrate_goal_target_dates.py [--dry-run] [--resume | --reset]
+#                                               [--batch-size 500] [--concurrency 4] [--writes-per-second 1000]
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pymongo import UpdateOne  # noqa: E402
+
+from routers.batch_migrations import MigrationBatch, add_migration_arguments, in_range, migration_options, run_migration  # noqa: E402
+from routers.goal_calendar import REFRESH_PROGRESS_RATIO, to_target_datetime  # noqa: E402
+from routers.mongo import (  # noqa: E402
+    background_pool,
+    client,
+    ensure_indexes,
+    goals_collection,
+)
+
+PENDING_FILTER = {"$or": [
+    {"target_date": {"$not": {"$type": "date"}}},
+    {"progress_ratio": {"$exists": False}},
+]}
+
+
+async def migrate_range(id_range: dict) -> MigrationBatch:
+    batch = MigrationBatch()
+    goals = await goals_collection.find(
+        in_range(id_range, PENDING_FILTER), {"goal_id": 1, "target_date": 1}
+    ).to_list(length=None)
+    updates = []
+    for goal in goals:
+        target_date = to_target_datetime(goal.get("target_date"))
+        if target_date is None:
+            batch.stats["unparseable"] += 1
+            batch.notes.append(f"unparseable target_date {goal.get('target_date')!r} on {goal.get('goal_id') or goal['_id']}")
+            continue
+        updates.append(UpdateOne({"_id": goal["_id"]}, [{"$set": {"target_date": target_date}}, REFRESH_PROGRESS_RATIO]))
+    batch.write(goals_collection, updates)
+    batch.stats["migrated"] += len(updates)
+    return batch
+
+
+async def migrate_goal_target_dates(options: dict):
+    if not options["dry_run"]:
+        await ensure_indexes()
+    total = await run_migration("migrate_goal_target_dates", goals_collection, migrate_range, **options)
+    action = "Would migrate" if options["dry_run"] else "Migrated"
+    print(f"{action} {total.stats['migrated']} goals.")
+    if total.stats["unparseable"]:
+        print(f"{total.stats['unparseable']} goals have an unparseable target_date:")
+        for note in total.notes:
+            print(f"  {note}")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill BSON target_date and progress_ratio on goals")
+    add_migration_arguments(parser)
+    args = parser.parse_args()
+    with background_pool():
+        asyncio.run(migrate_goal_target_dates(migration_options(args)))
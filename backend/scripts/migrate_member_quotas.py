@@ -0,0 +1,76 @@
+# Move quotas out of the members arrays on goals and plans into member_quotas.
+# Each {id, name, quota} entry becomes a member_quotas document (existing
+# member_quotas documents win, so re-running never overwrites newer
+# allocations) and the array is removed from the goal/plan.
+#
+#   python scripts/migrate_member_quotas.py [--dry-run]
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pymongo import UpdateOne  # noqa: E402
+
+from routers.member_quotas import quota_key  # noqa: E402
+from routers.mongo import (  # noqa: E402
+    client,
+    ensure_indexes,
+    goals_collection,
+    member_quotas_collection,
+    plans_collection,
+)
+
+OWNERS = (("goal", goals_collection, "goal_id"), ("plan", plans_collection, "plan_id"))
+
+
+async def migrate_owner(owner_type: str, collection, id_field: str, dry_run: bool) -> tuple:
+    owners = quotas = 0
+    now = datetime.now().isoformat()
+    async for doc in collection.find({"members": {"$type": "array"}}, {id_field: 1, "members": 1}):
+        owner_id = doc.get(id_field)
+        if not owner_id:
+            continue
+        upserts = [
+            UpdateOne(
+                quota_key(owner_type, str(owner_id), m["id"]),
+                {"$setOnInsert": {
+                    "name": m.get("name", ""),
+                    "quota": float(m.get("quota") or 0),
+                    "version": 1,
+                    "created_at": now,
+                    "updated_at": now,
+                }},
+                upsert=True
+            )
+            for m in doc["members"]
+            if isinstance(m, dict) and m.get("id") is not None
+        ]
+        owners += 1
+        quotas += len(upserts)
+        if dry_run:
+            continue
+        if upserts:
+            await member_quotas_collection.bulk_write(upserts, ordered=False)
+        await collection.update_one({"_id": doc["_id"]}, {"$unset": {"members": ""}})
+    return owners, quotas
+
+
+async def migrate_member_quotas(dry_run: bool):
+    if not dry_run:
+        await ensure_indexes()
+    action = "Would move" if dry_run else "Moved"
+    for owner_type, collection, id_field in OWNERS:
+        owners, quotas = await migrate_owner(owner_type, collection, id_field, dry_run)
+        print(f"{action} {quotas} quotas from {owners} {owner_type}s.")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move embedded member quotas into member_quotas")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(migrate_member_quotas(args.dry_run))
@@ -0,0 +1,72 @@
+# Move legacy pool_status.scheduler_monitoring arrays into monitoring_events.
+# Entries older than the TTL window are dropped instead of copied (the TTL
+# index would delete them right away). The array is $unset afterwards so
+# pool_status documents shrink back to their contribution data.
+#
+#   python scripts/move_scheduler_monitoring.py [--dry-run]
+
+import argparse
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from routers.mongo import (  # noqa: E402
+    MONITORING_EVENTS_TTL_SECONDS,
+    client,
+    ensure_indexes,
+    monitoring_events_collection,
+    pool_status_collection,
+)
+
+
+def to_event(goal_id: str, entry: dict, cutoff: datetime):
+    try:
+        timestamp = datetime.fromisoformat(entry.get("timestamp", ""))
+    except (TypeError, ValueError):
+        return None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    if timestamp < cutoff:
+        return None
+    risk = entry.get("risk_assessment", {}) or {}
+    return {
+        "goal_id": goal_id,
+        "timestamp": timestamp,
+        "risk_level": risk.get("risk_level", "UNKNOWN"),
+        "risk_assessment": risk,
+        "ai_monitoring_result": entry.get("ai_monitoring_result", {}),
+        "triggered_by": entry.get("triggered_by", "production_scheduler"),
+    }
+
+
+async def move_scheduler_monitoring(dry_run: bool):
+    await ensure_indexes()
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=MONITORING_EVENTS_TTL_SECONDS)
+    pools = moved = dropped = 0
+    cursor = pool_status_collection.find(
+        {"scheduler_monitoring": {"$exists": True}},
+        {"goal_id": 1, "scheduler_monitoring": 1},
+    )
+    async for pool in cursor:
+        entries = pool.get("scheduler_monitoring") or []
+        events = [e for e in (to_event(pool.get("goal_id"), entry, cutoff) for entry in entries) if e]
+        pools += 1
+        moved += len(events)
+        dropped += len(entries) - len(events)
+        if dry_run:
+            continue
+        if events:
+            await monitoring_events_collection.insert_many(events, ordered=False)
+        await pool_status_collection.update_one({"_id": pool["_id"]}, {"$unset": {"scheduler_monitoring": ""}})
+    action = "Would move" if dry_run else "Moved"
+    print(f"{action} {moved} monitoring entries from {pools} pools ({dropped} expired entries dropped).")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move scheduler_monitoring arrays into monitoring_events")
+    parser.add_argument("--dry-run", action="store_true")
+    asyncio.run(move_scheduler_monitoring(parser.parse_args().dry_run))
@@ -0,0 +1,72 @@
+# Backfill and repair notification_counters.
+# Counts every recipient's unread notifications and writes the count into
+# their {_id: recipient, unread: n} counter: recipients without a counter get
+# one ($setOnInsert, so a counter created meanwhile by insert_notifications
+# is not overwritten), and counters that drifted are corrected with a
+# compare-and-set on the value that was read, so an $inc landing in between
+# is never lost. Counters changed by live traffic during the run are
+# reported; re-run until none are.
+#
+#   python scripts/recount_notification_counters.py [--dry-run] [--batch-size 500]
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pymongo import UpdateOne  # noqa: E402
+
+from routers.mongo import (  # noqa: E402
+    background_pool,
+    client,
+    notification_counters_collection,
+    notifications_collection,
+)
+
+
+async def recount_notification_counters(dry_run: bool, batch_size: int):
+    stored = {
+        counter["_id"]: counter.get("unread")
+        async for counter in notification_counters_collection.find({}, {"unread": 1})
+    }
+    counted = {
+        row["_id"]: row["unread"]
+        async for row in notifications_collection.aggregate([
+            {"$match": {"recipient": {"$exists": True, "$ne": None}, "read": {"$ne": True}}},
+            {"$group": {"_id": "$recipient", "unread": {"$sum": 1}}},
+        ])
+    }
+    creates, corrections = [], []
+    for recipient in stored.keys() | counted.keys():
+        unread = counted.get(recipient, 0)
+        if recipient not in stored:
+            creates.append(UpdateOne({"_id": recipient}, {"$setOnInsert": {"unread": unread}}, upsert=True))
+        elif stored[recipient] != unread:
+            corrections.append(UpdateOne({"_id": recipient, "unread": stored[recipient]}, {"$set": {"unread": unread}}))
+
+    missed = 0
+    if not dry_run:
+        for start in range(0, len(creates), batch_size):
+            result = await notification_counters_collection.bulk_write(creates[start:start + batch_size], ordered=False)
+            missed += result.matched_count  # created by insert_notifications in the meantime
+        for start in range(0, len(corrections), batch_size):
+            batch = corrections[start:start + batch_size]
+            result = await notification_counters_collection.bulk_write(batch, ordered=False)
+            missed += len(batch) - result.matched_count
+
+    action = "Would create" if dry_run else "Created"
+    print(f"{action} {len(creates)} counters; {len(corrections)} of {len(stored)} existing ones drifted.")
+    if missed:
+        print(f"{missed} counters changed during the run and were left as is; re-run to recount them.")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill and repair unread notification counters")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    with background_pool():
+        asyncio.run(recount_notification_counters(args.dry_run, args.batch_size))
@@ -1,41 +1,180 @@
-# Script to sync pool_status_collection with goals_collection
-# For each goal in goals_collection, ensure a corresponding pool_status_collection entry exists.
+# Reconcile pool_status with goals.
+#
+# The goals are split into _id ranges of --batch-size. For each range one
+# aggregation joins the goals to their pool ($lookup on pool_status.goal_id)
+# and returns only the rows that need attention:
+#
+#   missing       goal without a pool_status row -> upserted with $setOnInsert
+#   goal_amount   goals.current_amount != pool current_amount -> goal rewritten
+#                 (with progress_ratio) from the pool
+#   ledger        pool current_amount != sum of its contributors -> reported;
+#                 with --trust-ledger the pool is set to the contributor sum
+#                 (its goal follows on the next run)
+#   duplicate     more than one pool_status row for the goal -> reported only
+#
+# Rewrites are compare-and-set on the values the aggregation read (the pool's
+# revision and amount, the goal's amount), so a contribution landing in
+# between is never overwritten; such rows are skipped and counted.
+#
+# Ranges run through routers.batch_migrations (concurrent, rate-limited,
+# checkpointed; --resume continues an interrupted run). --dry-run writes
+# nothing and prints the diff instead. Groups whose goal totals changed get
+# their stats reconciled at the end.
+#
+#   python scripts/sync_pool_status.py [--dry-run] [--resume | --reset] [--trust-ledger]
+#                                      [--batch-size 500] [--concurrency 4] [--writes-per-second 1000]
 
+import argparse
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
+import sys
 from datetime import datetime
+from pathlib import Path
 
-MONGO_URI = "mongodb://localhost:27017"  # Update if needed
-db_name = "ambag"  # Update if your DB name is different
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
 
-goals_collection_name = "goals"
-pool_status_collection_name = "pool_status"
+from pymongo import UpdateOne  # noqa: E402
 
-async def sync_pool_status():
-    client = AsyncIOMotorClient(MONGO_URI)
-    db = client[db_name]
-    goals_collection = db[goals_collection_name]
-    pool_status_collection = db[pool_status_collection_name]
+from routers.batch_migrations import MigrationBatch, add_migration_arguments, in_range, migration_options, run_migration  # noqa: E402
+from routers.goal_calendar import compute_progress_ratio  # noqa: E402
+from routers.goal_snapshots import REVISION_BUMP  # noqa: E402
+from routers.group_stats import reconcile_group_stats  # noqa: E402
+from routers.mongo import (  # noqa: E402
+    background_pool,
+    client,
+    goals_collection,
+    pool_status_collection,
+)
 
-    async for goal in goals_collection.find({}):
-        goal_id = goal.get("goal_id")
-        if not goal_id:
+CHECKPOINT_ID = "sync_pool_status"
+# Amounts are pesos; anything below a centavo is float noise
+TOLERANCE = 0.005
+CATEGORIES = ("missing", "goal_amount", "ledger", "duplicate")
+
+
+def diverged(a: str, b: str) -> dict:
+    return {"$gt": [{"$abs": {"$subtract": [a, b]}}, TOLERANCE]}
+
+
+def range_pipeline(id_range: dict) -> list:
+    return [
+        {"$match": in_range(id_range, {"goal_id": {"$exists": True, "$ne": None}})},
+        {"$project": {
+            "goal_id": 1, "group_id": 1, "goal_amount": 1, "status": 1, "is_paid": 1,
+            "current_amount": {"$ifNull": ["$current_amount", 0]},
+            "stored_amount": "$current_amount",  # as read, for the compare-and-set
+        }},
+        {"$lookup": {
+            "from": pool_status_collection.name,
+            "localField": "goal_id",
+            "foreignField": "goal_id",
+            "as": "pools",
+            "pipeline": [{"$project": {
+                "revision": 1,
+                "stored_amount": "$current_amount",
+                "current_amount": {"$ifNull": ["$current_amount", 0]},
+                "ledger": {"$sum": "$contributors.amount"},
+            }}],
+        }},
+        {"$set": {"pool_count": {"$size": "$pools"}, "pool": {"$first": "$pools"}}},
+        {"$set": {"flags": {
+            "missing": {"$eq": ["$pool_count", 0]},
+            "duplicate": {"$gt": ["$pool_count", 1]},
+            "goal_amount": {"$and": [{"$gt": ["$pool_count", 0]}, diverged("$current_amount", "$pool.current_amount")]},
+            "ledger": {"$and": [{"$gt": ["$pool_count", 0]}, diverged("$pool.current_amount", "$pool.ledger")]},
+        }}},
+        {"$match": {"$expr": {"$or": [f"$flags.{category}" for category in CATEGORIES]}}},
+        {"$project": {"pools": 0}},
+    ]
+
+
+def pool_doc(goal: dict) -> dict:
+    return {
+        "goal_id": goal["goal_id"],
+        "current_amount": float(goal["current_amount"] or 0),
+        "is_paid": goal.get("is_paid", False),
+        "status": goal.get("status", "active"),
+        "contributors": [],
+        "totals_by_uid": {},
+        "contributor_count": 0,
+        "created_at": datetime.now().isoformat(),
+    }
+
+
+def plan_repairs(rows: list, trust_ledger: bool):
+    """Turn the divergent rows of one range into (pool updates, goal updates, diff lines)."""
+    pool_updates, goal_updates, diffs = [], [], []
+    for goal in rows:
+        flags, pool, goal_id = goal["flags"], goal.get("pool") or {}, goal["goal_id"]
+        if flags["missing"]:
+            pool_updates.append(UpdateOne({"goal_id": goal_id}, {"$setOnInsert": pool_doc(goal)}, upsert=True))
+            diffs.append(("missing", goal_id, None, goal["current_amount"]))
             continue
-        pool = await pool_status_collection.find_one({"goal_id": goal_id})
-        if not pool:
-            # Create initial pool status for this goal
-            pool_doc = {
-                "goal_id": goal_id,
-                "current_amount": 0.0,
-                "contributors": [],
-                "created_at": datetime.now().isoformat()
-            }
-            await pool_status_collection.insert_one(pool_doc)
-            print(f"Created pool status for goal_id: {goal_id}")
-        else:
-            print(f"Pool status already exists for goal_id: {goal_id}")
-    print("Sync complete.")
+        if flags["duplicate"]:
+            # Which row is right is a human decision
+            diffs.append(("duplicate", goal_id, goal["pool_count"], 1))
+            continue
+        expected = pool["current_amount"]
+        if flags["ledger"]:
+            diffs.append(("ledger", goal_id, pool["current_amount"], pool["ledger"]))
+            if trust_ledger:
+                # Only if the pool is unchanged since it was read: every contribution
+                # bumps the revision, and an overwritten $inc would be lost money
+                pool_updates.append(UpdateOne(
+                    {"_id": pool["_id"], "revision": pool.get("revision"), "current_amount": pool.get("stored_amount")},
+                    {"$set": {"current_amount": pool["ledger"]}, "$inc": REVISION_BUMP},
+                ))
+                # The pool write may miss, so the goal does not follow it in the same
+                # run; the next run flags goal_amount if the goal still differs
+                continue
+        if abs(goal["current_amount"] - expected) > TOLERANCE:
+            diffs.append(("goal_amount", goal_id, goal["current_amount"], expected))
+            goal_updates.append((goal.get("group_id"), UpdateOne(
+                {"_id": goal["_id"], "current_amount": goal.get("stored_amount")},
+                {"$set": {"current_amount": expected, "progress_ratio": compute_progress_ratio(expected, goal.get("goal_amount"))}},
+            )))
+    return pool_updates, goal_updates, diffs
+
+
+async def sync_pool_status(trust_ledger: bool, options: dict):
+    affected_groups = set()
+
+    async def process(id_range: dict) -> MigrationBatch:
+        batch = MigrationBatch()
+        rows = await goals_collection.aggregate(range_pipeline(id_range)).to_list(length=None)
+        pool_updates, goal_updates, diffs = plan_repairs(rows, trust_ledger)
+        batch.write(pool_status_collection, pool_updates)
+        batch.write(goals_collection, [update for _, update in goal_updates])
+        batch.stats.update(category for category, *_ in diffs)
+        batch.notes.extend(f"{category:<12} {goal_id}: {stored} -> {expected}" for category, goal_id, stored, expected in diffs)
+        affected_groups.update(group_id for group_id, _ in goal_updates if group_id)
+        return batch
+
+    total = await run_migration(CHECKPOINT_ID, goals_collection, process, **options)
+
+    if affected_groups and not options["dry_run"]:
+        corrected = await reconcile_group_stats(affected_groups)
+        print(f"Reconciled stats of {corrected} groups.")
+
+    for note in total.notes:
+        print(f"  {note}")
+    action = "Would repair" if options["dry_run"] else "Repaired"
+    counts = ", ".join(f"{category} {total.stats[category]}" for category in CATEGORIES)
+    print(f"{action}: {counts} (in {total.stats['ranges']} ranges).")
+    if total.stats["unmatched"]:
+        print(f"{total.stats['unmatched']} repairs were skipped because the goal or pool changed meanwhile; re-run to recheck them.")
+    if total.stats["ledger"] and not trust_ledger:
+        print("Pools disagreeing with their contributors were left as is; re-run with --trust-ledger to repair them.")
+    elif total.stats["ledger"] and not options["dry_run"]:
+        print("Goals of the pools set to their contributor sums are updated on the next run; re-run to sync them.")
+    if total.stats["duplicate"]:
+        print("Goals with several pool_status rows need a manual merge.")
     client.close()
 
+
 if __name__ == "__main__":
-    asyncio.run(sync_pool_status())
+    parser = argparse.ArgumentParser(description="Reconcile pool_status rows and goal amounts")
+    add_migration_arguments(parser)
+    parser.add_argument("--trust-ledger", action="store_true", help="set pool amounts to their contributor sums")
+    args = parser.parse_args()
+    with background_pool():
+        asyncio.run(sync_pool_status(args.trust_ledger, migration_options(args)))
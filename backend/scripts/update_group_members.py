@@ -0,0 +1,87 @@
+# Move embedded group members into the group_members collection.
+# For every group that still has a members array, each member is upserted
+# into group_members (members without a firebase_uid use their legacy
+# user_id), the array is removed and the group's materialised stats are
+# recomputed. Safe to re-run; with --recount only the stats are recomputed
+# for every group. Groups are moved in _id ranges through
+# routers.batch_migrations (--resume after an interruption).
+#
+#   python scripts/update_group_members.py [--dry-run] [--resume | --reset] [--recount]
+#                                          [--batch-size 500] [--concurrency 4] [--writes-per-second 1000]
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from pymongo import UpdateOne  # noqa: E402
+
+from routers.batch_migrations import MigrationBatch, add_migration_arguments, in_range, migration_options, run_migration  # noqa: E402
+from routers.group_stats import reconcile_group_stats  # noqa: E402
+from routers.mongo import (  # noqa: E402
+    background_pool,
+    client,
+    ensure_indexes,
+    group_members_collection,
+    groups_collection,
+)
+
+
+def member_upserts(group: dict, batch: MigrationBatch) -> list:
+    group_id = group["group_id"]
+    upserts = []
+    for member in group.get("members") or []:
+        if not isinstance(member, dict):
+            continue
+        firebase_uid = member.get("firebase_uid") or member.get("user_id")
+        if not firebase_uid:
+            batch.notes.append(f"{group_id}: skipped member without firebase_uid/user_id: {member}")
+            continue
+        upserts.append(UpdateOne(
+            {"group_id": group_id, "firebase_uid": firebase_uid},
+            {"$setOnInsert": {**member, "group_id": group_id, "firebase_uid": firebase_uid}},
+            upsert=True
+        ))
+    return upserts
+
+
+async def move_members(id_range: dict) -> MigrationBatch:
+    batch = MigrationBatch()
+    groups = await groups_collection.find(
+        in_range(id_range, {"members": {"$exists": True}, "group_id": {"$exists": True}}), {"group_id": 1, "members": 1}
+    ).to_list(length=None)
+    upserts = [upsert for group in groups for upsert in member_upserts(group, batch)]
+    # Members first: a group only loses its array once its rows exist
+    batch.write(group_members_collection, upserts)
+    batch.write(groups_collection, [UpdateOne({"_id": group["_id"]}, {"$unset": {"members": ""}}) for group in groups])
+    batch.stats["members"] += len(upserts)
+    batch.stats["groups"] += len(groups)
+    return batch
+
+
+async def update_group_members(recount: bool, options: dict):
+    dry_run = options["dry_run"]
+    if not dry_run:
+        await ensure_indexes()
+    if not recount:
+        total = await run_migration("update_group_members", groups_collection, move_members, **options)
+        for note in total.notes:
+            print(f"  {note}")
+        action = "Would move" if dry_run else "Moved"
+        print(f"{action} {total.stats['members']} members out of {total.stats['groups']} groups.")
+    if not dry_run:
+        # All groups, not just the migrated ones: goal counters may predate group_stats too
+        corrected = await reconcile_group_stats()
+        print(f"Recomputed stats; {corrected} groups corrected.")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move embedded group members into group_members")
+    add_migration_arguments(parser)
+    parser.add_argument("--recount", action="store_true", help="recompute counters for every group")
+    args = parser.parse_args()
+    with background_pool():
+        asyncio.run(update_group_members(args.recount, migration_options(args)))
@@ -22,6 +22,42 @@ export const api = axios.create({
   withCredentials: true,
 });
 
+// Read-your-own-writes: responses to writes carry an X-Read-After token
+// ("<seconds>.<increment>"). Sending the newest one back makes the backend's
+// secondary reads (goal, group and user lists) wait for that write, so a
+// list reloaded right after approving or creating something includes it.
+// Kept in sessionStorage so it survives a page reload.
+const READ_AFTER_HEADER = "X-Read-After";
+const READ_AFTER_KEY = "ambag:read-after";
+
+function tokenParts(value) {
+  return String(value || "").split(".").map(Number);
+}
+
+function isNewerToken(candidate, current) {
+  if (!current) return true;
+  const [seconds, increment] = tokenParts(candidate);
+  const [currentSeconds, currentIncrement] = tokenParts(current);
+  return seconds > currentSeconds || (seconds === currentSeconds && increment > currentIncrement);
+}
+
+api.interceptors.request.use((config) => {
+  const readAfter = sessionStorage.getItem(READ_AFTER_KEY);
+  if (readAfter) {
+    config.headers = config.headers || {};
+    config.headers[READ_AFTER_HEADER] = readAfter;
+  }
+  return config;
+});
+
+api.interceptors.response.use((response) => {
+  const readAfter = response.headers?.[READ_AFTER_HEADER.toLowerCase()];
+  if (readAfter && isNewerToken(readAfter, sessionStorage.getItem(READ_AFTER_KEY))) {
+    sessionStorage.setItem(READ_AFTER_KEY, readAfter);
+  }
+  return response;
+});
+
 export async function pingApi() {
   const res = await api.get("/");
   return res.data;